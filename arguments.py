@@ -7,6 +7,7 @@ from unification import *
 from unification import alpha_renaming
 from unification import formula_uses
 from unification import get_symbols
+from unification import diff_tree
 
 if TYPE_CHECKING:
     from proof import Line, Context
@@ -172,6 +173,8 @@ class UniversalGeneralization(Argument):
 
 
 class ExistentialInstantiation(Argument):
+    uses_constants = True
+
     def __init__(self, quant: Line) -> None:
         self.quant = quant
       
@@ -225,6 +228,57 @@ class ExistentialGeneralization(Argument):
         return True
 
 
+class Equivalence(Argument):
+    def __init__(self, old: Line) -> None:
+        self.old = old
+        
+    def typecheck(self, new: Prop) -> bool:
+        if self.old.typ == new:
+            return True
+        from discrimination import rule_index
+        old_t, new_t = diff_tree(self.old.typ, new)
+        for _, name, rule, direction in rule_index().retrieve(old_t):
+            if rule.match_from(direction, old_t, new_t) is not None:
+                self.note = name
+                return True
+        assert False, f'No equivalence rule rewrites {old_t} into {new_t}!'
+        
+    def __repr__(self) -> str:
+        return f'eq {self.old.num}'
+
+
+class ACEquivalence(Argument):
+    def __init__(self, old: Line) -> None:
+        self.old = old
+        
+    def typecheck(self, new: Prop) -> bool:
+        # any number of comm and assoc steps, anywhere in the formula, in one comparison
+        assert canonical(self.old.typ) is canonical(new), \
+            f'{self.old.typ} and {new} are not the same up to commutativity and associativity!'
+        return True
+        
+    def __repr__(self) -> str:
+        return f'ac {self.old.num}'
+
+
+class Tautology(Argument):
+    def __init__(self, *lines: Line) -> None:
+        self.lines = lines
+        
+    def typecheck(self, expected: Prop) -> bool:
+        # propositional entailment, with predicates and quantified formulas as atoms
+        from sat import countermodel
+        model = countermodel([line.typ for line in self.lines], expected)
+        if model is not None:
+            falsified = ', '.join(f'{atom}={"T" if value else "F"}' for atom, value in sorted(model.items(), key=repr))
+            cited = f' from {", ".join(str(line.num) for line in self.lines)}' if self.lines else ''
+            assert False, f'{expected} does not follow{cited}! (counterexample: {falsified})'
+        return True
+    
+    def __repr__(self) -> str:
+        return f'taut {", ".join(str(line.num) for line in self.lines)}'
+
+
 argument_lookup: Dict[str, Callable[[List[Line]], Argument]] = {
     'mp': lambda args: ModusPonens(*args),
     'mt': lambda args: ModusTollens(*args),
@@ -254,6 +308,9 @@ argument_lookup: Dict[str, Callable[[List[Line]], Argument]] = {
     'cp': lambda args: Contrapositive(*args),
     'or_self': lambda args: SelfOr(*args),
     'and_self': lambda args: SelfAnd(*args),
+    'eq': lambda args: Equivalence(*args),
+    'ac': lambda args: ACEquivalence(*args),
+    'taut': lambda args: Tautology(*args),
     
     'ei': lambda args: ExistentialInstantiation(*args),
     'eg': lambda args: ExistentialGeneralization(*args),
@@ -272,21 +329,31 @@ class UninterpJust:
     def __init__(self, name: str, args: List[int]) -> None:
         self.name = name
         self.args = args
+        self.span = (min(args), max(args)) if args else None
         
     def interpret(self, ctx: Context) -> tuple[Argument, Dict[str, Set[str]]]:
-        
+        missing = [arg for arg in self.args if arg not in ctx.lines]
+        assert not missing, f'Line {missing[0]} does not exist!'
         variables = combine_variable_contexts(tuple(ctx.lines[arg].variables for arg in self.args))
         
         if self.name == 'ded':
-            assert tuple(sorted(self.args)) in ctx.proofs, f'{min(self.args)}-{max(self.args)} does not denote a complete proof!'
-            proof = ctx.proofs[tuple(sorted(self.args))]
+            assert self.span is not None, 'The deduction rule needs the lines of a proof!'
+            proof = ctx.proofs.get(self.span)
+            # the arguments must name exactly the lines of that block, not those of nested ones
+            assert proof is not None and len(self.args) == len(proof.lines) and all(arg in proof.lines for arg in self.args), \
+                f'{self.span[0]}-{self.span[1]} does not denote a complete proof!'
             hyp, ded = ctx.proof_types[proof]
             assert len(hyp) == 1, f'A proof that uses multiple hypotheses cannot be used in the deduction rule! (hypotheses={hyp})'
             return Deduction(list(hyp)[0], ded), variables
             
         assert self.name in argument_lookup, f'{self.name} is not a recognized justification!'
         lines = [ctx.lines[arg] for arg in self.args]
-        return argument_lookup[self.name](lines), variables
+        try:
+            argument = argument_lookup[self.name](lines)
+        except TypeError:
+            # the rule takes a different number of lines
+            assert False, f'`{self.name}` cannot be used with {len(lines)} line{"" if len(lines) == 1 else "s"}!'
+        return argument, variables
     
     def __repr__(self) -> str:
         return f'{self.name} {self.args}'
\ No newline at end of file
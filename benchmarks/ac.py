@@ -0,0 +1,52 @@
+"""Commutativity and associativity: one `and_comm` step against an `ac` step, and
+canonical forms built cold against looked up on the node.
+
+Run from the repository root with `python -m benchmarks.ac [operands...]`.
+"""
+from __future__ import annotations
+import io
+import random
+import sys
+import time
+
+from benchmarks.common import best_of, random_formula, report
+from checker import check_proof
+from props import And, BaseProp, Prop, canonical
+
+
+def chain(operands: list) -> Prop:
+    p = operands[-1]
+    for operand in reversed(operands[:-1]):
+        p = And(operand, p)
+    return p
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10, 100, 1000]
+    for n in sizes:
+        rng = random.Random(n)
+        atoms = [BaseProp(f'P{i}') for i in range(8)]
+        operands = [random_formula(3, rng, atoms) for _ in range(n)]
+        p = chain(operands)
+        # the last two operands swapped, which one and_comm step also justifies
+        swapped = chain(operands[:-2] + operands[:-3:-1])
+        # every operand moved, which takes many comm and assoc steps
+        shuffled = operands[:]
+        rng.shuffle(shuffled)
+        q = chain(shuffled)
+        comm = f'{swapped!r}\n1. {p!r} prem;\n2. {swapped!r} and_comm 1;\n'
+        ac = f'{swapped!r}\n1. {p!r} prem;\n2. {swapped!r} ac 1;\n'
+        start = time.perf_counter()
+        assert canonical(p) is canonical(q)
+        cold = time.perf_counter() - start
+        print(f'{n} operands')
+        report([
+            ('  check with and_comm', best_of(lambda: check_proof(comm, io.StringIO()), repeat=5)),
+            ('  check with ac', best_of(lambda: check_proof(ac, io.StringIO()), repeat=5)),
+            ('  canonical forms, cold', cold),
+            ('  canonical forms, cached', best_of(lambda: canonical(p) is canonical(q), number=1000)),
+        ])
+
+
+if __name__ == '__main__':
+    main()
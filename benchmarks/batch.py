@@ -0,0 +1,45 @@
+"""Throughput of `mouse` batch grading on a corpus built from the bundled proofs.
+
+Run from the repository root with `python -m benchmarks.batch [files] [jobs]`.
+"""
+from __future__ import annotations
+import glob
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from mouse import grade_all
+
+
+def build_corpus(directory: str, size: int):
+    sources = sorted(glob.glob('examples/*.txt') + glob.glob('hw6/*.txt') + glob.glob('proofs/*'))
+    for i in range(size):
+        shutil.copy(sources[i % len(sources)], os.path.join(directory, f'{i:05}.txt'))
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    jobs = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as directory:
+        build_corpus(directory, size)
+        paths = sorted(glob.glob(os.path.join(directory, '*.txt')))
+
+        sample = paths[:20]
+        start = time.perf_counter()
+        for path in sample:
+            subprocess.run([sys.executable, 'mouse.py', path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        cold = (time.perf_counter() - start) / len(sample)
+        print(f'one process per file : {1 / cold:8.1f} files/s (extrapolated from {len(sample)} files)')
+
+        for n in sorted({1, jobs}):
+            start = time.perf_counter()
+            grades = grade_all(paths, n)
+            elapsed = time.perf_counter() - start
+            print(f'batch, {n:2} worker(s)   : {len(grades) / elapsed:8.1f} files/s ({elapsed:.2f}s for {len(grades)} files)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+"""Checking time of proofs made of many small hypothetical blocks.
+
+Run from the repository root with `python -m benchmarks.blocks [blocks...]`.
+"""
+from __future__ import annotations
+import io
+import sys
+import time
+
+from checker import check_proof
+
+
+def block_proof(blocks: int) -> str:
+    out = ['A -> A \\/ B']
+    num = 1
+    for _ in range(blocks):
+        out += [f'| {num}. A hyp;', f'| {num + 1}. A \\/ B add {num};', f'{num + 2}. A -> A \\/ B ded {num}-{num + 1};']
+        num += 3
+    return '\n'.join(out) + '\n'
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [500, 1000, 2000, 4000]
+    for blocks in sizes:
+        text = block_proof(blocks)
+        start = time.perf_counter()
+        result = check_proof(text, io.StringIO())
+        elapsed = time.perf_counter() - start
+        assert result.passed
+        print(f'{blocks:6} blocks, {3 * blocks:6} lines: {elapsed * 1000:9.1f} ms ({elapsed / (3 * blocks) * 1e6:6.1f} us/line)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+from __future__ import annotations
+import random
+import time
+from typing import Callable, List
+
+from props import And, BaseProp, Imp, Not, Or, Prop
+
+ATOMS = [BaseProp(chr(c)) for c in range(ord('A'), ord('Z') + 1)]
+
+
+def random_formula(depth: int, rng: random.Random, atoms: List[BaseProp] = ATOMS) -> Prop:
+    if depth == 0:
+        return rng.choice(atoms)
+    op = rng.randrange(4)
+    if op == 3:
+        return Not(random_formula(depth - 1, rng, atoms))
+    p = random_formula(depth - 1, rng, atoms)
+    q = random_formula(depth - 1, rng, atoms)
+    return (And, Or, Imp)[op](p, q)
+
+
+def random_proof(lines: int, depth: int, rng: random.Random) -> str:
+    # premises, then alternating conj/simpl steps over them; every line checks
+    premises = [random_formula(depth, rng) for _ in range(max(2, lines // 4))]
+    out = [repr(premises[0])]
+    typs = {}
+    for num, premise in enumerate(premises, 1):
+        out.append(f'{num}. {premise!r} prem;')
+        typs[num] = premise
+    num = len(premises)
+    while num < lines:
+        i, j = rng.randrange(1, len(premises) + 1), rng.randrange(1, len(premises) + 1)
+        num += 1
+        out.append(f'{num}. {And(typs[i], typs[j])!r} conj {i}, {j};')
+        num += 1
+        out.append(f'{num}. {typs[j]!r} simpl {num - 1};')
+    return '\n'.join(out) + '\n'
+
+
+def best_of(fn: Callable[[], object], repeat: int = 5, number: int = 1) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def report(rows: List[tuple[str, float]]):
+    width = max(len(name) for name, _ in rows)
+    for name, seconds in rows:
+        print(f'{name:<{width}}  {seconds * 1e6:12.2f} us')
@@ -0,0 +1,38 @@
+"""Loading a compiled proof (`.<name>.mousec`) against parsing the source again.
+
+Run from the repository root with `python -m benchmarks.compiled [lines...]`.
+"""
+from __future__ import annotations
+import os
+import sys
+import tempfile
+
+from benchmarks.common import best_of
+from benchmarks.generate import Shape, generate
+from checker import PARSERS, preprocess
+from compiled import CompiledCache
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [250, 1000, 4000]
+    with tempfile.TemporaryDirectory() as directory:
+        for lines in sizes:
+            text = generate(Shape(lines=lines, quantifiers=0.2, rewrites=0.2))
+            rows = text.splitlines()
+            parse = PARSERS['fast']
+
+            def parsed():
+                return parse.parse_obligations(rows[0]), parse.parse_proof('\n'.join(preprocess(rows[1:])))
+
+            compiled = CompiledCache(os.path.join(directory, f'{lines}.mousec'))
+            compiled.save(text, *parsed())
+            assert compiled.load(text) is not None
+            parsing = best_of(parsed, repeat=3)
+            loading = best_of(lambda: compiled.load(text), repeat=3)
+            size = os.path.getsize(compiled.path)
+            print(f'{lines:6} lines: parse {parsing * 1000:8.1f} ms, load {loading * 1000:7.1f} ms '
+                  f'({parsing / loading:4.1f}x faster), {size / 1024:7.1f} KiB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""Checking proofs whose formulas are long chains and deep nests of connectives.
+
+Run from the repository root with `python -m benchmarks.deep [connectives...]`;
+nothing here should need a higher recursion limit.
+"""
+from __future__ import annotations
+import io
+import sys
+import time
+
+from checker import check_proof
+
+
+def deep_proof(connectives: int) -> str:
+    atoms = [chr(ord('A') + i % 26) for i in range(connectives + 1)]
+    conj = r' /\ '.join(atoms)
+    imp = ' -> '.join(atoms[:connectives // 2] + ['Z'])
+    nested = '(' * (connectives // 4) + 'A' + r' /\ B)' * (connectives // 4)
+    return '\n'.join([
+        atoms[-1],
+        f'1. {conj} prem;',
+        f'2. {imp} prem;',
+        f'3. {atoms[-1]} simpl 1;',
+        f'4. {nested} prem;',
+        rf'5. {nested} \/ Q add 4;',
+        f'6. ~~({conj}) dn 1;',
+    ])
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 100000]
+    print(f'recursion limit {sys.getrecursionlimit()}')
+    for connectives in sizes:
+        text = deep_proof(connectives)
+        start = time.perf_counter()
+        result = check_proof(text, io.StringIO())
+        assert result.passed, result.error
+        print(f'{connectives:7} connectives: checked in {time.perf_counter() - start:6.2f} s')
+
+
+if __name__ == '__main__':
+    main()
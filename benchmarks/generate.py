@@ -0,0 +1,251 @@
+"""Generator of valid proofs of a given size and shape.
+
+Run from the repository root with `python -m benchmarks.generate --lines 1000 -o proof.txt`;
+`--check` runs the result through the checker.
+"""
+from __future__ import annotations
+from argparse import ArgumentParser
+from dataclasses import dataclass, field
+import io
+import random
+import sys
+from typing import Dict, List, Optional
+
+from benchmarks.common import random_formula
+from checker import check_proof
+from props import And, BaseProp, Exists, ForAll, Imp, ModelRef, Or, Predicate, Prop
+from prover import printable, rewrites, size, substitute
+from unification import get_symbols
+
+VARIABLES = [ModelRef(v) for v in 'xyzuvw']
+CONSTANTS = [ModelRef(c) for c in ('Alice', 'Bob', 'Carol')]
+
+
+@dataclass
+class Shape:
+    lines: int = 1000
+    depth: int = 2
+    # deepest nesting of hypothetical blocks, and the chance that a step opens one
+    nesting: int = 2
+    blocks: float = 0.05
+    # share of steps using ui/ei/eg/ug, and using an equivalence rule
+    quantifiers: float = 0.1
+    rewrites: float = 0.1
+
+
+@dataclass
+class Fact:
+    num: int
+    typ: Prop
+
+
+@dataclass
+class Block:
+    hyp: Fact
+    own: List[int] = field(default_factory=list)
+    facts: List[Fact] = field(default_factory=list)
+
+
+class Generator:
+    def __init__(self, shape: Shape, rng: random.Random) -> None:
+        self.shape = shape
+        self.rng = rng
+        self.out: List[str] = []
+        self.num = 0
+        self.top: List[Fact] = []
+        self.blocks: List[Block] = []
+        self.fresh = 0
+        # constants from ui of a fresh constant, which ug may generalize again
+        self.generic: Dict[int, ModelRef] = {}
+
+    # output
+
+    def available(self) -> List[Fact]:
+        facts = list(self.top)
+        for block in self.blocks:
+            facts += block.facts
+        return facts
+
+    def emit(self, typ: Prop, just: str) -> Fact:
+        self.num += 1
+        self.out.append(f'{"| " * len(self.blocks)}{self.num}. {typ!r} {just};')
+        fact = Fact(self.num, typ)
+        if self.blocks:
+            self.blocks[-1].own.append(self.num)
+            self.blocks[-1].facts.append(fact)
+        else:
+            self.top.append(fact)
+        return fact
+
+    def fresh_constant(self, prefix: str) -> ModelRef:
+        self.fresh += 1
+        n, name = self.fresh, ''
+        while n:
+            n, r = divmod(n - 1, 26)
+            name = chr(ord('a') + r) + name
+        return ModelRef(prefix + name)
+
+    # formulas
+
+    def formula(self) -> Prop:
+        return random_formula(self.shape.depth, self.rng, [BaseProp(c) for c in 'ABCDEFGH'])
+
+    def quantified(self) -> Prop:
+        var = self.rng.choice(VARIABLES)
+        atoms: List[Prop] = [Predicate(BaseProp(name), (var,)) for name in ('P', 'Q', 'R')]
+        atoms += [Predicate(BaseProp('S'), (var, self.rng.choice(CONSTANTS))), BaseProp('A')]
+        body = random_formula(self.shape.depth, self.rng, atoms)  # type: ignore
+        while substitute(body, var, CONSTANTS[0]) is body:
+            body = And(body, atoms[0])
+        return (ForAll if self.rng.random() < 0.5 else Exists)(var, body)
+
+    # steps
+
+    def premises(self, count: int):
+        for _ in range(count):
+            p = self.formula()
+            self.emit(p, 'prem')
+            if self.rng.random() < 0.5:
+                self.emit(Imp(p, self.formula()), 'prem')
+        for _ in range(count if self.shape.quantifiers else 0):
+            self.emit(self.quantified(), 'prem')
+
+    def step(self):
+        rng, shape = self.rng, self.shape
+        roll = rng.random()
+        if len(self.blocks) < shape.nesting and roll < shape.blocks:
+            self.open_block()
+        elif self.blocks and roll < 2 * shape.blocks and self.blocks[-1].own[-1] != self.blocks[-1].hyp.num:
+            self.close_block()
+        elif roll < 2 * shape.blocks + shape.quantifiers and self.quantifier_step():
+            pass
+        elif roll < 2 * shape.blocks + shape.quantifiers + shape.rewrites and self.rewrite_step():
+            pass
+        else:
+            self.basic_step()
+
+    def open_block(self):
+        hyp = self.formula()
+        self.blocks.append(Block(Fact(self.num + 1, hyp)))
+        self.emit(hyp, 'hyp')
+
+    def close_block(self):
+        block = self.blocks.pop()
+        conclusion = self.rng.choice(block.facts)
+        self.emit(Imp(block.hyp.typ, conclusion.typ), f'ded {", ".join(map(str, block.own))}')
+
+    def basic_step(self):
+        facts = self.available()
+        rng = self.rng
+        imps = {f.typ.p: f for f in facts if isinstance(f.typ, Imp) and f.typ.q is not False}
+        for f in rng.sample(facts, min(len(facts), 8)) if rng.random() < 0.4 else []:
+            if f.typ in imps:
+                self.emit(imps[f.typ].typ.q, f'mp {imps[f.typ].num}, {f.num}')
+                return
+        a, b = rng.choice(facts), rng.choice(facts)
+        if isinstance(a.typ, And) and rng.random() < 0.7:
+            self.emit(rng.choice([a.typ.p, a.typ.q]), f'simpl {a.num}')
+        elif rng.random() < 0.5 and size(a.typ) + size(b.typ) < 4 * 2 ** self.shape.depth:
+            self.emit(And(a.typ, b.typ), f'conj {a.num}, {b.num}')
+        else:
+            self.emit(Or(a.typ, self.formula()), f'add {a.num}')
+
+    def rewrite_step(self) -> bool:
+        fact = self.rng.choice(self.available())
+        limit = 2 * size(fact.typ) + 4
+        options: Dict[str, List[Prop]] = {}
+        for new, name in rewrites(fact.typ):
+            if size(new) <= limit and printable(new):
+                options.setdefault(name, []).append(new)
+        if not options:
+            return False
+        # pick the rule first, or the ones that apply anywhere (dn, or_self, ...) crowd out the rest
+        name = self.rng.choice(sorted(options))
+        self.emit(self.rng.choice(options[name]), f'{name} {fact.num}')
+        return True
+
+    def quantifier_step(self) -> bool:
+        facts = self.available()
+        rng = self.rng
+        kind = rng.choice(['ui', 'ei', 'eg', 'ug'])
+        if kind == 'ug' and self.generic:
+            num = rng.choice(sorted(self.generic))
+            fact = next((f for f in facts if f.num == num), None)
+            if fact is not None:
+                c = self.generic.pop(num)
+                var = self.unused_variable(fact.typ)
+                if var is not None:
+                    self.emit(ForAll(var, substitute(fact.typ, c, var)), f'ug {num}')
+                    return True
+        if kind in ('ui', 'ug'):
+            universals = [f for f in facts if isinstance(f.typ, ForAll)]
+            if universals:
+                fact = rng.choice(universals)
+                assert isinstance(fact.typ, ForAll)
+                generic = kind == 'ug' or rng.random() < 0.3
+                c = self.fresh_constant('U') if generic else rng.choice(CONSTANTS)
+                inst = self.emit(substitute(fact.typ.formula, fact.typ.var, c), f'ui {fact.num}')
+                if generic:
+                    self.generic[inst.num] = c
+                return True
+        if kind == 'ei':
+            existentials = [f for f in facts if isinstance(f.typ, Exists)]
+            if existentials:
+                fact = rng.choice(existentials)
+                assert isinstance(fact.typ, Exists)
+                self.emit(substitute(fact.typ.formula, fact.typ.var, self.fresh_constant('E')), f'ei {fact.num}')
+                return True
+        # eg: generalize a constant of some fact
+        for fact in rng.sample(facts, min(len(facts), 8)):
+            sym, var = get_symbols(fact.typ)
+            constants = sorted(sym - var, key=repr)
+            new_var = self.unused_variable(fact.typ)
+            if constants and new_var is not None:
+                c = rng.choice(constants)
+                self.emit(Exists(new_var, substitute(fact.typ, c, new_var)), f'eg {fact.num}')
+                return True
+        return False
+
+    def unused_variable(self, p: Prop) -> Optional[ModelRef]:
+        sym, var = get_symbols(p)
+        return next((v for v in VARIABLES if v not in sym | var), None)
+
+    def generate(self) -> str:
+        self.premises(max(2, self.shape.lines // 20))
+        while self.num < self.shape.lines or self.blocks:
+            if self.num >= self.shape.lines:
+                self.close_block()
+            else:
+                self.step()
+        return '\n'.join([repr(self.top[-1].typ)] + self.out) + '\n'
+
+
+def generate(shape: Shape, seed: int = 0) -> str:
+    return Generator(shape, random.Random(seed)).generate()
+
+
+def main():
+    parser = ArgumentParser(description=__doc__)
+    defaults = Shape()
+    for name, value in vars(defaults).items():
+        parser.add_argument(f'--{name}', type=type(value), default=value)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', type=str)
+    parser.add_argument('--check', action='store_true', help='check the generated proof')
+    args = parser.parse_args()
+    shape = Shape(**{name: getattr(args, name) for name in vars(defaults)})
+    text = generate(shape, args.seed)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
+    if args.check:
+        result = check_proof(text, io.StringIO())
+        print('valid' if result.passed else f'INVALID: {result.error}', file=sys.stderr)
+        if not result.passed:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
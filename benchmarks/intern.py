@@ -0,0 +1,50 @@
+"""Equality and hashing of large formulas, interned vs. a structural walk.
+
+Run from the repository root with `python -m benchmarks.intern`.
+"""
+from __future__ import annotations
+import random
+import sys
+from dataclasses import fields
+
+from benchmarks.common import best_of, random_formula, report
+from props import Node, intern_table_size
+
+
+def structural_eq(p, q) -> bool:
+    # what the generated dataclass __eq__ used to do on every comparison
+    if type(p) is not type(q):
+        return False
+    if not isinstance(p, Node):
+        return p == q
+    return all(structural_eq(getattr(p, f.name), getattr(q, f.name)) for f in fields(p))
+
+
+def structural_hash(p) -> int:
+    if not isinstance(p, Node):
+        return hash(p)
+    return hash((type(p), *(structural_hash(getattr(p, f.name)) for f in fields(p))))
+
+
+def main():
+    depth = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    build = lambda: random_formula(depth, random.Random(depth))
+
+    p = build()
+    q = build()
+    assert p is q
+    print(f'depth {depth}: {intern_table_size()} distinct nodes alive')
+
+    pool = {build() for _ in range(10)}
+    report([
+        ('build (interned)', best_of(build, repeat=3)),
+        ('eq, interned', best_of(lambda: p == q, number=1000)),
+        ('eq, structural walk', best_of(lambda: structural_eq(p, q), repeat=3)),
+        ('hash, interned', best_of(lambda: hash(p), number=1000)),
+        ('hash, structural walk', best_of(lambda: structural_hash(p), repeat=3)),
+        ('set membership, interned', best_of(lambda: q in pool, number=1000)),
+    ])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""Time the language server's re-check of a document after an edit.
+
+Run from the repository root with `python -m benchmarks.lsp [lines...]`.
+"""
+from __future__ import annotations
+import io
+import sys
+
+from benchmarks.common import best_of
+from benchmarks.generate import Shape, generate
+from checker import check_proof
+from lsp import Document, diagnose
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [500, 2000]
+    for lines in sizes:
+        text = generate(Shape(lines=lines, quantifiers=0.2, rewrites=0.2))
+        full = best_of(lambda: check_proof(text, io.StringIO()), repeat=3)
+        cold = best_of(lambda: diagnose(Document('bench', text, 0)), repeat=3)
+
+        doc = Document('bench', text, 0)
+        assert diagnose(doc) == []
+        rows = text.splitlines()
+        middle = len(rows) // 2
+        # an edit in the middle that changes nothing, one that breaks the line, and undoing it
+        touched = '\n'.join(rows[:middle] + [rows[middle] + ' '] + rows[middle + 1:])
+        depth = len(rows[middle]) - len(rows[middle].lstrip('| '))
+        num = rows[middle][depth:].split('.')[0]
+        broken = '\n'.join(rows[:middle] + [f'{rows[middle][:depth]}{num}. Z mp 1, 2;'] + rows[middle + 1:])
+        timings = []
+        for edited in (touched, broken, text):
+            def recheck():
+                doc.text = edited
+                return diagnose(doc)
+            recheck()
+            timings.append(best_of(recheck, repeat=5))
+        print(f'{lines:6} lines: mouse {full * 1000:7.1f} ms, first check {cold * 1000:7.1f} ms, after an edit: '
+              f'unchanged {timings[0] * 1000:6.1f} ms, broken {timings[1] * 1000:6.1f} ms, fixed {timings[2] * 1000:6.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
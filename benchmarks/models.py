@@ -0,0 +1,40 @@
+"""Countermodel search on small first-order problems.
+
+Run from the repository root with `python -m benchmarks.models`.
+"""
+from __future__ import annotations
+import time
+
+from fast_parser import parse_form
+from models import constant_assignments, describe, find_countermodel
+
+PROBLEMS = [
+    (['forall x, exists y, R(x, y)'], 'exists y, forall x, R(x, y)'),
+    (['exists x, P(x) -> Q(x)'], '(exists x, P(x)) -> (exists y, Q(y))'),
+    (['forall x, P(x) -> Q(x)', 'forall x, ~P(x) -> R(x)', 'forall x, R(x) -> Q(x)'], 'forall x, Q(x)'),
+    (['forall x, forall y, R(x, y) -> R(y, x)', 'R(A, B)'], 'R(B, C)'),
+    (['forall x, forall y, forall z, R(x, y) /\\ R(y, z) -> R(x, z)', 'forall x, ~R(x, x)'],
+     'exists x, forall y, ~R(x, y)'),
+    (['forall x, forall y, R(x, y) \\/ R(y, x)', 'forall x, forall y, R(x, y) /\\ R(y, x) -> E(x, y)'],
+     'forall x, exists y, R(y, x) /\\ ~E(x, y)'),
+]
+
+
+def main():
+    for premises, conclusion in PROBLEMS:
+        start = time.perf_counter()
+        search = find_countermodel([parse_form(p) for p in premises], parse_form(conclusion), max_size=4, timeout=10)
+        elapsed = time.perf_counter() - start
+        verdict = describe(search).splitlines()
+        print(f'{conclusion:<48} {elapsed * 1000:8.1f} ms {search.interpretations:9} interpretations  {verdict[0]}')
+        for line in verdict[1:]:
+            print(f'{"":<60}{line}')
+
+    # how much the least-number assignment of constants saves over all d^c assignments
+    for constants, size in ((3, 3), (4, 4), (5, 4)):
+        canonical = sum(1 for _ in constant_assignments(constants, size))
+        print(f'{constants} constants in a domain of {size}: {canonical} assignments instead of {size ** constants}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""Checking one large generated proof serially against `--parallel-lines N`.
+
+Run from the repository root with `python -m benchmarks.parallel [lines...]`;
+`--jobs 2,4` picks the worker counts (by default 2 and every CPU).
+"""
+from __future__ import annotations
+import io
+import os
+import sys
+import time
+
+from benchmarks.generate import Shape, generate
+from checker import check_proof
+from parallel import waves
+from proof import Context
+from fast_parser import parse_proof
+from checker import preprocess
+
+
+def timed(text: str, parallel: int) -> float:
+    start = time.perf_counter()
+    result = check_proof(text, io.StringIO(), parallel=parallel)
+    assert result.passed, result.error
+    return time.perf_counter() - start
+
+
+def main():
+    args = sys.argv[1:]
+    jobs = sorted({2, os.cpu_count() or 1})
+    if '--jobs' in args:
+        at = args.index('--jobs')
+        jobs = [int(j) for j in args[at + 1].split(',')]
+        del args[at:at + 2]
+    sizes = [int(arg) for arg in args] or [5000, 20000, 50000]
+    print(f'{os.cpu_count()} CPUs')
+    for lines in sizes:
+        text = generate(Shape(lines=lines, quantifiers=0.2, rewrites=0.2))
+        ctx = Context(io.StringIO())
+        ctx.add_proof_tree(parse_proof('\n'.join(preprocess(text.splitlines()[1:]))))
+        groups = waves(ctx)
+        assert groups is not None
+        serial = timed(text, 0)
+        cells = [f'serial {serial:6.2f} s']
+        for n in jobs:
+            seconds = timed(text, n)
+            cells.append(f'{n} jobs {seconds:6.2f} s ({serial / seconds:4.2f}x)')
+        print(f'{lines:6} lines, {len(groups):4} waves: ' + ', '.join(cells))
+
+
+if __name__ == '__main__':
+    main()
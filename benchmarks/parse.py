@@ -0,0 +1,29 @@
+"""Parse throughput (lines/s) of the hand-written parser against the pyparsing grammar.
+
+Run from the repository root with `python -m benchmarks.parse [lines] [depth]`.
+"""
+from __future__ import annotations
+import random
+import sys
+
+from benchmarks.common import best_of, random_proof
+from checker import preprocess
+import fast_parser
+import proof_parser
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    depth = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    source = random_proof(lines, depth, random.Random(lines)).splitlines()
+    text = '\n'.join(preprocess(source[1:]))
+
+    fast = best_of(lambda: fast_parser.parse_proof(text), repeat=3)
+    slow = best_of(lambda: proof_parser.parse_proof(text), repeat=1)
+    print(f'{len(source) - 1} lines, formula depth {depth}, {len(text)} characters')
+    print(f'fast_parser  : {(len(source) - 1) / fast:10.0f} lines/s')
+    print(f'proof_parser : {(len(source) - 1) / slow:10.0f} lines/s ({slow / fast:.0f}x slower)')
+
+
+if __name__ == '__main__':
+    main()
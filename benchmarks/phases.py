@@ -0,0 +1,120 @@
+"""Time each phase of checking on generated proofs, and compare with a baseline.
+
+Run from the repository root with `python -m benchmarks.phases`; `--save` records
+the timings in the baseline file, and later runs flag every phase that got more
+than `--threshold` times slower than it (and exit with status 1). The pyparsing
+grammar backtracks exponentially in the nesting of parentheses, so it takes
+minutes on these proofs and is only timed with `--pyparsing`.
+"""
+from __future__ import annotations
+from argparse import ArgumentParser
+import io
+import json
+import os
+import sys
+from typing import Callable, Dict, List, Tuple
+
+from benchmarks.common import best_of
+from benchmarks.generate import Shape, generate
+from checker import PARSERS, check_obligations, preprocess
+from proof import Context
+
+CONFIGS: Dict[str, Shape] = {
+    'lines-250': Shape(lines=250),
+    'lines-1000': Shape(lines=1000),
+    'lines-4000': Shape(lines=4000),
+    'deep': Shape(lines=1000, depth=4),
+    'nested': Shape(lines=1000, nesting=6, blocks=0.15),
+    'quantifiers': Shape(lines=1000, quantifiers=0.5),
+    'rewrites': Shape(lines=1000, rewrites=0.5),
+}
+
+PHASES = ['preprocess', 'parse', 'check', 'obligations', 'parse-pyparsing']
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+# differences below this are noise, whatever the ratio
+NOISE = 0.001
+
+
+def phases(text: str, pyparsing: bool = False) -> List[Tuple[str, Callable[[], object]]]:
+    lines = text.splitlines()
+    body = '\n'.join(preprocess(lines[1:]))
+    obligations = PARSERS['fast'].parse_obligations(lines[0])
+
+    def check() -> Context:
+        ctx = Context(io.StringIO())
+        ctx.add_proof_tree(PARSERS['fast'].parse_proof(body))
+        assert ctx.check(), ctx.error
+        return ctx
+
+    ctx = check()
+    assert check_obligations(ctx, obligations).passed
+    # parsing is part of `check` too, so it is timed on its own to be subtracted
+    timed: List[Tuple[str, Callable[[], object]]] = [
+        ('preprocess', lambda: preprocess(lines[1:])),
+        ('parse', lambda: PARSERS['fast'].parse_proof(body)),
+        ('check', check),
+        ('obligations', lambda: check_obligations(ctx, obligations)),
+    ]
+    if pyparsing:
+        timed.append(('parse-pyparsing', lambda: PARSERS['pyparsing'].parse_proof(body)))
+    return timed
+
+
+def measure(names: List[str], repeat: int, seed: int, pyparsing: bool = False) -> Dict[str, Dict[str, float]]:
+    timings: Dict[str, Dict[str, float]] = {}
+    for name in names:
+        shape = CONFIGS[name]
+        row = {phase: best_of(fn, repeat=repeat) for phase, fn in phases(generate(shape, seed), pyparsing)}
+        row['check'] = max(0.0, row['check'] - row['parse'])
+        timings[name] = row
+    return timings
+
+
+def main():
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('configs', nargs='*', default=list(CONFIGS), help=f'any of {", ".join(CONFIGS)}')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--baseline', type=str, default=BASELINE)
+    parser.add_argument('--save', action='store_true', help='record these timings as the baseline')
+    parser.add_argument('--threshold', type=float, default=1.25)
+    parser.add_argument('--pyparsing', action='store_true', help='also time the pyparsing grammar')
+    args = parser.parse_args()
+    for name in args.configs:
+        if name not in CONFIGS:
+            parser.error(f'unknown config {name!r}')
+
+    timings = measure(args.configs, args.repeat, args.seed, args.pyparsing)
+    shown = [phase for phase in PHASES if phase in next(iter(timings.values()))]
+    baseline: Dict[str, Dict[str, float]] = {}
+    if os.path.exists(args.baseline) and not args.save:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    regressions = 0
+    print(f'{"":<12}' + ''.join(f'{phase:>18}' for phase in shown) + f'{"us/line":>10}')
+    for name, row in timings.items():
+        cells = []
+        for phase in shown:
+            cell = f'{row[phase] * 1000:.2f} ms'
+            old = baseline.get(name, {}).get(phase)
+            if old:
+                ratio = row[phase] / old
+                slower = ratio > args.threshold and row[phase] - old > NOISE
+                regressions += slower
+                cell += f' {"!" if slower else " "}{ratio:4.2f}x'
+            cells.append(f'{cell:>18}')
+        per_line = sum(row.values()) / CONFIGS[name].lines * 1e6
+        print(f'{name:<12}' + ''.join(cells) + f'{per_line:10.1f}')
+
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump(timings, f, indent=2, sort_keys=True)
+        print(f'Saved the baseline to {args.baseline}')
+    elif regressions:
+        print(f'{regressions} phase(s) more than {args.threshold}x slower than the baseline (marked !)')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
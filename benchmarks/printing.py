@@ -0,0 +1,50 @@
+"""Printing the formulas of a proof: every node printed afresh vs. the text kept on each node.
+
+Run from the repository root with `python -m benchmarks.printing [lines] [depth]`.
+"""
+from __future__ import annotations
+import io
+import random
+import sys
+
+from benchmarks.common import best_of, random_proof, report
+from checker import check_proof, preprocess
+from fast_parser import parse_proof
+from props import And, BaseProp, Exists, ForAll, Imp, ModelRef, ModelRefHole, Or, Predicate, Prop, PropHole
+
+
+def uncached(p: Prop) -> str:
+    # what printing a formula used to cost: every subformula formatted again
+    if isinstance(p, (BaseProp, ModelRef)):
+        return p.name
+    if isinstance(p, (PropHole, ModelRefHole)):
+        return f'?{p.name}'
+    if isinstance(p, And):
+        return fr'({uncached(p.p)} /\ {uncached(p.q)})'
+    if isinstance(p, Or):
+        return fr'({uncached(p.p)} \/ {uncached(p.q)})'
+    if isinstance(p, Imp):
+        return f'~{uncached(p.p)}' if p.q is False else f'({uncached(p.p)} -> {uncached(p.q)})'
+    if isinstance(p, Predicate):
+        return f'{p.name}({", ".join(map(uncached, p.args))})'
+    if isinstance(p, (ForAll, Exists)):
+        return f'({"forall" if isinstance(p, ForAll) else "exists"} {uncached(p.var)}, {uncached(p.formula)})'
+    return repr(p)
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    depth = int(sys.argv[2]) if len(sys.argv) > 2 else 6
+    text = random_proof(lines, depth, random.Random(lines))
+    proof = parse_proof('\n'.join(preprocess(text.splitlines()[1:])))
+    typs = [line.typ for line in proof.lines.values()]
+    assert [uncached(typ) for typ in typs] == [repr(typ) for typ in typs]
+    report([
+        ('print every line, uncached', best_of(lambda: [uncached(typ) for typ in typs], repeat=5)),
+        ('print every line, cached', best_of(lambda: [repr(typ) for typ in typs], repeat=5)),
+        ('check, output to a buffer', best_of(lambda: check_proof(text, io.StringIO()), repeat=5)),
+    ])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""Proof search on the obligations of the example and homework proofs.
+
+Run from the repository root with `python -m benchmarks.prove [files...]`.
+"""
+from __future__ import annotations
+import glob
+import io
+import sys
+import time
+
+from checker import check_proof, preprocess
+from fast_parser import parse_obligations, parse_proof
+from prover import STRATEGIES, Prover
+
+
+def problem(path: str):
+    lines = open(path).readlines()
+    body = parse_proof('\n'.join(preprocess(lines[1:])))
+    premises = [line.typ for line in body.lines.values() if line.just.name == 'prem']
+    return premises, parse_obligations(lines[0])
+
+
+def main():
+    paths = sys.argv[1:] or sorted(glob.glob('examples/*.txt') + glob.glob('hw6/*.txt'))
+    width = max(map(len, paths))
+    print(f'{"":<{width}}  ' + '  '.join(f'{s:>16}' for s in STRATEGIES))
+    for path in paths:
+        premises, goals = problem(path)
+        cells = []
+        for strategy in STRATEGIES:
+            prover = Prover(premises, strategy, max_nodes=5000, timeout=5)
+            start = time.perf_counter()
+            found = prover.prove(goals)
+            elapsed = time.perf_counter() - start
+            if found is None:
+                cells.append(f'{"-":>16}')
+                continue
+            assert check_proof(found, io.StringIO()).passed, found
+            cells.append(f'{elapsed * 1000:7.1f} ms {prover.nodes:5}n')
+        print(f'{path:<{width}}  ' + '  '.join(cells))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""Equivalence-rule checks: compiled matchers against the exception-driven `unify` path.
+
+Run from the repository root with `python -m benchmarks.rewrite [steps]`.
+"""
+from __future__ import annotations
+import random
+import sys
+from typing import List, Optional
+
+from benchmarks.common import best_of, random_formula
+from props import And, Exists, ForAll, Imp, Or, Prop
+from unification import (RewriteRule, compile_pattern, cp, demorgan_and_or, demorgan_or_and, diff_tree, distr_and_or,
+                         distr_or_and, double_neg, exp, impl_equiv, instantiate, or_assoc, or_comm, and_assoc, and_comm,
+                         self_and, self_or, unify)
+
+RULES = [or_comm, and_comm, or_assoc, and_assoc, double_neg, cp, impl_equiv, distr_and_or, distr_or_and,
+         demorgan_and_or, demorgan_or_and, self_or, self_and, exp]
+
+
+def reference_try_rewrite(transformation, rule):
+    # try_rewrite as it was: unify forward, catch the AssertionError, swap and retry
+    if transformation[0] == transformation[1]:
+        return {}
+    old_t, new_t = diff_tree(*transformation)
+    old_r, new_r = rule
+
+    def rewrite():
+        subst = {}
+        var_subst = {}
+        assert unify(old_t, old_r, subst, var_subst) and unify(new_t, new_r, subst, var_subst), 'failed'
+        return subst, var_subst
+
+    try:
+        return rewrite()
+    except AssertionError:
+        old_r, new_r = new_r, old_r
+        return rewrite()
+
+
+def subterms(p: Prop) -> List[Prop]:
+    out = [p]
+    if isinstance(p, (And, Or, Imp)):
+        out += subterms(p.p) + subterms(p.q)
+    elif isinstance(p, (ForAll, Exists)):
+        out += subterms(p.formula)
+    return out
+
+
+def outcome(check, *args):
+    try:
+        return check(*args)
+    except AssertionError:
+        return None
+
+
+def replace(p: Prop, old: Prop, new: Prop) -> Prop:
+    if p is old:
+        return new
+    if isinstance(p, (And, Or, Imp)):
+        return type(p)(replace(p.p, old, new), replace(p.q, old, new))
+    return p
+
+
+def step(p: Prop, rng: random.Random) -> Optional[tuple[Prop, tuple]]:
+    # apply one random rule, in a random direction, at a random matching subterm
+    for rule in rng.sample(RULES, len(RULES)):
+        left, right = rule if rng.random() < 0.5 else rule[::-1]
+        match = compile_pattern(left)
+        candidates = [t for t in subterms(p) if match(t, {}, {})]
+        if candidates:
+            target = rng.choice(candidates)
+            subst, var_subst = {}, {}
+            match(target, subst, var_subst)
+            if any(hole not in subst for hole in ('a', 'b', 'c') if f'?{hole}' in repr(right)):
+                continue
+            return replace(p, target, instantiate(right, subst, var_subst)), rule
+    return None
+
+
+def main():
+    steps = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    rng = random.Random(steps)
+    cases = []
+    p = random_formula(4, rng)
+    while len(cases) < steps:
+        nxt = step(p, rng)
+        if nxt is None or nxt[0] == p:
+            p = random_formula(4, rng)
+            continue
+        cases.append((p, nxt[0], nxt[1]))
+        p = nxt[0] if repr(nxt[0]).count('(') < 40 else random_formula(4, rng)
+
+    compiled = {rule: RewriteRule(rule) for rule in RULES}
+    for old, new, rule in cases:
+        assert outcome(compiled[rule].rewrite, (old, new)) == outcome(reference_try_rewrite, (old, new), rule)
+    cases = [case for case in cases if outcome(reference_try_rewrite, (case[0], case[1]), case[2]) is not None]
+
+    def run_reference():
+        for old, new, rule in cases:
+            outcome(reference_try_rewrite, (old, new), rule)
+
+    def run_compiled():
+        for old, new, rule in cases:
+            compiled[rule].rewrite((old, new))
+
+    ref = best_of(run_reference, repeat=3)
+    fast = best_of(run_compiled, repeat=3)
+    print(f'{len(cases)} rewrite steps')
+    print(f'unify + AssertionError : {ref / len(cases) * 1e6:7.2f} us/step')
+    print(f'compiled matchers      : {fast / len(cases) * 1e6:7.2f} us/step ({ref / fast:.1f}x faster)')
+
+
+if __name__ == '__main__':
+    main()
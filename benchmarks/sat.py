@@ -0,0 +1,75 @@
+"""Entailment checks with hundreds of atoms, far past what a truth table can do.
+
+Run from the repository root with `python -m benchmarks.sat`.
+"""
+from __future__ import annotations
+from functools import reduce
+import random
+import time
+
+from benchmarks.common import random_formula
+from props import And, BaseProp, Imp, Not, Or, Prop
+from sat import Encoder, entails
+
+
+def chain(n: int):
+    # A1, A1 -> A2, ..., A(n-1) -> An |- An
+    atoms = [BaseProp(f'A{i}') for i in range(n)]
+    premises = [atoms[0]] + [Imp(a, b) for a, b in zip(atoms, atoms[1:])]
+    return premises, atoms[-1], True
+
+
+def random_cnf(n: int, ratio: float, rng: random.Random) -> Prop:
+    atoms = [BaseProp(f'X{i}') for i in range(n)]
+    def literal():
+        atom = rng.choice(atoms)
+        return atom if rng.random() < 0.5 else Not(atom)
+    clauses = [Or(Or(literal(), literal()), literal()) for _ in range(int(n * ratio))]
+    return reduce(And, clauses)
+
+
+def nnf(p: Prop, negate: bool = False) -> Prop:
+    # push negations down to the atoms, so p <-> nnf(p) is a large tautology
+    if isinstance(p, Imp) and p.q is False:
+        return nnf(p.p, not negate)
+    if isinstance(p, Imp):
+        return nnf(Or(Not(p.p), p.q), negate)
+    if isinstance(p, (And, Or)):
+        op = type(p) if not negate else (Or if isinstance(p, And) else And)
+        return op(nnf(p.p, negate), nnf(p.q, negate))
+    return Not(p) if negate else p
+
+
+def equivalence(n: int, rng: random.Random):
+    atoms = [BaseProp(f'P{i}') for i in range(n)]
+    p = random_formula(10, rng, atoms)
+    q = nnf(p)
+    return [], And(Imp(p, q), Imp(q, p)), True
+
+
+def run(name: str, premises, conclusion, expected: bool):
+    encoder = Encoder()
+    start = time.perf_counter()
+    result = entails(premises, conclusion)
+    elapsed = time.perf_counter() - start
+    for p in premises + [conclusion]:
+        encoder.encode(p)
+    assert expected is None or result == expected, name
+    print(f'{name:<28} {len(encoder.atoms):5} atoms {encoder.solver.num_vars:6} vars  '
+          f'{"entailed" if result else "not entailed":<12} {elapsed * 1000:9.1f} ms')
+
+
+def main():
+    rng = random.Random(0)
+    for n in (100, 500, 2000):
+        run(f'implication chain {n}', *chain(n))
+    for n in (500, 2000):
+        run(f'nnf equivalence {n}', *equivalence(n, rng))
+    for n, ratio in ((100, 3.0), (200, 3.0), (50, 4.26), (100, 4.26), (150, 4.26)):
+        # the CNF is satisfiable exactly when its negation is not valid
+        cnf = random_cnf(n, ratio, rng)
+        run(f'random 3-cnf {n} x {ratio}', [], Not(cnf), None)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+"""Cost of the --semantic truth-table cross-check on top of the normal check.
+
+Run from the repository root with `python -m benchmarks.semantic [lines...]`.
+"""
+from __future__ import annotations
+import io
+import random
+import sys
+
+from benchmarks.common import best_of, random_formula, random_proof
+from checker import check_proof
+from props import BaseProp
+from semantic import TruthTable
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100, 400, 1600]
+    for lines in sizes:
+        text = random_proof(lines, 3, random.Random(lines))
+        plain = best_of(lambda: check_proof(text, io.StringIO()), repeat=3)
+        semantic = best_of(lambda: check_proof(text, io.StringIO(), semantic=True), repeat=3)
+        assert check_proof(text, io.StringIO(), semantic=True).passed
+        print(f'{lines:6} lines: check {plain * 1000:8.1f} ms, with --semantic {semantic * 1000:8.1f} ms')
+
+    rng = random.Random(0)
+    for n in (8, 16, 20, 24):
+        atoms = [BaseProp(f'A{i}') for i in range(n)]
+        formulas = [random_formula(6, rng, atoms) for _ in range(20)]
+        seconds = best_of(lambda: [TruthTable(atoms).counterexample(formulas[:-1], formulas[-1])], repeat=3)
+        print(f'{n:3} atoms: 20 formulas of depth 6 over {1 << n:9} assignments in {seconds * 1000:8.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Startup cost of `mouse`: import time by module, and time to the first checked line.
+
+Run from the repository root with `python -m benchmarks.startup [proof]`.
+"""
+from __future__ import annotations
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+REPEAT = 5
+
+
+def import_times() -> Tuple[int, List[Tuple[int, str]]]:
+    # (total microseconds, [(self microseconds, module)]) of `import mouse`, best of REPEAT
+    best: Dict[str, int] = {}
+    total = None
+    for _ in range(REPEAT):
+        run = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import mouse'],
+                             capture_output=True, text=True, check=True)
+        for row in run.stderr.splitlines():
+            if not row.startswith('import time:') or 'self [us]' in row:
+                continue
+            own, cumulative, name = row[len('import time:'):].split('|')
+            module = name.strip()
+            best[module] = min(best.get(module, 1 << 60), int(own))
+            if module == 'mouse':
+                total = int(cumulative) if total is None else min(total, int(cumulative))
+    assert total is not None
+    return total, sorted(((own, module) for module, own in best.items()), reverse=True)
+
+
+def first_line(command: List[str]) -> Tuple[float, float]:
+    # seconds until the first ✓ is printed, and until the process exits
+    best_first, best_total = float('inf'), float('inf')
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        process = subprocess.Popen(command, stdout=subprocess.PIPE)
+        assert process.stdout is not None
+        first = None
+        for row in iter(process.stdout.readline, b''):
+            if first is None and '✓'.encode() in row:
+                first = time.perf_counter() - start
+        process.wait()
+        total = time.perf_counter() - start
+        best_first, best_total = min(best_first, first if first is not None else total), min(best_total, total)
+    return best_first, best_total
+
+
+def main():
+    proof = sys.argv[1] if len(sys.argv) > 1 else 'hw6/1a.txt'
+    total, modules = import_times()
+    print(f'import mouse: {total / 1000:.1f} ms; slowest modules (own time):')
+    for own, module in modules[:10]:
+        print(f'  {own / 1000:6.1f} ms  {module}')
+    _, interpreter = first_line([sys.executable, '-c', 'pass'])
+    first, whole = first_line([sys.executable, 'mouse.py', proof])
+    print(f'python -c pass: {interpreter * 1000:.1f} ms')
+    print(f'mouse {proof}: first line checked after {first * 1000:.1f} ms, done after {whole * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""Time to first error and peak memory, whole-file checking vs. --stream --fail-fast.
+
+Run from the repository root with `python -m benchmarks.stream [lines]`.
+"""
+from __future__ import annotations
+import io
+import random
+import sys
+import time
+import tracemalloc
+
+from benchmarks.common import random_proof
+from checker import check_proof
+from stream import check_stream
+
+
+def measure(check):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = check()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    source = random_proof(lines, 2, random.Random(lines)).splitlines(keepends=True)
+    # break a line near the top, so only the streaming checker can stop early
+    broken = source[:]
+    broken[10] = broken[10].replace(' prem;', ' mp 1, 2;')
+    for name, text in (('valid', source), ('error on line 10', broken)):
+        whole = measure(lambda: check_proof(''.join(text), io.StringIO()))
+        streamed = measure(lambda: check_stream(iter(text), io.StringIO(), fail_fast=True))
+        print(f'{name} ({lines} lines):')
+        for label, (result, elapsed, peak) in (('whole file', whole), ('streaming', streamed)):
+            print(f'  {label:<10}  passed={result.passed!s:<5}  {elapsed * 1000:9.1f} ms  peak {peak / 2**20:7.1f} MiB')
+
+
+if __name__ == '__main__':
+    main()
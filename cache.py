@@ -0,0 +1,89 @@
+from __future__ import annotations
+from functools import lru_cache
+import hashlib
+import json
+import os
+from typing import TYPE_CHECKING, Any, Dict, Optional, Set, Tuple
+
+if TYPE_CHECKING:
+    from proof import Line, Context
+
+CACHE_VERSION = 2
+# bump when a rule starts accepting different lines under the same name, so that
+# cache files written by the old checker stop vouching for lines
+CHECKER_VERSION = 1
+
+
+def cache_path(proof_path: str, suffix: str) -> str:
+    directory, name = os.path.split(os.path.abspath(proof_path))
+    return os.path.join(directory, f'.{name}.{suffix}')
+
+
+@lru_cache(maxsize=None)
+def checker_fingerprint() -> str:
+    # the checker version and the rule set (names and equivalence patterns)
+    from arguments import argument_lookup
+    from unification import rewrite_rules
+    rules = [str(CHECKER_VERSION), *sorted(argument_lookup), *(f'{name}={rule}' for name, rule in rewrite_rules.items())]
+    return hashlib.sha1('\0'.join(rules).encode()).hexdigest()
+
+
+# A line's key hashes the checker fingerprint, its formula, its justification and
+# the keys of the lines it cites, so an edit invalidates exactly the lines
+# downstream of it. Arguments that look at `Context.constants` (ei) also hash the
+# constants in scope. Each entry is the quantifier context (`Line.variables`) the
+# line ended up with after checking, and the note shown next to it.
+class LineCache:
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.used: Dict[str, Dict[str, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def for_proof(cls, proof_path: str) -> LineCache:
+        cache = cls(cache_path(proof_path, 'mousecache'))
+        cache.load()
+        return cache
+
+    def load(self):
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') == CACHE_VERSION:
+            self.entries = data['lines']
+
+    def save(self):
+        if self.path is None:
+            return
+        # only keep what this run touched, so stale entries don't pile up
+        with open(self.path, 'w') as f:
+            json.dump({'version': CACHE_VERSION, 'lines': self.used}, f)
+
+    def key(self, line: Line, ctx: Context) -> Optional[str]:
+        cited = [getattr(ctx.lines[arg], 'key', None) for arg in line.just.args]
+        if None in cited:
+            # citing a line that has not been checked yet; its state depends on order
+            return None
+        parts = [checker_fingerprint(), repr(line.typ), line.just.name, repr(line.just.args), *cited]
+        if line.arg.uses_constants:
+            parts.append(repr(sorted(c.name for c in ctx.constants)))
+        return hashlib.sha1('\0'.join(parts).encode()).hexdigest()
+
+    def lookup(self, key: str) -> Optional[Tuple[Dict[str, Set[str]], Optional[str]]]:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.used[key] = entry
+        return {var: set(deps) for var, deps in entry['variables'].items()}, entry['note']
+
+    def store(self, key: str, variables: Dict[str, Set[str]], note: Optional[str]):
+        entry = {'variables': {var: sorted(deps) for var, deps in variables.items()}, 'note': note}
+        self.entries[key] = self.used[key] = entry
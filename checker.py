@@ -0,0 +1,183 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+import io
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional, Set, TextIO, Tuple
+
+from proof import Context
+import fast_parser
+from fast_parser import ParseException
+import proof_parser
+from props import Not, Or, Predicate, Prop, PropHole, canonical, metadata
+from semantic import cross_check
+from unification import get_symbols, unify
+
+if TYPE_CHECKING:
+    from cache import LineCache
+    from compiled import CompiledCache
+
+
+def preprocess(lines: List[str]) -> List[str]:
+    processed_lines: List[str] = []
+    block = []
+    for line in lines:
+        if line.startswith('| '):
+            block.append(line[2:])
+            continue
+        if len(block):
+            processed_lines += ['{'] + preprocess(block) + ['}']
+            block = []
+        processed_lines.append(line.strip())
+    
+    return processed_lines
+
+# built once, rather than interned (and their metadata computed) again for every hypothesis
+_a = PropHole('a')
+EXCLUDED_MIDDLE = (Or(_a, Not(_a)), Or(Not(_a), _a))
+
+
+def is_axiom(p: Prop):
+    return any(unify(p, axiom, {}) for axiom in EXCLUDED_MIDDLE)
+
+
+class LineResult(NamedTuple):
+    # one proof line as the structured reporters show it; plain strings, so cheap to
+    # send back from a grading worker
+    num: int
+    formula: str
+    rule: str
+    cites: Tuple[int, ...]
+    # 'passed', 'failed', 'skipped' (it rests on a failed line) or 'unchecked'
+    status: str
+    message: Optional[str] = None
+
+
+def line_results(ctx: Context) -> List[LineResult]:
+    results: List[LineResult] = []
+    for num in sorted(ctx.lines):
+        line = ctx.lines[num]
+        if num in ctx.passed:
+            status, message = 'passed', line.arg.note
+        elif num in ctx.errors:
+            status, message = 'failed', ctx.errors[num]
+        elif num == ctx.failed:
+            status, message = 'failed', ctx.error
+        elif num in ctx.poisoned:
+            status, message = 'skipped', f'depends on failed line {ctx.poisoned[num]}'
+        else:
+            status, message = 'unchecked', None
+        results.append(LineResult(num, repr(line.typ), line.just.name, tuple(line.just.args), status, message))
+    return results
+
+
+@dataclass
+class Result:
+    passed: bool
+    obligations: List[Prop] = field(default_factory=list)
+    unmet: List[Prop] = field(default_factory=list)
+    hypotheses: Set[Prop] = field(default_factory=set)
+    error: Optional[str] = None
+    log: str = ''
+    # with keep_going, every failed line and its error
+    errors: Dict[int, str] = field(default_factory=dict)
+    # with record, how every line fared
+    lines: List[LineResult] = field(default_factory=list)
+
+
+PARSERS = {'fast': fast_parser, 'pyparsing': proof_parser}
+
+
+def check_proof(text: str, out: Optional[TextIO] = None, cache: Optional[LineCache] = None,
+                parser: str = 'fast', lazy: bool = False, semantic: bool = False,
+                compiled: Optional[CompiledCache] = None, parallel: int = 0, keep_going: bool = False,
+                record: bool = False) -> Result:
+    # everything mutable lives in this call's Context, so this is safe to run
+    # concurrently and repeatedly; the shared grammar is never touched
+    if lazy and (keep_going or parallel > 1):
+        raise ValueError('lazy checking cannot be combined with keep_going or parallel')
+    if parallel > 1 and cache is not None:
+        raise ValueError('parallel checking cannot use a line cache')
+    parse = PARSERS[parser]
+    log = out if out is not None else io.StringIO()
+    ctx = Context(log)
+    ctx.cache = cache
+    lines = text.splitlines()
+    parsed = compiled.load(text) if compiled is not None else None
+    if parsed is None:
+        try:
+            parsed = parse.parse_obligations(lines[0] if lines else ''), parse.parse_proof('\n'.join(preprocess(lines[1:])))
+        except ParseException as e:
+            print(e.explain(depth=0), file=log)
+            return Result(False, error=e.explain(depth=0), log=log_contents(log))
+        if compiled is not None:
+            compiled.save(text, *parsed)
+    obligations, main_proof = parsed
+    ctx.add_proof_tree(main_proof)
+
+    if lazy:
+        checked = ctx.check_lazy(obligations)
+    elif parallel > 1:
+        from parallel import check_parallel
+        checked = check_parallel(ctx, parallel, keep_going)
+    elif keep_going:
+        checked = ctx.check_all()
+    else:
+        checked = ctx.check()
+    if checked and semantic:
+        checked = cross_check(ctx, log)
+    if cache is not None:
+        cache.save()
+    recorded = line_results(ctx) if record else []
+    if not checked and not ctx.errors:
+        return Result(False, obligations, error=ctx.error, log=log_contents(log), lines=recorded)
+
+    result = check_obligations(ctx, obligations, log)
+    result.lines = recorded
+    if not checked:
+        # some lines failed, but the ones that passed may still meet obligations
+        result.passed, result.error, result.errors = False, ctx.error, dict(ctx.errors)
+    return result
+
+
+def check_obligations(ctx: Context, obligations: List[Prop], log: Optional[TextIO] = None) -> Result:
+    # which obligations a checked proof concludes, and from which hypotheses
+    assert ctx.main_proof is not None
+    hyp, deds = ctx.proof_types[ctx.main_proof]
+    unmet = unmet_obligations(obligations, deds)
+    hypotheses = {h for h in hyp if not is_axiom(h)}
+    return Result(not unmet, obligations, unmet, hypotheses, log=log_contents(log) if log is not None else '')
+
+
+def unmet_obligations(obligations: List[Prop], deds: Set[Prop]) -> List[Prop]:
+    # an obligation is also met by a line that only orders or groups its /\ and \/ operands
+    # differently (`props.ac_equal`, against all of them at once)
+    unmet = [obligation for obligation in obligations if obligation not in deds]
+    if unmet:
+        proven = {canonical(ded) for ded in deds}
+        unmet = [obligation for obligation in unmet if canonical(obligation) not in proven]
+    return unmet
+
+
+def log_contents(log: TextIO) -> str:
+    return log.getvalue() if isinstance(log, io.StringIO) else ''
+
+
+def check_validity(text: str, parser: str = 'fast') -> Tuple[List[Prop], List[Tuple[Prop, Optional[Dict[Prop, bool]]]]]:
+    # whether each obligation follows from the premises of the proof, without
+    # checking any of its steps; quantified formulas are atoms to the SAT solver
+    from sat import countermodel
+    parse = PARSERS[parser]
+    lines = text.splitlines()
+    obligations = parse.parse_obligations(lines[0] if lines else '')
+    main = parse.parse_proof('\n'.join(preprocess(lines[1:])))
+    premises = [line.typ for line in main.lines.values() if line.just.name == 'prem']
+    return premises, [(obligation, countermodel(premises, obligation)) for obligation in obligations]
+
+
+def is_propositional(p: Prop) -> bool:
+    return not get_symbols(p)[1]
+
+
+def is_first_order(p: Prop) -> bool:
+    # mentions a predicate or a quantifier, so only a domain of objects can falsify it
+    meta = metadata(p)
+    return bool(meta.symbols) or any(isinstance(atom, Predicate) for atom in meta.atoms)
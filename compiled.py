@@ -0,0 +1,128 @@
+from __future__ import annotations
+import hashlib
+import marshal
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from arguments import UninterpJust
+from cache import cache_path, checker_fingerprint
+from proof import Line, Proof
+from props import And, BaseProp, Exists, ForAll, Imp, ModelRef, Or, Predicate, Prop
+
+# The parsed form of a proof, saved next to it as `.<name>.mousec` so that an
+# unchanged file is never parsed twice. Formulas are stored as one flat table
+# of nodes, children before parents, each row (kind, a, b) naming its children
+# by their index in the table; the whole file is read back with marshal and the
+# nodes rebuilt (and interned) in one pass over the table. The file also records
+# the checker it was written by (`cache.checker_fingerprint`), and is ignored by
+# any other.
+
+COMPILED_VERSION = 2
+
+BASE, REF, AND, OR, IMP, FORALL, EXISTS, PREDICATE = range(8)
+KINDS = {BaseProp: BASE, ModelRef: REF, And: AND, Or: OR, Imp: IMP, ForAll: FORALL, Exists: EXISTS, Predicate: PREDICATE}
+# index of `False`, the consequent of a negation
+FALSE = -1
+
+
+def source_hash(text: str) -> str:
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+class Encoder:
+    def __init__(self) -> None:
+        self.index: Dict[Any, int] = {}
+        self.table: List[Tuple[int, Any, Any]] = []
+
+    def node(self, root: Any) -> int:
+        # iterative post-order, so deep formulas don't hit the recursion limit
+        stack = [root]
+        while stack:
+            p = stack[-1]
+            if p is False or p in self.index:
+                stack.pop()
+                continue
+            children = self.children(p)
+            pending = [c for c in children if c is not False and c not in self.index]
+            if pending:
+                stack += pending
+                continue
+            stack.pop()
+            kind = KINDS[type(p)]
+            if kind in (BASE, REF):
+                row = (kind, p.name, None)
+            elif kind == PREDICATE:
+                row = (kind, self.index[p.name], tuple(self.index[arg] for arg in p.args))
+            else:
+                row = (kind, *(FALSE if c is False else self.index[c] for c in children))
+            self.index[p] = len(self.table)
+            self.table.append(row)
+        return FALSE if root is False else self.index[root]
+
+    @staticmethod
+    def children(p: Any) -> Tuple[Any, ...]:
+        if isinstance(p, (And, Or, Imp)):
+            return p.p, p.q
+        if isinstance(p, (ForAll, Exists)):
+            return p.var, p.formula
+        if isinstance(p, Predicate):
+            return (p.name, *p.args)
+        return ()
+
+    def proof(self, proof: Proof) -> tuple:
+        lines = tuple((line.num, self.node(line.typ), line.just.name, tuple(line.just.args)) for line in proof.lines.values())
+        return lines, tuple(self.proof(subproof) for subproof in proof.subproofs)
+
+
+def decode_nodes(table: List[Tuple[int, Any, Any]]) -> List[Prop]:
+    nodes: List[Any] = []
+    append = nodes.append
+    for kind, a, b in table:
+        if kind == BASE:
+            append(BaseProp(a))
+        elif kind == REF:
+            append(ModelRef(a))
+        elif kind == PREDICATE:
+            append(Predicate(nodes[a], tuple(nodes[i] for i in b)))
+        else:
+            append((None, None, And, Or, Imp, ForAll, Exists)[kind](nodes[a], False if b == FALSE else nodes[b]))
+    return nodes
+
+
+def decode_proof(data: tuple, nodes: List[Prop]) -> Proof:
+    lines, subproofs = data
+    return Proof([Line(num, nodes[typ], UninterpJust(name, list(args))) for num, typ, name, args in lines],
+                 [decode_proof(subproof, nodes) for subproof in subproofs])
+
+
+class CompiledCache:
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    @classmethod
+    def for_proof(cls, proof_path: str) -> CompiledCache:
+        return cls(cache_path(proof_path, 'mousec'))
+
+    def load(self, text: str) -> Optional[Tuple[List[Prop], Proof]]:
+        # the obligations and proof tree of `text`, if this checker saved them from exactly this text
+        try:
+            with open(self.path, 'rb') as f:
+                version, checker, digest, table, obligations, proof = marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        if version != COMPILED_VERSION or checker != checker_fingerprint() or digest != source_hash(text):
+            return None
+        nodes = decode_nodes(table)
+        return [nodes[i] for i in obligations], decode_proof(proof, nodes)
+
+    def save(self, text: str, obligations: List[Prop], proof: Proof):
+        encoder = Encoder()
+        obligation_nodes = tuple(encoder.node(obligation) for obligation in obligations)
+        data = (COMPILED_VERSION, checker_fingerprint(), source_hash(text), encoder.table, obligation_nodes, encoder.proof(proof))
+        try:
+            # written under another name first, so a concurrent reader never sees half a file
+            with open(self.path + '.tmp', 'wb') as f:
+                marshal.dump(data, f)
+            os.replace(self.path + '.tmp', self.path)
+        except OSError:
+            pass
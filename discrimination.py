@@ -0,0 +1,74 @@
+from __future__ import annotations
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+
+from props import And, Exists, ForAll, Imp, ModelRefHole, Or, Prop, PropHole
+from unification import RewriteRule, rewrite_rules
+
+# A discrimination tree indexes patterns by the preorder sequence of their
+# constructors, with holes as wildcards. Retrieving a term walks the tree along
+# the term's own preorder sequence, so only patterns whose shape fits the term
+# are returned, without trying to unify against every one of them.
+
+WILD = '*'
+END = None
+
+Entry = Tuple[int, str, RewriteRule, int]
+
+
+def _key(p: Prop) -> Tuple[Any, Tuple[Prop, ...]]:
+    if isinstance(p, (PropHole, ModelRefHole)):
+        return WILD, ()
+    if isinstance(p, (And, Or, Imp)):
+        return type(p), (p.p, p.q)
+    if isinstance(p, (ForAll, Exists)):
+        return type(p), (p.var, p.formula)
+    # atoms, predicates and True/False are matched as themselves
+    return p, ()
+
+
+class DiscriminationTree:
+    def __init__(self) -> None:
+        self.root: Dict[Any, Any] = {}
+        
+    def insert(self, pattern: Prop, entry: Entry):
+        node = self.root
+        pending: List[Prop] = [pattern]
+        while pending:
+            key, children = _key(pending.pop())
+            node = node.setdefault(key, {})
+            pending.extend(reversed(children))
+        node.setdefault(END, []).append(entry)
+        
+    def retrieve(self, term: Prop) -> List[Entry]:
+        found: List[Entry] = []
+        stack = [(self.root, (term,))]
+        while stack:
+            node, pending = stack.pop()
+            if not pending:
+                found.extend(node.get(END, ()))
+                continue
+            head, rest = pending[0], pending[1:]
+            if WILD in node:
+                # a hole swallows the whole subterm
+                stack.append((node[WILD], rest))
+            key, children = _key(head)
+            if key is not WILD and key in node:
+                stack.append((node[key], children + rest))
+        return sorted(found, key=lambda entry: entry[0])
+
+
+def build_rule_index() -> DiscriminationTree:
+    index = DiscriminationTree()
+    for order, (name, rule) in enumerate(rewrite_rules.items()):
+        compiled = RewriteRule(rule)
+        # the side being rewritten can be either one, since equivalences run both ways
+        index.insert(rule[0], (order, name, compiled, 0))
+        index.insert(rule[1], (order, name, compiled, 1))
+    return index
+
+
+@lru_cache(maxsize=None)
+def rule_index() -> DiscriminationTree:
+    # built the first time `eq` needs it, so checking proofs without it never pays for it
+    return build_rule_index()
@@ -0,0 +1,305 @@
+from __future__ import annotations
+import re
+from typing import List, NamedTuple, Optional
+
+from props import And, BaseProp, Exists, ForAll, Imp, Not, Or, ModelRef, Predicate, Prop
+from arguments import UninterpJust
+from proof import Line, Proof
+
+r"""
+Hand-written replacement for the pyparsing grammar in proof_parser.py, producing
+the same ASTs. Formulas are parsed by precedence climbing (on an explicit stack):
+
+    ->   right associative, binds loosest
+    \/   left associative
+    /\   left associative
+    ~    prefix, binds tightest
+
+Quantifiers (`forall x, form`, `exists x, form`) may only start a formula, and
+extend as far right as possible.
+"""
+
+_token = re.compile(r'(?P<comment>/\*.*?\*/)|(?P<num>[0-9]+)|(?P<word>[A-Za-z_]+)|(?P<sym>/\\|\\/|->|[~(),;.{}\-])', re.S)
+_space = re.compile(r'\s*')
+_just_name = re.compile(r'[a-z_]+')
+
+BINARY = {'->': (1, Imp), '\\/': (2, Or), '/\\': (3, And)}
+
+
+class ParseException(Exception):
+    # shaped like pyparsing's ParseException, which both parsers raise (see
+    # proof_parser.py); pyparsing is slow to import, so it is only loaded to
+    # format the message of one
+    def __init__(self, pstr: str, loc: int = 0, msg: str = '') -> None:
+        super().__init__(pstr, loc, msg)
+        self.pstr = pstr
+        self.loc = loc
+        self.msg = msg
+
+    @property
+    def lineno(self) -> int:
+        return self.pstr.count('\n', 0, self.loc) + 1
+
+    def _pyparsing(self) -> Exception:
+        from pyparsing import ParseException as Formatter
+        return Formatter(self.pstr, self.loc, self.msg)
+
+    def explain(self, depth: int = 0) -> str:
+        # only the failing line, a marker and the message; there is no grammar to trace
+        return self._pyparsing().explain(depth=0)  # type: ignore
+
+    def __str__(self) -> str:
+        return str(self._pyparsing())
+
+
+class Token(NamedTuple):
+    kind: str
+    text: str
+    start: int
+    end: int
+
+
+class Lexer:
+    # tokens are produced on demand from a position, so the parser can take
+    # part of a word (`Cmp` is the proposition `C` followed by `mp`)
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.pos = 0
+        self._peeked: Optional[Token] = None
+
+    def peek(self) -> Token:
+        if self._peeked is None or self._peeked.start < self.pos:
+            start = _space.match(self.text, self.pos).end()
+            if start == len(self.text):
+                self._peeked = Token('end', '', start, start)
+            else:
+                m = _token.match(self.text, start)
+                if m is None:
+                    self._peeked = Token('error', self.text[start], start, start + 1)
+                else:
+                    self._peeked = Token(m.lastgroup, m.group(), start, m.end())
+        return self._peeked
+
+    def next(self) -> Token:
+        tok = self.peek()
+        self.pos = tok.end
+        return tok
+
+    def advance_to(self, pos: int):
+        self.pos = pos
+        self._peeked = None
+
+
+class Parser:
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.lexer = Lexer(text)
+
+    def error(self, expected: str, tok: Optional[Token] = None):
+        tok = tok or self.lexer.peek()
+        raise ParseException(self.text, tok.start, f'Expected {expected}')
+
+    def expect(self, sym: str) -> Token:
+        tok = self.lexer.peek()
+        if tok.kind != 'sym' or tok.text != sym:
+            self.error(repr(sym))
+        return self.lexer.next()
+
+    def at(self, sym: str) -> bool:
+        tok = self.lexer.peek()
+        return tok.kind == 'sym' and tok.text == sym
+
+    def followed_by_paren(self, tok: Token) -> bool:
+        m = _space.match(self.text, tok.end)
+        return self.text.startswith('(', m.end())
+
+    def finish(self):
+        tok = self.lexer.peek()
+        if tok.kind != 'end':
+            self.error('end of text', tok)
+
+    # formulas
+
+    def form(self) -> Prop:
+        # precedence climbing, with what a recursive parser would keep on the call
+        # stack kept in `frames` instead, so nesting depth is only bounded by memory
+        frames: List[list] = []
+        push, lexer = frames.append, self.lexer
+        starts_form = True
+        while True:
+            # down: open a frame for everything the next atom is nested in
+            while True:
+                if starts_form:
+                    quantifier = self.quantifier()
+                    if quantifier is not None:
+                        push(['quantifier', *quantifier])
+                        continue
+                    push(['binary', 1, None, None])
+                    starts_form = False
+                tok = lexer.peek()
+                if tok.kind == 'sym' and tok.text == '(':
+                    lexer.next()
+                    push(['paren'])
+                    starts_form = True
+                elif tok.kind == 'sym' and tok.text == '~':
+                    lexer.next()
+                    push(['not'])
+                else:
+                    value = self.atom()
+                    break
+            # up: close frames until a binary operator needs its right operand
+            while frames:
+                frame = frames[-1]
+                kind = frame[0]
+                if kind == 'binary':
+                    _, min_prec, lhs, op = frame
+                    if op is not None:
+                        value = op(lhs, value)
+                    tok = lexer.peek()
+                    binary = BINARY.get(tok.text) if tok.kind == 'sym' else None
+                    if binary is not None and binary[0] >= min_prec:
+                        lexer.next()
+                        prec, op = binary
+                        frame[2], frame[3] = value, op
+                        push(['binary', prec if op is Imp else prec + 1, None, None])
+                        break
+                elif kind == 'paren':
+                    self.expect(')')
+                elif kind == 'not':
+                    value = Not(value)
+                else:
+                    value = frame[1](frame[2], value)
+                frames.pop()
+            else:
+                return value
+
+    def quantifier(self) -> Optional[tuple]:
+        # (Exists or ForAll, variable) if a quantifier starts here, up to its `,`
+        tok = self.lexer.peek()
+        if tok.kind == 'word' and not self.followed_by_paren(tok):
+            for keyword, quantifier in (('exists', Exists), ('forall', ForAll)):
+                if tok.text.startswith(keyword):
+                    self.lexer.advance_to(tok.start + len(keyword))
+                    var = self.model_ref()
+                    self.expect(',')
+                    return quantifier, var
+        return None
+
+    def atom(self) -> Prop:
+        tok = self.lexer.peek()
+        if tok.kind == 'word':
+            if self.followed_by_paren(tok):
+                return self.predicate()
+            if tok.text[0].isupper():
+                self.lexer.advance_to(tok.start + 1)
+                return BaseProp(tok.text[0])
+        self.error('formula')
+
+    def model_ref(self) -> ModelRef:
+        tok = self.lexer.peek()
+        if tok.kind != 'word' or '_' in tok.text:
+            self.error('variable')
+        self.lexer.next()
+        return ModelRef(tok.text)
+
+    def predicate(self) -> Predicate:
+        name = self.model_ref().name
+        self.expect('(')
+        args = [self.model_ref()]
+        while self.at(','):
+            self.lexer.next()
+            args.append(self.model_ref())
+        self.expect(')')
+        return Predicate(BaseProp(name), tuple(args))
+
+    def obligations(self) -> List[Prop]:
+        forms = [self.form()]
+        while self.at(','):
+            self.lexer.next()
+            forms.append(self.form())
+        self.finish()
+        return forms
+
+    # proofs
+
+    def num(self) -> int:
+        tok = self.lexer.peek()
+        if tok.kind != 'num':
+            self.error('line number')
+        self.lexer.next()
+        return int(tok.text)
+
+    def just(self) -> UninterpJust:
+        tok = self.lexer.peek()
+        m = _just_name.match(tok.text) if tok.kind == 'word' else None
+        if m is None:
+            self.error('justification')
+        self.lexer.advance_to(tok.start + m.end())
+        args: List[int] = []
+        if self.lexer.peek().kind == 'num':
+            args.append(self.num())
+            if self.at('-'):
+                self.lexer.next()
+                args = list(range(args[0], self.num() + 1))
+            else:
+                while self.at(','):
+                    self.lexer.next()
+                    args.append(self.num())
+        return UninterpJust(m.group(), args)
+
+    def line(self) -> Line:
+        num_tok = self.lexer.peek()
+        num = self.num()
+        dot = self.lexer.peek()
+        if dot.start != num_tok.end:
+            self.error("'.'")
+        self.expect('.')
+        typ = self.form()
+        just = self.just()
+        self.expect(';')
+        return Line(num, typ, just)
+
+    def proof(self) -> Proof:
+        lines: List[Line] = []
+        subproofs: List[Proof] = []
+        items = 0
+        while True:
+            tok = self.lexer.peek()
+            if tok.kind == 'comment':
+                self.lexer.next()
+            elif tok.kind == 'num':
+                lines.append(self.line())
+            elif tok.kind == 'sym' and tok.text == '{':
+                self.lexer.next()
+                subproofs.append(self.proof())
+                self.expect('}')
+            elif items == 0:
+                self.error('proof line')
+            else:
+                return Proof(lines, subproofs)
+            items += 1
+
+
+def parse_form(text: str) -> Prop:
+    parser = Parser(text)
+    form = parser.form()
+    parser.finish()
+    return form
+
+
+def parse_obligations(text: str) -> List[Prop]:
+    return Parser(text).obligations()
+
+
+def parse_proof(text: str) -> Proof:
+    parser = Parser(text)
+    proof = parser.proof()
+    parser.finish()
+    return proof
+
+
+def parse_line(text: str) -> Line:
+    parser = Parser(text)
+    line = parser.line()
+    parser.finish()
+    return line
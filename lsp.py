@@ -0,0 +1,238 @@
+from __future__ import annotations
+import io
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import traceback
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+
+
+from arguments import UninterpJust
+from cache import LineCache
+from checker import check_obligations
+from fast_parser import ParseException, parse_line, parse_obligations
+from proof import Context, Line, Proof
+from props import Prop
+from stream import iter_events
+
+# A Language Server Protocol server over stdin/stdout (`mouse --lsp`). Each open
+# document remembers the statements it has parsed, by their text, and keeps an
+# in-memory LineCache, so re-checking after an edit only parses the statements
+# that changed and only verifies the lines whose citations changed. Edits are
+# debounced: a document is checked once no edit has arrived for DEBOUNCE seconds.
+# Checking keeps going past failed lines, so every independent error is shown.
+
+DEBOUNCE = 0.03
+ERROR = 1
+
+
+class SourceError(Exception):
+    def __init__(self, line: int, message: str) -> None:
+        super().__init__(message)
+        self.line = line
+        self.message = message
+
+
+class Document:
+    def __init__(self, uri: str, text: str, version: int) -> None:
+        self.uri = uri
+        self.text = text
+        self.version = version
+        self.statements: Dict[str, Tuple[int, Prop, UninterpJust]] = {}
+        # the statements the current check has parsed, which replace `statements` once it is done
+        self.seen: Dict[str, Tuple[int, Prop, UninterpJust]] = {}
+        self.cache = LineCache()
+        # when the document should next be checked
+        self.due: Optional[float] = None
+
+    def parse(self, statement: str, lineno: int) -> Line:
+        parsed = self.statements.get(statement)
+        if parsed is None:
+            try:
+                line = parse_line(statement)
+            except ParseException as e:
+                # a missing `;` is found at the end of the text, but belongs on the last line of the statement
+                offset = min(e.loc, len(statement.rstrip()))
+                raise SourceError(lineno + statement.count('\n', 0, offset), e.msg) from None
+            parsed = self.statements[statement] = line.num, line.typ, line.just
+        self.seen[statement] = parsed
+        # checking fills in a Line, so every check gets fresh ones
+        return Line(*parsed)
+
+    def edit(self, change: Dict[str, Any]):
+        if 'range' not in change:
+            self.text = change['text']
+            return
+        start, end = (self.offset(change['range'][side]) for side in ('start', 'end'))
+        self.text = self.text[:start] + change['text'] + self.text[end:]
+
+    def offset(self, position: Dict[str, int]) -> int:
+        # positions count characters, which for proofs (plain ASCII) are UTF-16 code units too
+        offset = 0
+        for _ in range(position['line']):
+            newline = self.text.find('\n', offset)
+            if newline < 0:
+                return len(self.text)
+            offset = newline + 1
+        return offset + position['character']
+
+
+def diagnose(doc: Document) -> List[Tuple[int, str]]:
+    # (0-based line, message) for everything wrong with the document
+    lines = doc.text.splitlines()
+    try:
+        obligations = parse_obligations(lines[0] if lines else '')
+    except ParseException as e:
+        return [(0, e.msg)]
+
+    blocks: List[Tuple[List[Line], List[Proof]]] = [([], [])]
+    linenos: Dict[int, int] = {}
+    doc.seen = {}
+    try:
+        for kind, line, lineno in iter_events(lines[1:], 2, doc.parse):
+            if kind == 'open':
+                blocks.append(([], []))
+            elif kind == 'close':
+                body, subproofs = blocks.pop()
+                blocks[-1][1].append(Proof(body, subproofs))
+            else:
+                assert line is not None
+                blocks[-1][0].append(line)
+                linenos.setdefault(line.num, lineno)
+    except SourceError as e:
+        # keep what was parsed before: the rest of the text is likely to come back once the error is fixed
+        return [(e.line - 1, e.message)]
+    # forget statements that are no longer in the text
+    doc.statements = doc.seen
+
+    ctx = Context(io.StringIO())
+    ctx.cache = doc.cache
+    ctx.add_proof_tree(Proof(*blocks[0]))
+    doc.cache.used = {}
+    checked = ctx.check_all()
+    # drop cache entries for lines that no longer exist
+    if len(doc.cache.entries) > 2 * len(ctx.lines) + 100:
+        doc.cache.entries = dict(doc.cache.used)
+    if not checked and not ctx.errors:
+        return [(0, str(ctx.error))]
+    problems = [(linenos.get(num, 1) - 1, error) for num, error in ctx.errors.items()]
+    result = check_obligations(ctx, obligations)
+    return problems + [(0, f'Proof obligation {obligation} not met!') for obligation in result.unmet]
+
+
+class Server:
+    def __init__(self, stdin: BinaryIO, stdout: BinaryIO) -> None:
+        self.stdin = stdin
+        self.stdout = stdout
+        self.documents: Dict[str, Document] = {}
+        self.messages: queue.Queue = queue.Queue()
+        self.shutdown = False
+
+    def read_messages(self):
+        # runs on its own thread, so edits keep arriving while a document is checked
+        while True:
+            length = None
+            while True:
+                header = self.stdin.readline()
+                if not header:
+                    self.messages.put(None)
+                    return
+                header = header.strip()
+                if not header:
+                    break
+                name, _, value = header.decode('ascii').partition(':')
+                if name.strip().lower() == 'content-length':
+                    length = int(value)
+            if length is not None:
+                self.messages.put(json.loads(self.stdin.read(length)))
+
+    def send(self, message: Dict[str, Any]):
+        body = json.dumps(message).encode()
+        self.stdout.write(b'Content-Length: %d\r\n\r\n' % len(body) + body)
+        self.stdout.flush()
+
+    def serve(self) -> int:
+        threading.Thread(target=self.read_messages, daemon=True).start()
+        while True:
+            self.check_due()
+            due = [doc.due for doc in self.documents.values() if doc.due is not None]
+            timeout = max(0.0, min(due) - time.monotonic()) if due else None
+            try:
+                message = self.messages.get(timeout=timeout)
+            except queue.Empty:
+                continue
+            if message is None:
+                return 1
+            if message.get('method') == 'exit':
+                return 0 if self.shutdown else 1
+            self.handle(message)
+
+    def handle(self, message: Dict[str, Any]):
+        method, params = message.get('method'), message.get('params') or {}
+        if 'id' in message and method is not None:
+            if method == 'initialize':
+                # incremental sync: edits arrive as ranges
+                self.reply(message, {'capabilities': {'textDocumentSync': {'openClose': True, 'change': 2}},
+                                     'serverInfo': {'name': 'mouse'}})
+            elif method == 'shutdown':
+                self.shutdown = True
+                self.reply(message, None)
+            else:
+                self.send({'jsonrpc': '2.0', 'id': message['id'],
+                           'error': {'code': -32601, 'message': f'{method} is not supported'}})
+        elif method == 'textDocument/didOpen':
+            item = params['textDocument']
+            doc = self.documents[item['uri']] = Document(item['uri'], item['text'], item.get('version', 0))
+            doc.due = time.monotonic()
+        elif method == 'textDocument/didChange':
+            doc = self.documents.get(params['textDocument']['uri'])
+            if doc is None:
+                return
+            for change in params['contentChanges']:
+                doc.edit(change)
+            doc.version = params['textDocument'].get('version', doc.version)
+            doc.due = time.monotonic() + DEBOUNCE
+        elif method == 'textDocument/didClose':
+            uri = params['textDocument']['uri']
+            self.documents.pop(uri, None)
+            self.publish(uri, None, [])
+
+    def reply(self, message: Dict[str, Any], result: Any):
+        self.send({'jsonrpc': '2.0', 'id': message['id'], 'result': result})
+
+    def check_due(self):
+        now = time.monotonic()
+        for doc in list(self.documents.values()):
+            if doc.due is None or doc.due > now:
+                continue
+            doc.due = None
+            try:
+                problems = diagnose(doc)
+            except Exception:
+                traceback.print_exc(file=sys.stderr)
+                continue
+            self.publish(doc.uri, doc.version, problems, doc.text.splitlines())
+
+    def publish(self, uri: str, version: Optional[int], problems: List[Tuple[int, str]],
+                lines: Optional[List[str]] = None):
+        if lines is None:
+            lines = []
+        diagnostics = []
+        for line, message in problems:
+            width = len(lines[line]) if 0 <= line < len(lines) else 0
+            diagnostics.append({'range': {'start': {'line': line, 'character': 0}, 'end': {'line': line, 'character': width}},
+                                'severity': ERROR, 'source': 'mouse', 'message': message})
+        params: Dict[str, Any] = {'uri': uri, 'diagnostics': diagnostics}
+        if version is not None:
+            params['version'] = version
+        self.send({'jsonrpc': '2.0', 'method': 'textDocument/publishDiagnostics', 'params': params})
+
+
+def serve() -> int:
+    code = Server(sys.stdin.buffer, sys.stdout.buffer).serve()
+    sys.stdout.flush()
+    # the reader thread may still be blocked on stdin, which would stall a normal shutdown
+    os._exit(code)
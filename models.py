@@ -0,0 +1,236 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+import time
+from typing import TYPE_CHECKING, Dict, FrozenSet, Iterator, List, Optional, Set, Tuple
+
+from props import And, BaseProp, Exists, ForAll, Imp, ModelRef, Or, Predicate, Prop
+from semantic import available
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Countermodel search over small finite domains {0, ..., n-1}. A batch of
+# interpretations is evaluated at once: each predicate of arity k is a boolean
+# array of shape (batch, n, ..., n), formulas evaluate to arrays with one axis
+# per variable in scope, and quantifiers reduce their variable's axis with
+# all/any. Constants are assigned up to renaming of the domain (each constant is
+# at most one more than the largest element used so far), and the predicate
+# tables are enumerated exhaustively when there are few enough of them, and
+# sampled at random otherwise.
+
+BATCH = 4096
+EXHAUSTIVE_BITS = 20
+# batches sampled per assignment of the constants when there are too many tables to try them all
+SAMPLED_BATCHES = 8
+
+
+@dataclass
+class Model:
+    size: int
+    constants: Dict[ModelRef, int] = field(default_factory=dict)
+    # predicates by name and arity, as the set of tuples they hold for
+    relations: Dict[Tuple[BaseProp, int], Set[Tuple[int, ...]]] = field(default_factory=dict)
+    props: Dict[BaseProp, bool] = field(default_factory=dict)
+
+    def __str__(self) -> str:
+        out = [f'domain {{{", ".join(map(str, range(self.size)))}}}']
+        out += [f'{c} = {value}' for c, value in sorted(self.constants.items(), key=repr)]
+        names = [name for name, _ in self.relations]
+        for (name, arity), holds in sorted(self.relations.items(), key=repr):
+            shown = [str(t[0]) if arity == 1 else f'({", ".join(map(str, t))})' for t in sorted(holds)]
+            # the same name can be used at several arities
+            label = f'{name}/{arity}' if names.count(name) > 1 else f'{name}'
+            out.append(f'{label} = {{{", ".join(shown)}}}')
+        out += [f'{p} = {"T" if value else "F"}' for p, value in sorted(self.props.items(), key=repr)]
+        return '\n'.join(out)
+
+
+@dataclass
+class Signature:
+    constants: List[ModelRef]
+    relations: List[Tuple[BaseProp, int]]
+    props: List[BaseProp]
+
+    @staticmethod
+    def of(formulas: List[Prop]) -> Signature:
+        constants: Set[ModelRef] = set()
+        relations: Set[Tuple[BaseProp, int]] = set()
+        props: Set[BaseProp] = set()
+        stack: List[Tuple[Prop, FrozenSet[ModelRef]]] = [(formula, frozenset()) for formula in formulas]
+        while stack:
+            p, bound = stack.pop()
+            if isinstance(p, (And, Or, Imp)):
+                stack += [(p.p, bound), (p.q, bound)]
+            elif isinstance(p, (ForAll, Exists)):
+                stack.append((p.formula, bound | {p.var}))
+            elif isinstance(p, Predicate):
+                relations.add((p.name, len(p.args)))
+                constants.update(arg for arg in p.args if arg not in bound)
+            elif isinstance(p, BaseProp):
+                props.add(p)
+        return Signature(sorted(constants, key=repr), sorted(relations, key=repr), sorted(props, key=repr))
+
+
+class Evaluator:
+    # evaluates formulas over a batch of interpretations with fixed constants
+    def __init__(self, size: int, batch: int, constants: Dict[ModelRef, int],
+                 relations: Dict[Tuple[BaseProp, int], np.ndarray], props: Dict[BaseProp, np.ndarray]) -> None:
+        self.size = size
+        self.batch = batch
+        self.constants = constants
+        self.relations = relations
+        self.props = props
+        self.cache: Dict[Tuple[Prop, Tuple[ModelRef, ...]], np.ndarray] = {}
+
+    def shape(self, scope: Tuple[ModelRef, ...]) -> Tuple[int, ...]:
+        return (self.batch,) + (self.size,) * len(scope)
+
+    def eval(self, root: Prop, scope: Tuple[ModelRef, ...] = ()) -> np.ndarray:
+        # children before parents, on an explicit stack so deep formulas are fine
+        stack = [(root, scope, False)]
+        while stack:
+            p, scope, expanded = stack.pop()
+            if (p, scope) in self.cache:
+                continue
+            children = self.children(p, scope)
+            if children and not expanded:
+                stack.append((p, scope, True))
+                stack += [(child, inner, False) for child, inner in reversed(children)]
+                continue
+            self.cache[p, scope] = self._eval(p, scope)
+        return self.cache[root, scope]
+
+    @staticmethod
+    def children(p: Prop, scope: Tuple[ModelRef, ...]) -> List[Tuple[Prop, Tuple[ModelRef, ...]]]:
+        if isinstance(p, Imp) and p.q is False:
+            return [(p.p, scope)]
+        if isinstance(p, (And, Or, Imp)):
+            return [(p.p, scope), (p.q, scope)]
+        if isinstance(p, (ForAll, Exists)):
+            return [(p.formula, scope + (p.var,))]
+        return []
+
+    def _eval(self, p: Prop, scope: Tuple[ModelRef, ...]) -> np.ndarray:
+        # one node, once its children are in the cache
+        import numpy as np
+        shape = self.shape(scope)
+        cache = self.cache
+        if p is False:
+            return np.zeros(shape, dtype=bool)
+        if isinstance(p, Imp) and p.q is False:
+            return ~cache[p.p, scope]
+        if isinstance(p, Imp):
+            return ~cache[p.p, scope] | cache[p.q, scope]
+        if isinstance(p, And):
+            return cache[p.p, scope] & cache[p.q, scope]
+        if isinstance(p, Or):
+            return cache[p.p, scope] | cache[p.q, scope]
+        if isinstance(p, (ForAll, Exists)):
+            body = cache[p.formula, scope + (p.var,)]
+            return body.all(axis=-1) if isinstance(p, ForAll) else body.any(axis=-1)
+        if isinstance(p, BaseProp):
+            return np.broadcast_to(self.props[p].reshape((self.batch,) + (1,) * len(scope)), shape)
+        assert isinstance(p, Predicate)
+        ones = (1,) * len(scope)
+        index: List[object] = [np.arange(self.batch).reshape((self.batch,) + ones)]
+        for arg in p.args:
+            if arg in scope:
+                # the innermost binding of a variable is the last one in scope
+                axis = len(scope) - 1 - scope[::-1].index(arg)
+                index.append(np.arange(self.size).reshape((1,) + tuple(self.size if k == axis else 1 for k in range(len(scope)))))
+            else:
+                index.append(self.constants[arg])
+        return np.broadcast_to(self.relations[p.name, len(p.args)][tuple(index)], shape)
+
+
+def constant_assignments(count: int, size: int) -> Iterator[Tuple[int, ...]]:
+    # each constant names an element already used or the next unused one, which
+    # skips assignments that only differ by renaming the domain
+    def extend(prefix: Tuple[int, ...], used: int) -> Iterator[Tuple[int, ...]]:
+        if len(prefix) == count:
+            yield prefix
+            return
+        for value in range(min(used + 1, size)):
+            yield from extend(prefix + (value,), max(used, value + 1))
+    return extend((), 0)
+
+
+@dataclass
+class Search:
+    model: Optional[Model] = None
+    # largest domain size searched exhaustively, and the largest one looked at at all
+    exhausted: int = 0
+    sampled: int = 0
+    interpretations: int = 0
+
+
+def find_countermodel(premises: List[Prop], conclusion: Prop, max_size: int = 4, timeout: float = 2.0,
+                      seed: int = 0) -> Search:
+    # a finite interpretation making every premise true and the conclusion false
+    assert available(), 'The countermodel search needs numpy (pip install proof-mouse[semantic])'
+    import numpy as np
+
+    deadline = time.monotonic() + timeout
+    sig = Signature.of(premises + [conclusion])
+    rng = np.random.default_rng(seed)
+    search = Search()
+    for size in range(1, max_size + 1):
+        widths = [size ** arity for _, arity in sig.relations] + [1] * len(sig.props)
+        bits = sum(widths)
+        exhaustive = bits <= EXHAUSTIVE_BITS
+        for values in constant_assignments(len(sig.constants), size):
+            constants = dict(zip(sig.constants, values))
+            batches = range(0, 1 << bits, BATCH) if exhaustive else range(SAMPLED_BATCHES)
+            for start in batches:
+                if time.monotonic() > deadline:
+                    return search
+                if exhaustive:
+                    codes = np.arange(start, min(start + BATCH, 1 << bits), dtype=np.int64)
+                    table = ((codes[:, None] >> np.arange(bits, dtype=np.int64)) & 1).astype(bool)
+                else:
+                    table = rng.random((BATCH, bits)) < 0.5
+                model = check_batch(sig, size, constants, widths, table, premises, conclusion)
+                search.interpretations += len(table)
+                if model is not None:
+                    search.model = model
+                    search.sampled = size
+                    return search
+        search.sampled = size
+        if exhaustive and search.exhausted == size - 1:
+            search.exhausted = size
+    return search
+
+
+def check_batch(sig: Signature, size: int, constants: Dict[ModelRef, int], widths: List[int], table: np.ndarray,
+                premises: List[Prop], conclusion: Prop) -> Optional[Model]:
+    # the first interpretation in `table` (one row of bits per interpretation) that is a countermodel
+    import numpy as np
+    batch = len(table)
+    relations, props, offset = {}, {}, 0
+    for (name, arity), width in zip(sig.relations, widths):
+        relations[name, arity] = table[:, offset:offset + width].reshape((batch,) + (size,) * arity)
+        offset += width
+    for p in sig.props:
+        props[p] = table[:, offset]
+        offset += 1
+    ev = Evaluator(size, batch, constants, relations, props)
+    found = ~ev.eval(conclusion)
+    for premise in premises:
+        found &= ev.eval(premise)
+    hits = np.flatnonzero(found)
+    if not len(hits):
+        return None
+    k = int(hits[0])
+    return Model(size, constants, {key: {tuple(map(int, t)) for t in np.argwhere(rel[k])} for key, rel in relations.items()},
+                 {p: bool(props[p][k]) for p in sig.props})
+
+
+def describe(search: Search) -> str:
+    if search.model is not None:
+        return f'Countermodel (the premises hold but the obligation does not):\n{search.model}'
+    if search.exhausted == 0:
+        return f'No countermodel among {search.interpretations} interpretations tried before the time ran out.'
+    if search.exhausted == search.sampled:
+        return f'No countermodel with up to {search.exhausted} elements.'
+    return (f'No countermodel with up to {search.exhausted} elements, '
+            f'nor among {search.interpretations} sampled interpretations with up to {search.sampled}.')
@@ -1,56 +1,314 @@
+from __future__ import annotations
 from argparse import ArgumentParser
-from proof_parser import proof, form, ProofActionWithContext
-from proof import Context
-from pyparsing import ParseException, delimited_list
-from typing import List
-
-from props import Not, Or, Prop, PropHole
-from unification import unify
-
-def preprocess(lines: List[str]) -> List[str]:
-    processed_lines: List[str] = []
-    block = []
-    for line in lines:
-        if line.startswith('| '):
-            block.append(line[2:])
+from contextlib import nullcontext
+from functools import partial
+import glob
+import os
+import sys
+import time
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional, Tuple
+
+from checker import (LineResult, Result, check_proof, check_validity, is_axiom, is_first_order,  # noqa: F401 (re-exported)
+                     is_propositional, preprocess)
+from fast_parser import ParseException
+import semantic
+from stream import check_stream
+
+if TYPE_CHECKING:
+    from profiler import Profile
+    from props import Prop
+
+# everything else (the process pool, the caches, the countermodel search, the
+# profiler) is imported where it is used, so that checking one short proof
+# doesn't pay for it at startup
+
+
+def file_caches(input_file: str, cache: bool) -> dict:
+    if not cache:
+        return {}
+    from cache import LineCache
+    from compiled import CompiledCache
+    return dict(cache=LineCache.for_proof(input_file), compiled=CompiledCache.for_proof(input_file))
+
+
+def check_file(input_file: str, cache: bool = False, **options) -> bool:
+    text = open(input_file).read()
+    result = check_proof(text, sys.stdout, **file_caches(input_file, cache), **options)
+    return report(result, options.get('keep_going', False))
+
+
+def stream_file(input_file: str, fail_fast: bool = False) -> bool:
+    with open(input_file) as lines:
+        return report(check_stream(lines, sys.stdout, fail_fast))
+
+
+def report(result: Result, keep_going: bool = False) -> bool:
+    unmet = []
+    for obligation in result.obligations if result.error is None or result.errors else []:
+        if obligation in result.unmet:
+            # tell the student whether the obligation could have been proven at all
+            try:
+                explanation = explain_unmet(sorted(result.hypotheses, key=repr), obligation)
+            except Exception as e:
+                # only a hint; the verdict below still stands
+                explanation = f'Could not look for a countermodel: {type(e).__name__}: {e}'
+            if explanation is not None:
+                print(explanation)
+            if not keep_going:
+                raise Exception(f'Proof obligation {obligation} not met!')
+            unmet.append(obligation)
             continue
-        if len(block):
-            processed_lines += ['{'] + preprocess(block) + ['}']
-            block = []
-        processed_lines.append(line.strip())
-    
-    return processed_lines
+        print(f'{result.hypotheses} |- {obligation}')
+    if keep_going:
+        # everything that went wrong, together at the end
+        for num, error in result.errors.items():
+            print(f'Line {num} failed: {error}')
+        for obligation in unmet:
+            print(f'Proof obligation {obligation} not met!')
+    return result.passed
 
-def is_axiom(p: Prop):
-    a = PropHole('a')
-    return unify(p, Or(a, Not(a)), {}) or unify(p, Or(Not(a), a), {})
 
-def main():    
-    ctx = Context()
-    proof.add_parse_action(ProofActionWithContext(ctx))
+def explain_unmet(hypotheses: List[Prop], obligation: Prop) -> Optional[str]:
+    if not any(map(is_first_order, hypotheses + [obligation])):
+        # a truth table settles it, without searching domains of objects
+        from sat import countermodel
+        model = countermodel(hypotheses, obligation)
+        if model is None:
+            return 'The obligation follows from the premises, but the proof does not conclude it.'
+        return f'Countermodel (the premises hold but the obligation does not): {assignment(model)}'
+    if not semantic.available():
+        return None
+    from models import describe, find_countermodel
+    return describe(find_countermodel(hypotheses, obligation))
 
-    parser = ArgumentParser()
-    parser.add_argument('input_file', type=str)
-    args = parser.parse_args()
+
+def assignment(model: Dict[Prop, bool]) -> str:
+    return ', '.join(f'{atom}={"T" if value else "F"}' for atom, value in sorted(model.items(), key=repr))
+
+
+def precheck_file(input_file: str, parser: str = 'fast') -> bool:
+    # True unless some obligation definitely does not follow from the premises
+    print(input_file)
     try:
-        lines = open(args.input_file).readlines()
-        obligations = delimited_list(form, ',').parse_string(lines[0], parse_all=True)
-        # obligation = form.parse_string(lines[0], parse_all=True)[0]
-        text = '\n'.join(preprocess(lines[1:]))
-        proof.parse_string(text, parse_all=True)
-        if ctx.check():
-            assert ctx.main_proof is not None
-            hyp, deds = ctx.proof_types[ctx.main_proof]
-            non_axiom_hyp = {h for h in hyp if not is_axiom(h)}
-            for obligation in obligations:
-                if obligation in deds:
-                    print(f'{non_axiom_hyp} |- {obligation}')
-                else:
-                    raise Exception(f'Proof obligation {obligation} not met!')
-        
+        premises, verdicts = check_validity(open(input_file).read(), parser)
     except ParseException as e:
         print(e.explain(depth=0))
+        return False
+    ok = True
+    for obligation, model in verdicts:
+        if model is None:
+            print(f'  \u2713 {obligation}')
+            continue
+        falsified = assignment(model)
+        if all(map(is_propositional, premises + [obligation])):
+            ok = False
+            print(f'  \u2717 {obligation} does not follow from the premises (counterexample: {falsified})')
+        else:
+            print(f'  ? {obligation} does not follow propositionally, treating quantified formulas as atoms')
+    return ok
+
+
+class Grade(NamedTuple):
+    path: str
+    passed: bool
+    seconds: float
+    message: str
+    # filled in when grading with record=True, for the structured reporters
+    lines: Tuple[LineResult, ...] = ()
+    obligations: Tuple[str, ...] = ()
+    unmet: Tuple[str, ...] = ()
+
+
+def grade_file(input_file: str, cache: bool = False, **options) -> Grade:
+    # runs inside a pool worker, which imports this module (and so builds the grammar) once
+    start = time.perf_counter()
+    try:
+        text = open(input_file).read()
+        result = check_proof(text, **file_caches(input_file, cache), **options)
+        if result.errors:
+            problems = [f'line {num}: {error}' for num, error in result.errors.items()]
+            message = ', '.join(problems + [f'Proof obligation {o} not met!' for o in result.unmet])
+        elif result.error is not None:
+            message = result.error.strip().splitlines()[-1]
+        else:
+            message = ', '.join(f'Proof obligation {o} not met!' for o in result.unmet)
+    except Exception as e:
+        # one bad submission fails its own row, not the whole batch
+        return Grade(input_file, False, time.perf_counter() - start, f'{type(e).__name__}: {e}')
+    return Grade(input_file, result.passed, time.perf_counter() - start, message, tuple(result.lines),
+                 tuple(map(repr, result.obligations)), tuple(map(repr, result.unmet)))
+
+
+def expand_inputs(patterns: List[str]) -> List[str]:
+    paths: List[str] = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for root, dirs, files in os.walk(pattern):
+                dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+                paths += [os.path.join(root, f) for f in sorted(files) if not f.startswith('.')]
+        elif glob.has_magic(pattern):
+            paths += sorted(p for p in glob.glob(pattern, recursive=True) if os.path.isfile(p))
+        else:
+            paths.append(pattern)
+    return list(dict.fromkeys(paths))
+
+
+def grade_all(paths: List[str], jobs: int, cache: bool = False, profile: Optional[Profile] = None,
+              **options) -> List[Grade]:
+    grade = partial(grade_file, cache=cache, **options)
+    if profile is not None:
+        # profiled files are checked in this process, one at a time
+        grades = []
+        for path in paths:
+            profile.path = path
+            grades.append(grade(path))
+        return grades
+    if jobs <= 1 or len(paths) <= 1:
+        return list(map(grade, paths))
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(grade, paths, chunksize=max(1, len(paths) // (jobs * 4))))
+
+
+def print_summary(grades: List[Grade], elapsed: float):
+    width = max(len(g.path) for g in grades)
+    for g in grades:
+        status = 'PASS' if g.passed else 'FAIL'
+        print(f'{status}  {g.seconds * 1000:8.1f} ms  {g.path:<{width}}  {g.message}'.rstrip())
+    passed = sum(g.passed for g in grades)
+    print(f'{passed}/{len(grades)} passed, {len(grades) - passed} failed '
+          f'in {elapsed:.2f}s ({len(grades) / elapsed:.1f} files/s)')
+
+
+def main():    
+    if sys.argv[1:2] == ['prove']:
+        from prover import main as prove
+        return prove(sys.argv[2:])
+    parser = ArgumentParser()
+    parser.add_argument('input_files', type=str, nargs='*', metavar='input_file',
+                        help='proof files, directories or glob patterns')
+    parser.add_argument('--cache', action='store_true', help='reuse verified lines from the previous run of this proof')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help='worker processes used when grading several files')
+    parser.add_argument('--parser', choices=['fast', 'pyparsing'], default='fast',
+                        help='proof parser to use (the pyparsing grammar is kept as a fallback)')
+    parser.add_argument('--stream', action='store_true',
+                        help='check each line as soon as it is read instead of parsing the whole file first')
+    parser.add_argument('--fail-fast', action='store_true', help='with --stream, stop reading at the first failed line')
+    parser.add_argument('--lazy', action='store_true',
+                        help='only check the lines the proof obligations depend on, and warn about the rest')
+    parser.add_argument('--valid', action='store_true',
+                        help='only check that the obligations follow from the premises, without checking the proof')
+    parser.add_argument('--semantic', action='store_true',
+                        help='also confirm every propositional line with a truth table (needs numpy)')
+    parser.add_argument('--keep-going', action='store_true',
+                        help='keep checking past failed lines, and report every failed line and unmet obligation')
+    parser.add_argument('--parallel-lines', type=int, default=0, metavar='N',
+                        help='check the lines of a large proof on N worker processes')
+    parser.add_argument('--profile', type=str, metavar='JSON',
+                        help='time every justification, print the costliest rules and write them to this file')
+    parser.add_argument('--lsp', action='store_true',
+                        help='run as a language server on stdin/stdout, checking open documents as they are edited')
+    parser.add_argument('--format', choices=['text', 'jsonl', 'junit'], default='text',
+                        help='jsonl: a JSON object per proof line and per file; junit: a JUnit XML report of the run')
+    parser.add_argument('-o', '--output', type=str, metavar='FILE',
+                        help='write the --format report here instead of to stdout (the text summary still goes to stdout)')
+    args = parser.parse_args()
+    if args.lsp:
+        from lsp import serve
+        sys.exit(serve())
+    if not args.input_files:
+        parser.error('no proof files given')
+    conflict = conflicting_options(args)
+    if conflict is not None:
+        parser.error(conflict)
+    if not args.stream:
+        # lines are printed as they are checked, but nobody needs to see them one by one
+        sys.stdout.reconfigure(line_buffering=False)  # type: ignore
+    if args.semantic and not semantic.available():
+        parser.error('--semantic needs numpy (pip install proof-mouse[semantic])')
+    options = dict(parser=args.parser, lazy=args.lazy, semantic=args.semantic, parallel=args.parallel_lines,
+                   keep_going=args.keep_going)
+
+    paths = expand_inputs(args.input_files)
+    if not paths:
+        parser.error('no proof files matched')
+    if args.stream and not (len(args.input_files) == 1 and paths == args.input_files):
+        parser.error('--stream checks a single file')
+    if args.valid:
+        if not all([precheck_file(path, args.parser) for path in paths]):
+            sys.exit(1)
+        return
+    profile: Optional[Profile] = None
+    if args.profile:
+        from profiler import Profile, profiling
+        profile = Profile()
+    try:
+        with profiling(profile) if profile is not None else nullcontext():
+            check_paths(paths, args, profile, **options)
+    finally:
+        if profile is not None:
+            profile.print_table(sys.stdout)
+            profile.write_json(args.profile)
+
+
+def conflicting_options(args) -> Optional[str]:
+    # options a mode would otherwise silently ignore
+    checking = {'--lazy': args.lazy, '--semantic': args.semantic, '--cache': args.cache,
+                '--keep-going': args.keep_going, '--parallel-lines': args.parallel_lines > 0}
+    used = [flag for flag, on in checking.items() if on]
+    if args.valid:
+        used += ['--stream'] * args.stream + [f'--format {args.format}'] * (args.format != 'text')
+        if used:
+            return f'--valid does not check the proof, so it cannot be used with {", ".join(used)}'
+    if args.stream:
+        used += ['--parser pyparsing'] * (args.parser != 'fast') + [f'--format {args.format}'] * (args.format != 'text')
+        if used:
+            return f'--stream cannot be used with {", ".join(used)}'
+    if args.fail_fast and not args.stream:
+        return '--fail-fast only applies with --stream'
+    if args.lazy and (args.keep_going or args.parallel_lines > 0):
+        return '--lazy cannot be used with --keep-going or --parallel-lines'
+    if args.parallel_lines > 0 and args.cache:
+        return '--parallel-lines cannot be used with --cache'
+    if args.output and args.format == 'text':
+        return '-o needs --format jsonl or --format junit'
+    return None
+
+
+def check_paths(paths: List[str], args, profile: Optional[Profile], **options):
+    single = len(args.input_files) == 1 and paths == args.input_files and not os.path.isdir(paths[0])
+    if single and args.format == 'text':
+        try:
+            if args.stream:
+                stream_file(paths[0], args.fail_fast)
+            elif not check_file(paths[0], args.cache, **options) and args.keep_going:
+                sys.exit(1)
+        except OSError as e:
+            # as grading several files would report it
+            print(f'Error: {type(e).__name__}: {e}')
+            sys.exit(1)
+        return
+
+    start = time.perf_counter()
+    grades = grade_all(paths, args.jobs, args.cache, profile, record=args.format != 'text', **options)
+    elapsed = time.perf_counter() - start
+    if args.format != 'text':
+        write_report(grades, elapsed, args.format, args.output)
+    if args.format == 'text' or args.output:
+        print_summary(grades, elapsed)
+    if not all(g.passed for g in grades):
+        sys.exit(1)
+
+
+def write_report(grades: List[Grade], elapsed: float, format: str, output: Optional[str]):
+    from reporters import REPORTERS
+    with open(output, 'w') if output else nullcontext(sys.stdout) as out:
+        reporter = REPORTERS[format](out)
+        for grade in grades:
+            reporter.add(grade)
+        reporter.close(elapsed)
         
         
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,150 @@
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+import io
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+from proof import Context, Line, Proof
+from props import ModelRef
+from unification import get_symbols
+
+# Checking the lines of one proof on several processes (`mouse --parallel-lines N`).
+# Checking a line reads nothing from the lines before it except the `variables` of
+# the lines it cites and, for ded, the type of the block it names; the constants
+# that ei's freshness check sees are those of the premises and of every earlier
+# line, which only depend on the text. So the lines are checked in waves, a line's
+# wave being one past the last wave it cites, and each wave is split into chunks
+# for the workers, sent along with the variables of the lines they cite. The
+# results are then fed to `Context.check` as if they were cached, which keeps its
+# output, and the state it leaves behind, exactly those of a serial check.
+
+# below this many lines, starting the workers costs more than it saves
+MIN_LINES = 2000
+CHUNKS_PER_JOB = 4
+
+# (num, variables, note, error) for a checked line
+Checked = Tuple[int, Dict[str, Set[str]], Optional[str], Optional[str]]
+
+
+def waves(ctx: Context) -> Optional[List[List[int]]]:
+    # line numbers grouped so that every line only cites lines of earlier groups, or
+    # None when a line cites itself, a later line or a missing one (then the result
+    # depends on the order lines are checked in, and only a serial check gets it right)
+    level: Dict[int, int] = {}
+    groups: List[List[int]] = []
+    for num in sorted(ctx.lines):
+        args = ctx.lines[num].just.args
+        if any(arg >= num or arg not in ctx.lines for arg in args):
+            return None
+        wave = max((level[arg] + 1 for arg in args), default=0)
+        level[num] = wave
+        if wave == len(groups):
+            groups.append([])
+        groups[wave].append(num)
+    return groups
+
+
+def fresh_constants(ctx: Context) -> Dict[int, FrozenSet[ModelRef]]:
+    # the constants each ei line is checked against, as `Context.check` builds them up
+    last = max((num for num, line in ctx.lines.items() if line.just.name == 'ei'), default=None)
+    if last is None:
+        return {}
+    constants: Set[ModelRef] = set()
+    for line in ctx.lines.values():
+        if line.just.name == 'prem':
+            sym, var = get_symbols(line.typ)
+            constants |= sym - var
+    seen: Dict[int, FrozenSet[ModelRef]] = {}
+    for num in sorted(ctx.lines):
+        if num > last:
+            break
+        line = ctx.lines[num]
+        if line.just.name == 'ei':
+            seen[num] = frozenset(constants)
+        sym, var = get_symbols(line.typ)
+        constants |= sym - var
+    return seen
+
+
+_worker: Optional[Context] = None
+
+
+def _start(main_proof: Proof):
+    global _worker
+    _worker = Context(io.StringIO())
+    _worker.add_proof_tree(main_proof)
+    for block in _worker.proofs.values():
+        # what `Proof.compile` registers once the block is checked; a ded is only sent
+        # here after every line of its block has passed
+        assumptions = {line.typ for line in block.lines.values() if line.just.name in ('hyp', 'prem')}
+        _worker.register_type(block, (assumptions, {line.typ for line in block.lines.values()}))
+
+
+def _check(chunk: List[Tuple[int, Optional[FrozenSet[ModelRef]]]], cited: Dict[int, Dict[str, Set[str]]]) -> List[Checked]:
+    ctx = _worker
+    assert ctx is not None
+    for num, variables in cited.items():
+        ctx.lines[num].variables = variables
+    checked: List[Checked] = []
+    for num, constants in chunk:
+        line = ctx.lines[num]
+        ctx.constants = set(constants or ())
+        try:
+            line.check(ctx)
+        except AssertionError as e:
+            checked.append((num, {}, None, str(e)))
+            continue
+        checked.append((num, line.variables, line.arg.note, None))
+    return checked
+
+
+class Verified:
+    # the workers' results, in the shape of a LineCache; a line that failed (or was
+    # never checked) misses, so `Context.check` verifies it itself and reports the error
+    def __init__(self, results: Dict[int, Checked]) -> None:
+        self.results = results
+
+    def key(self, line: Line, ctx: Context) -> Optional[int]:
+        result = self.results.get(line.num)
+        if result is None or result[3] is not None:
+            return None
+        return line.num
+
+    def lookup(self, key: int) -> Optional[Tuple[Dict[str, Set[str]], Optional[str]]]:
+        return self.results[key][1], self.results[key][2]
+
+
+def check_parallel(ctx: Context, jobs: int, keep_going: bool = False) -> bool:
+    # with keep_going, the results go to `Context.check_all` instead, which skips the
+    # lines resting on a failed one just as the workers did
+    check = ctx.check_all if keep_going else ctx.check
+    groups = waves(ctx) if jobs > 1 and ctx.cache is None and len(ctx.lines) >= MIN_LINES else None
+    if groups is None:
+        return check()
+    fresh = fresh_constants(ctx)
+    results: Dict[int, Checked] = {}
+    failed: Set[int] = set()
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_start, initargs=(ctx.main_proof,)) as pool:
+        for wave in groups:
+            ready = []
+            for num in wave:
+                # lines resting on a failed line are never reached by a serial check
+                if failed.intersection(ctx.lines[num].just.args):
+                    failed.add(num)
+                else:
+                    ready.append(num)
+            size = max(1, -(-len(ready) // (jobs * CHUNKS_PER_JOB)))
+            futures = []
+            for start in range(0, len(ready), size):
+                chunk = ready[start:start + size]
+                cited = {arg: results[arg][1] for num in chunk for arg in ctx.lines[num].just.args}
+                futures.append(pool.submit(_check, [(num, fresh.get(num)) for num in chunk], cited))
+            for future in futures:
+                for result in future.result():
+                    results[result[0]] = result
+                    if result[3] is not None:
+                        failed.add(result[0])
+    ctx.cache = Verified(results)  # type: ignore
+    try:
+        return check()
+    finally:
+        ctx.cache = None
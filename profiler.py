@@ -0,0 +1,144 @@
+from __future__ import annotations
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+import json
+import time
+import tracemalloc
+from typing import Dict, Iterator, List, TextIO, Tuple
+
+import arguments
+from arguments import UninterpJust
+import checker
+from proof import Context, Line
+import unification
+from unification import RewriteRule
+
+# Per-rule costs of checking. Everything is measured by wrapping Line.check,
+# UninterpJust.interpret and the unification functions for the duration of
+# `profiling()`, so a run without --profile executes exactly the same code as
+# before. The unification count is one per call to `unify` (which walks both
+# formulas on its own stack, so one call is one unification problem) plus one
+# per `RewriteRule.match_from`, the compiled matchers that replaced `unify` for
+# the equivalence rules.
+
+SLOWEST_LINES = 10
+
+
+@dataclass
+class RuleStats:
+    calls: int = 0
+    seconds: float = 0.0
+    max_seconds: float = 0.0
+    slowest_line: int = 0
+    interpret_seconds: float = 0.0
+    unify: int = 0
+    diff_tree: int = 0
+    # the most memory allocated during any one line, above what was live before it
+    peak_bytes: int = 0
+
+
+class Profile:
+    def __init__(self, memory: bool = True) -> None:
+        self.memory = memory
+        self.rules: Dict[str, RuleStats] = {}
+        self.lines: List[Tuple[float, str, int]] = []
+        self.unify = 0
+        self.diff_tree = 0
+        # the file being checked, to tell lines apart across files
+        self.path = ''
+
+    def record(self, line: Line, seconds: float, unify: int, diff_tree: int, peak: int, path: str):
+        stats = self.rules.setdefault(line.just.name, RuleStats())
+        stats.calls += 1
+        stats.seconds += seconds
+        if seconds > stats.max_seconds:
+            stats.max_seconds, stats.slowest_line = seconds, line.num
+        stats.unify += unify
+        stats.diff_tree += diff_tree
+        stats.peak_bytes = max(stats.peak_bytes, peak)
+        self.lines.append((seconds, path, line.num))
+
+    def sorted_rules(self) -> List[Tuple[str, RuleStats]]:
+        return sorted(self.rules.items(), key=lambda item: -item[1].seconds)
+
+    def slowest(self) -> List[Tuple[float, str, int]]:
+        return sorted(self.lines, key=lambda t: -t[0])[:SLOWEST_LINES]
+
+    def to_json(self) -> dict:
+        return {
+            'rules': {name: asdict(stats) for name, stats in self.sorted_rules()},
+            'slowest_lines': [{'path': path, 'line': num, 'seconds': seconds} for seconds, path, num in self.slowest()],
+        }
+
+    def write_json(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.to_json(), f, indent=2)
+
+    def print_table(self, out: TextIO):
+        total = sum(stats.seconds for stats in self.rules.values()) or 1.0
+        print(f'{"rule":<10}{"calls":>8}{"total ms":>11}{"share":>7}{"max ms":>9}{"line":>6}'
+              f'{"interp ms":>11}{"unify":>9}{"diff_tree":>10}{"peak KiB":>10}', file=out)
+        for name, s in self.sorted_rules():
+            print(f'{name:<10}{s.calls:>8}{s.seconds * 1000:>11.2f}{s.seconds / total:>7.0%}{s.max_seconds * 1000:>9.2f}'
+                  f'{s.slowest_line:>6}{s.interpret_seconds * 1000:>11.2f}{s.unify:>9}{s.diff_tree:>10}'
+                  f'{s.peak_bytes / 1024:>10.1f}', file=out)
+        print('Slowest lines:', file=out)
+        for seconds, path, num in self.slowest():
+            print(f'  {seconds * 1000:8.2f} ms  {f"{path}:" if path else ""}{num}', file=out)
+
+
+@contextmanager
+def profiling(profile: Profile) -> Iterator[Profile]:
+    check, interpret, match_from = Line.check, UninterpJust.interpret, RewriteRule.match_from
+    unify, diff_tree = unification.unify, unification.diff_tree
+    current: List[RuleStats] = []
+
+    def counted_unify(*args, **kwargs):
+        profile.unify += 1
+        return unify(*args, **kwargs)
+
+    def counted_match_from(self, *args):
+        profile.unify += 1
+        return match_from(self, *args)
+
+    def counted_diff_tree(*args):
+        profile.diff_tree += 1
+        return diff_tree(*args)
+
+    def timed_interpret(self: UninterpJust, ctx: Context):
+        start = time.perf_counter()
+        try:
+            return interpret(self, ctx)
+        finally:
+            if current:
+                current[-1].interpret_seconds += time.perf_counter() - start
+
+    def timed_check(self: Line, ctx: Context):
+        current.append(profile.rules.setdefault(self.just.name, RuleStats()))
+        unify_before, diff_before = profile.unify, profile.diff_tree
+        if profile.memory:
+            tracemalloc.reset_peak()
+            live = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            check(self, ctx)
+        finally:
+            seconds = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1] - live if profile.memory else 0
+            current.pop()
+            profile.record(self, seconds, profile.unify - unify_before, profile.diff_tree - diff_before, peak, profile.path)
+
+    started = profile.memory and not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    Line.check, UninterpJust.interpret, RewriteRule.match_from = timed_check, timed_interpret, counted_match_from  # type: ignore
+    unification.unify = checker.unify = counted_unify
+    unification.diff_tree = arguments.diff_tree = counted_diff_tree
+    try:
+        yield profile
+    finally:
+        Line.check, UninterpJust.interpret, RewriteRule.match_from = check, interpret, match_from  # type: ignore
+        unification.unify = checker.unify = unify
+        unification.diff_tree = arguments.diff_tree = diff_tree
+        if started:
+            tracemalloc.stop()
@@ -1,38 +1,55 @@
 from __future__ import annotations
 from collections import defaultdict
-from typing import List, Dict, Set
+import sys
+from typing import TYPE_CHECKING, FrozenSet, List, Dict, Optional, Set, TextIO
 
 from props import *
 from arguments import Hypothesis, UninterpJust
 from unification import *
 from unification import get_symbols
 
+if TYPE_CHECKING:
+    from cache import LineCache
+
 class Line:
     def __init__(self, num: int, typ: Prop, just: UninterpJust) -> None:
         self.num = num
         self.typ = typ
         self.just = just
         self.variables: Dict[str, Set[str]] = {}
+        self.key: Optional[str] = None
         
     def check(self, ctx: Context):
         self.arg, self.variables = self.just.interpret(ctx)
+        if ctx.cache is not None:
+            self.key = ctx.cache.key(self, ctx)
+            if self.key is not None:
+                cached = ctx.cache.lookup(self.key)
+                if cached is not None:
+                    self.variables, self.arg.note = cached
+                    return
         assert self.arg.verify(self, ctx.constants), f'Cannot use `{self.arg}` to produce {self.typ}!'
+        if self.key is not None:
+            ctx.cache.store(self.key, self.variables, self.arg.note)
         
     def __repr__(self) -> str:
         return f'{self.num}. {self.typ} {self.just}'
     
 
 class Proof:
-    def __init__(self, lines: List[Line]):
+    def __init__(self, lines: List[Line], subproofs: Optional[List[Proof]] = None):
         self.lines: Dict[int, Line] = {}
         for line in lines:
             self.lines[line.num] = line
+        self.subproofs: List[Proof] = subproofs or []
             
-    def compile(self, ctx: Context) -> tuple[Set[Prop], Set[Prop]]:
+    def compile(self, ctx: Context, only: Optional[Set[int]] = None) -> tuple[Set[Prop], Set[Prop]]:
         assumptions: Set[Prop] = set()
         results: Set[Prop] = set()
         
         for line in self.lines.values():
+            if only is not None and line.num not in only:
+                continue
             if isinstance(line.arg, Hypothesis):
                 assumptions.add(line.typ)
             results.add(line.typ)
@@ -44,58 +61,240 @@ class Proof:
 
 
 
+class DependencyGraph:
+    # the citation DAG of a parsed proof; `ded` depends on the lines of the block it names
+    def __init__(self, ctx: Context) -> None:
+        self.edges: Dict[int, tuple[int, ...]] = {}
+        for num, line in ctx.lines.items():
+            block = ctx.proofs.get(line.just.span) if line.just.name == 'ded' else None  # type: ignore
+            cited = block.lines if block is not None else line.just.args
+            self.edges[num] = tuple(dep for dep in cited if dep in ctx.lines)
+        self.cones: Dict[int, FrozenSet[int]] = {}
+        self._dependents: Optional[Dict[int, Set[int]]] = None
+        
+    def cone(self, num: int) -> FrozenSet[int]:
+        # every line `num` transitively cites; memoized, and safe on (malformed) cyclic citations
+        if num in self.cones:
+            return self.cones[num]
+        seen: Set[int] = set()
+        stack = list(self.edges.get(num, ()))
+        while stack:
+            dep = stack.pop()
+            if dep in seen:
+                continue
+            seen.add(dep)
+            if dep in self.cones:
+                seen |= self.cones[dep]
+            else:
+                stack.extend(self.edges[dep])
+        self.cones[num] = frozenset(seen)
+        return self.cones[num]
+    
+    def dependents(self, num: int) -> Set[int]:
+        # lines that cite `num` directly
+        if self._dependents is None:
+            self._dependents = defaultdict(set)
+            for line, deps in self.edges.items():
+                for dep in deps:
+                    self._dependents[dep].add(line)
+        return self._dependents.get(num, set())
+
 
 class Context:
-    def __init__(self) -> None:
+    def __init__(self, out: Optional[TextIO] = None) -> None:
+        self.out = out if out is not None else sys.stdout
+        self.error: Optional[str] = None
         self.lines: Dict[int, Line] = {}
         self.proof_types: Dict[Proof, tuple[Set[Prop], Set[Prop]]] = {}
-        self.proofs: Dict[tuple[int, ...], Proof] = {}
+        # blocks by the (first, last) line they span, and by the line that closes them
+        self.proofs: Dict[tuple[int, int], Proof] = {}
+        self.closing: Dict[int, List[Proof]] = defaultdict(list)
         self.main_proof: Proof | None = None
         self.dependences: Dict[int, Set[int]] = defaultdict(set)
         self.constants: Set[ModelRef] = set()
+        self.cache: Optional[LineCache] = None
+        self.graph: Optional[DependencyGraph] = None
+        # constants introduced by ei, and the line that introduced them
+        self.instantiated: Dict[ModelRef, int] = {}
+        # the line being checked when `check` failed
+        self.failed: Optional[int] = None
+        # the text of the line being checked, until its verdict is written with it
+        self.pending = ''
+        # lines that checked
+        self.passed: Set[int] = set()
+        # with `check_all`: every failed line and its error, and the lines skipped
+        # because they rest on one (with the failed line they rest on)
+        self.errors: Dict[int, str] = {}
+        self.poisoned: Dict[int, int] = {}
     
     def add_proof(self, proof: Proof):
         self.lines.update(proof.lines)
-        self.proofs[tuple(sorted(proof.lines.keys()))] = proof
+        if proof.lines:
+            self.proofs[min(proof.lines), max(proof.lines)] = proof
+            self.closing[max(proof.lines)].append(proof)
         self.main_proof = proof
         
+    def add_proof_tree(self, proof: Proof):
+        # nested proofs first, so the outermost one ends up as the main proof
+        for subproof in proof.subproofs:
+            self.add_proof_tree(subproof)
+        self.add_proof(proof)
+        
     def register_type(self, proof: Proof, typ: tuple[Set[Prop], Set[Prop]]):
         self.proof_types[proof] = typ
         
+    def add_constants(self, line: Line):
+        sym, var = get_symbols(line.typ)
+        self.constants |= (sym - var)
+        
+    def check_line(self, line: Line):
+        # the line and its verdict go out in one write, once it is known
+        self.pending = f'{line}\t'
+        if line.just.name == 'prem':
+            # only reachable when premises arrive after an ei (see stream.py);
+            # otherwise every premise is already among the constants
+            sym, var = get_symbols(line.typ)
+            for constant in (sym - var) & self.instantiated.keys():
+                assert False, f'`{constant}` is not a fresh constant! (instantiated on line {self.instantiated[constant]})'
+            self.add_constants(line)
+        line.check(self)
+        if line.just.name == 'ei':
+            sym, var = get_symbols(line.typ)
+            for constant in (sym - var) - self.constants:
+                self.instantiated[constant] = line.num
+        self.add_constants(line)
+        self.passed.add(line.num)
+        note = '' if line.arg.note is None else f' ({line.arg.note})'
+        self.out.write(f'{self.pending}\u2713{note}\n')
+        self.pending = ''
+        
+    def report_error(self, e: AssertionError):
+        self.error = str(e)
+        self.out.write(f'{self.pending}\u2717\nError: {e}\n')
+        self.pending = ''
+        
     def check(self) -> bool:
         if self.main_proof is None:
-            print('** No proofs added! **')
+            print('** No proofs added! **', file=self.out)
             return False
         try:
-            remaining_proofs = set(self.proofs.values())
-            lines_checked: Set[int] = set()
+            if not self.main_proof.lines:
+                self.main_proof.compile(self)
             
             # initialize constants from premises
             for num in sorted(self.lines.keys()):
                 if self.lines[num].just.name == 'prem':
-                    sym, var = get_symbols(self.lines[num].typ)
-                    self.constants |= (sym - var)
+                    self.add_constants(self.lines[num])
             
             for num in sorted(self.lines.keys()):
-                print(f'{self.lines[num]}', end='\t')
-                self.lines[num].check(self)
-                sym, var = get_symbols(self.lines[num].typ)
-                self.constants |= (sym - var)
-                print('\u2713')
-                lines_checked.add(num)
-                
-                for lines in self.proofs:
-                    if self.proofs[lines] in remaining_proofs and (set(lines).issubset(lines_checked)):
-                        self.proofs[lines].compile(self)
-                        remaining_proofs.remove(self.proofs[lines])
-                
+                self.failed = num
+                self.check_line(self.lines[num])
+                # lines are checked in order, so a block is complete once its last line is
+                for proof in self.closing.get(num, ()):
+                    proof.compile(self)
+            
+            self.failed = None
             return True
         except AssertionError as e:
-            print('\u2717')
-            print(f'Error: {e}')
+            self.report_error(e)
+            return False
+            
+        
+    def check_all(self) -> bool:
+        # like `check`, but a failed line doesn't end the check: every line that rests
+        # on it is skipped instead, so all the independent errors are found in one pass
+        if self.main_proof is None:
+            print('** No proofs added! **', file=self.out)
+            return False
+        if not self.main_proof.lines:
+            self.main_proof.compile(self)
+        graph = self.dependency_graph()
+        for num in sorted(self.lines.keys()):
+            if self.lines[num].just.name == 'prem':
+                self.add_constants(self.lines[num])
+        
+        checked: Set[int] = set()
+        for num in sorted(self.lines.keys()):
+            line = self.lines[num]
+            failed = next((self.poisoned.get(dep, dep) for dep in graph.edges[num]
+                           if dep in self.errors or dep in self.poisoned), None)
+            if failed is not None:
+                self.poisoned[num] = failed
+                print(f'{line}\t- skipped, depends on failed line {failed}', file=self.out)
+                self.add_constants(line)
+                continue
+            try:
+                self.check_line(line)
+            except Exception as e:
+                # whatever goes wrong on a line, even a bug in a rule, only fails that line
+                error = e if isinstance(e, AssertionError) else AssertionError(f'{type(e).__name__}: {e}')
+                self.report_error(error)
+                self.errors[num] = str(error)
+                self.add_constants(line)
+                continue
+            checked.add(num)
+            for proof in self.closing.get(num, ()):
+                if checked.issuperset(proof.lines):
+                    proof.compile(self)
+        
+        if not self.errors:
+            return True
+        # what the lines that did check still conclude
+        self.main_proof.compile(self, only=checked)
+        self.failed = min(self.errors)
+        self.error = self.errors[self.failed]
+        return False
+        
+    def check_lazy(self, obligations: List[Prop]) -> bool:
+        # only check the lines the obligations actually rest on, in line order
+        # (which keeps `constants` and the ei freshness check the same as `check`)
+        if self.main_proof is None:
+            print('** No proofs added! **', file=self.out)
             return False
+        main_lines = self.main_proof.lines
+        graph = self.dependency_graph()
+        needed = {num for num, line in main_lines.items() if line.just.name in ('hyp', 'prem')}
+        for obligation in obligations:
+            # the line that meets it as `checker.unmet_obligations` sees it: one that is
+            # the obligation, or else one that only orders or groups /\ and \/ differently
+            num = next((num for num in sorted(main_lines) if main_lines[num].typ is obligation), None)
+            if num is None:
+                num = next((num for num in sorted(main_lines) if ac_equal(main_lines[num].typ, obligation)), None)
+            if num is not None:
+                needed |= {num} | graph.cone(num)
+        
+        checked: Set[int] = set()
+        unused: List[int] = []
+        try:
+            for num in sorted(self.lines.keys()):
+                if self.lines[num].just.name == 'prem':
+                    self.add_constants(self.lines[num])
             
+            for num in sorted(self.lines.keys()):
+                if num not in needed:
+                    self.add_constants(self.lines[num])
+                    unused.append(num)
+                    continue
+                self.failed = num
+                self.check_line(self.lines[num])
+                checked.add(num)
+                for proof in self.closing.get(num, ()):
+                    if proof is not self.main_proof and checked.issuperset(proof.lines):
+                        proof.compile(self)
+            self.failed = None
+        except AssertionError as e:
+            self.report_error(e)
+            return False
+        
+        self.main_proof.compile(self, only=checked)
+        for num in unused:
+            print(f'Warning: line {num} is not used by any proof obligation', file=self.out)
+        return True
+        
+    def dependency_graph(self) -> DependencyGraph:
+        if self.graph is None:
+            self.graph = DependencyGraph(self)
+        return self.graph
         
     def transitive_dependences(self, line_number: int):
-        deps = set(self.lines[line_number].just.args)
-        return deps | set().union(*(self.transitive_dependences(dep) for dep in deps))
\ No newline at end of file
+        return set(self.dependency_graph().cone(line_number))
\ No newline at end of file
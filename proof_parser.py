@@ -1,8 +1,10 @@
-import pyparsing as pp
+from threading import Lock
+from typing import Any, Dict, List
 
-from props import And, BaseProp, Exists, ForAll, Imp, Not, Or, ModelRef, Predicate
+from props import And, BaseProp, Exists, ForAll, Imp, Not, Or, ModelRef, Predicate, Prop
 from arguments import UninterpJust
-from proof import Line, Proof, Context
+from fast_parser import ParseException
+from proof import Line, Proof
 
 r"""
 Grammar:
@@ -25,19 +27,24 @@ def NotAction(n):
     return Not(n[1])
 
 def ConjAction(n):
-    if len(n) == 1:
-        return n[0]
-    return And(ConjAction(n[:-1]), n[-1])
+    # folded in one pass (left associative), not by recursing on slices
+    form = n[0]
+    for p in n[1:]:
+        form = And(form, p)
+    return form
 
 def DisjAction(n):
-    if len(n) == 1:
-        return n[0]
-    return Or(DisjAction(n[:-1]), n[-1])
+    form = n[0]
+    for p in n[1:]:
+        form = Or(form, p)
+    return form
     
 def FormAction(n):
-    if len(n) == 1:
-        return n[0]
-    return Imp(n[0], FormAction(n[1:]))
+    # right associative
+    form = n[-1]
+    for p in reversed(n[:-1]):
+        form = Imp(p, form)
+    return form
 
 
 def ForAllAction(n):
@@ -49,21 +56,6 @@ def ExistsAction(n):
 def PredicateAction(n):
     return Predicate(BaseProp(n[0]), tuple(map(ModelRef, n[1:])))
 
-model_ref = pp.Word(init_chars=pp.alphas)
-predicate = pp.Word(init_chars=pp.alphas) + pp.Suppress('(') + pp.delimited_list(model_ref, ',') + pp.Suppress(')')
-form = pp.Forward()
-prop = pp.Forward()
-prop <<= predicate.set_parse_action(PredicateAction) | pp.Char(pp.alphas.upper()).set_parse_action(BaseAction) | (pp.Suppress('(') + form + pp.Suppress(')')) | ('~' + prop).set_parse_action(NotAction)
-conj = (pp.ZeroOrMore((prop + pp.Suppress('/\\'))) + prop)
-disj = (pp.ZeroOrMore((conj + pp.Suppress('\\/'))) + conj)
-form <<= (disj + pp.ZeroOrMore((pp.Suppress('->') + disj))) | \
-            (pp.Suppress('exists') + model_ref + pp.Suppress(',') + form).set_parse_action(ExistsAction) | \
-            (pp.Suppress('forall') + model_ref + pp.Suppress(',') + form).set_parse_action(ForAllAction)
-
-conj.set_parse_action(ConjAction)
-disj.set_parse_action(DisjAction)
-form.set_parse_action(FormAction)
-
 def NumAction(result):
     return int(result[0])
 
@@ -79,36 +71,93 @@ def LineAction(result):
     return Line(result[0], result[1], result[2])
 
 
-def ProofActionWithContext(ctx: Context):
-    def ProofAction(result):
-        external_proofs = []
-        main_proof = []
-        for line in result:
-            if isinstance(line[0], Proof):
-                external_proofs.append(line[0])
-            else:
-                main_proof.append(line[0])
-        
-        proof = Proof(main_proof)
-        ctx.add_proof(proof)
-        
-        return proof
-
-    return ProofAction
-
-proof = pp.Forward()
-num = pp.Word(pp.nums).set_parse_action(NumAction)
-line_start = pp.Combine(num + pp.Suppress('.')).set_parse_action(NumAction)
-args = ((num + pp.Suppress('-') + num).set_parse_action(ArgRange) | pp.delimited_list(num, ','))
-just = (pp.Word(pp.alphas.lower() + '_') + pp.Optional(args)).set_parse_action(JustAction)
-comment_line = pp.Suppress(pp.QuotedString(quote_char='/*', end_quote_char='*/', multiline=True))
-single_line = (line_start + form + just).set_parse_action(LineAction) + pp.Suppress(';')
-embedded_proof = pp.Suppress('{') + proof + pp.Suppress('}')
-line = single_line | embedded_proof
-proof <<= pp.OneOrMore(pp.Group(line) | comment_line)
+def ProofAction(result):
+    external_proofs = []
+    main_proof = []
+    for line in result:
+        if isinstance(line[0], Proof):
+            external_proofs.append(line[0])
+        else:
+            main_proof.append(line[0])
+    
+    # the grammar is shared, so the proof tree is only handed to a Context
+    # once parsing has finished (see `Context.add_proof_tree`)
+    return Proof(main_proof, external_proofs)
+
+
+# Building the grammar (and importing pyparsing) takes longer than checking a
+# short proof, so it is built on first use. The elements stay reachable as
+# module attributes (`proof_parser.form`, ...) through `__getattr__`.
+GRAMMAR = ('model_ref', 'predicate', 'form', 'prop', 'conj', 'disj', 'proof', 'num', 'line_start', 'args',
+           'just', 'comment_line', 'single_line', 'embedded_proof', 'line', 'obligations')
+_grammar: Dict[str, Any] = {}
+_grammar_lock = Lock()
+
+
+def grammar() -> Dict[str, Any]:
+    with _grammar_lock:
+        if not _grammar:
+            _grammar.update(_build())
+    return _grammar
+
+
+def _build() -> Dict[str, Any]:
+    import pyparsing as pp
+
+    model_ref = pp.Word(init_chars=pp.alphas)
+    predicate = pp.Word(init_chars=pp.alphas) + pp.Suppress('(') + pp.delimited_list(model_ref, ',') + pp.Suppress(')')
+    form = pp.Forward()
+    prop = pp.Forward()
+    prop <<= predicate.set_parse_action(PredicateAction) | pp.Char(pp.alphas.upper()).set_parse_action(BaseAction) | (pp.Suppress('(') + form + pp.Suppress(')')) | ('~' + prop).set_parse_action(NotAction)
+    conj = (pp.ZeroOrMore((prop + pp.Suppress('/\\'))) + prop)
+    disj = (pp.ZeroOrMore((conj + pp.Suppress('\\/'))) + conj)
+    form <<= (disj + pp.ZeroOrMore((pp.Suppress('->') + disj))) | \
+                (pp.Suppress('exists') + model_ref + pp.Suppress(',') + form).set_parse_action(ExistsAction) | \
+                (pp.Suppress('forall') + model_ref + pp.Suppress(',') + form).set_parse_action(ForAllAction)
+
+    conj.set_parse_action(ConjAction)
+    disj.set_parse_action(DisjAction)
+    form.set_parse_action(FormAction)
+
+    proof = pp.Forward()
+    num = pp.Word(pp.nums).set_parse_action(NumAction)
+    line_start = pp.Combine(num + pp.Suppress('.')).set_parse_action(NumAction)
+    args = ((num + pp.Suppress('-') + num).set_parse_action(ArgRange) | pp.delimited_list(num, ','))
+    just = (pp.Word(pp.alphas.lower() + '_') + pp.Optional(args)).set_parse_action(JustAction)
+    comment_line = pp.Suppress(pp.QuotedString(quote_char='/*', end_quote_char='*/', multiline=True))
+    single_line = (line_start + form + just).set_parse_action(LineAction) + pp.Suppress(';')
+    embedded_proof = pp.Suppress('{') + proof + pp.Suppress('}')
+    line = single_line | embedded_proof
+    proof <<= pp.OneOrMore(pp.Group(line) | comment_line)
+    proof.set_parse_action(ProofAction)
+    obligations = pp.delimited_list(form, ',')
+
+    return {name: value for name, value in locals().items() if name in GRAMMAR}
+
+
+def __getattr__(name: str) -> Any:
+    if name in GRAMMAR:
+        return grammar()[name]
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def parse_obligations(text: str) -> List[Prop]:
+    import pyparsing as pp
+    try:
+        return list(grammar()['obligations'].parse_string(text, parse_all=True))
+    except pp.ParseException as e:
+        raise ParseException(e.pstr, e.loc, e.msg) from None
+
+
+def parse_proof(text: str) -> Proof:
+    import pyparsing as pp
+    try:
+        return grammar()['proof'].parse_string(text, parse_all=True)[0]
+    except pp.ParseException as e:
+        raise ParseException(e.pstr, e.loc, e.msg) from None
 
 if __name__ == '__main__':
-    print(form.parse_string(r'P /\ Q'))
+    print(grammar()['form'].parse_string(r'P /\ Q'))
 
 # text = r'''1. ~(Q /\ ~Z) prem;
 # 2. ~Q \/ ~~Z dm 1;
@@ -1,91 +1,184 @@
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import Literal, Union
+from dataclasses import dataclass, fields
+from itertools import count
+from threading import Lock
+from typing import Any, Dict, FrozenSet, List, Literal, NamedTuple, Optional, Tuple, Union
+from weakref import WeakValueDictionary
 
 
-@dataclass(eq=True, frozen=True)
-class BaseProp:
+# hash-consing: every node is built through `Interned.__call__`, which hands
+# back the existing instance for a structure that is already alive. Two nodes
+# are then equal exactly when they are the same object, and each hash is
+# computed once from the (already cached) hashes of the children. The same goes
+# for a node's `Meta`, which is built from its children's when the node is.
+_intern_table: WeakValueDictionary[Tuple[Any, ...], Node] = WeakValueDictionary()
+_intern_lock = Lock()
+# creation order of the live nodes, which `canonical` sorts operands by
+_uids = count()
+
+
+class Interned(type):
+    def __call__(cls, *args):
+        key = (cls, *args)
+        with _intern_lock:
+            node = _intern_table.get(key)
+            if node is None:
+                node = super().__call__(*args)
+                object.__setattr__(node, '_hash', hash(key))
+                object.__setattr__(node, '_meta', _metadata(node))
+                object.__setattr__(node, '_uid', next(_uids))
+                _intern_table[key] = node
+        return node
+
+
+class Node(metaclass=Interned):
+    _hash: int
+    _meta: Meta
+    _uid: int
+    _text: str
+    # the canonical form, or None when the node is already canonical (see `canonical`)
+    _canon: Optional[Node]
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __reduce__(self):
+        # unpickled nodes must go back through the intern table
+        return type(self), tuple(getattr(self, f.name) for f in fields(self))
+
+    def __repr__(self) -> str:
+        # printed once, and kept on the node (so shared by every occurrence of it);
+        # deep formulas are rendered without recursion and not kept, since the texts
+        # of all their subformulas would add up to quadratic size
+        try:
+            return self._text
+        except AttributeError:
+            pass
+        if self._meta.depth >= DEEP:
+            return render(self)
+        text = self.show()
+        object.__setattr__(self, '_text', text)
+        return text
+
+    def show(self) -> str:
+        # this node's text, from its children's
+        raise NotImplementedError
+
+
+def intern_table_size() -> int:
+    return len(_intern_table)
+
+
+@dataclass(eq=False, frozen=True, repr=False)
+class BaseProp(Node):
     name: str
     
-    def __repr__(self) -> str:
+    def show(self) -> str:
         return self.name
     
     
-@dataclass(eq=True, frozen=True)
-class PropHole:
+@dataclass(eq=False, frozen=True, repr=False)
+class PropHole(Node):
     name: str
     
-    def __repr__(self) -> str:
+    def show(self) -> str:
         return f'?{self.name}'
     
-@dataclass(eq=True, frozen=True)
-class And:
+@dataclass(eq=False, frozen=True, repr=False)
+class And(Node):
     p: Prop
     q: Prop
     
-    def __repr__(self) -> str:
+    def show(self) -> str:
         return fr'({self.p} /\ {self.q})'
 
-@dataclass(eq=True, frozen=True)
-class Or:
+@dataclass(eq=False, frozen=True, repr=False)
+class Or(Node):
     p: Prop
     q: Prop
     
-    def __repr__(self) -> str:
+    def show(self) -> str:
         return fr'({self.p} \/ {self.q})'
        
-@dataclass(eq=True, frozen=True)
-class Imp:
+@dataclass(eq=False, frozen=True, repr=False)
+class Imp(Node):
     p: Prop
     q: Prop
     
-    def __repr__(self) -> str:
-        if self.q == False:
+    def show(self) -> str:
+        if self.q is False:
             return f'~{self.p}'
         return f'({self.p} -> {self.q})'
     
-@dataclass(eq=True, frozen=True)
-class ModelRef:
+@dataclass(eq=False, frozen=True, repr=False)
+class ModelRef(Node):
     name: str
     
-    def __repr__(self):
+    def show(self) -> str:
         return self.name
     
     
-@dataclass(eq=True, frozen=True)
-class ModelRefHole:
+@dataclass(eq=False, frozen=True, repr=False)
+class ModelRefHole(Node):
     name: str
     
-    def __repr__(self) -> str:
+    def show(self) -> str:
         return f'?{self.name}'
     
-@dataclass(eq=True, frozen=True)
-class Predicate:
+@dataclass(eq=False, frozen=True, repr=False)
+class Predicate(Node):
     name: BaseProp
     args: tuple[ModelRef]
     
-    def __repr__(self) -> str:
+    def show(self) -> str:
         return f'{self.name}({", ".join(map(repr, self.args))})'
     
     
-@dataclass(eq=True, frozen=True)
-class ForAll:
+@dataclass(eq=False, frozen=True, repr=False)
+class ForAll(Node):
     var: Union[ModelRef, ModelRefHole]
     formula: Prop
     
-    def __repr__(self) -> str:
+    def show(self) -> str:
         return f'(forall {self.var}, {self.formula})'
     
     
-@dataclass(eq=True, frozen=True)
-class Exists:
+@dataclass(eq=False, frozen=True, repr=False)
+class Exists(Node):
     var: Union[ModelRef, ModelRefHole]
     formula: Prop
     
-    def __repr__(self) -> str:
+    def show(self) -> str:
         return f'(exists {self.var}, {self.formula})'
     
     
+# formulas at least this deep are printed by `render`, which doesn't recurse
+DEEP = 200
+
+
+def render(root: Prop) -> str:
+    # the same text as `show`, built on an explicit stack down to subformulas shallow enough to print directly
+    out: List[str] = []
+    stack: List[Any] = [root]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            out.append(item)
+        elif isinstance(item, bool) or item._meta.depth < DEEP:
+            out.append(repr(item))
+        elif isinstance(item, And):
+            stack += (')', item.q, r' /\ ', item.p, '(')
+        elif isinstance(item, Or):
+            stack += (')', item.q, r' \/ ', item.p, '(')
+        elif isinstance(item, Imp):
+            stack += (item.p, '~') if item.q is False else (')', item.q, ' -> ', item.p, '(')
+        elif isinstance(item, (ForAll, Exists)):
+            stack += (')', item.formula, ', ', item.var, '(forall ' if isinstance(item, ForAll) else '(exists ')
+        else:
+            out.append(repr(item))
+    return ''.join(out)
+
+
 def Not(p: Prop) -> Prop:
     return Imp(p, False)
 
@@ -93,6 +186,127 @@ def Not(p: Prop) -> Prop:
 Prop = Union[BaseProp, PropHole, ModelRef, ModelRefHole, And, Or, Imp, ForAll, Exists, Literal[True], Literal[False]]
 
 
+class Meta(NamedTuple):
+    # every ModelRef in the formula, and those a quantifier binds (what `get_symbols` returns)
+    symbols: FrozenSet[ModelRef]
+    bound: FrozenSet[ModelRef]
+    # ModelRefs with an occurrence no quantifier binds
+    free: FrozenSet[ModelRef]
+    # propositions and predicates, quantified or not
+    atoms: FrozenSet[Prop]
+    depth: int
+    size: int
+
+
+_EMPTY: FrozenSet[Any] = frozenset()
+NO_META = Meta(_EMPTY, _EMPTY, _EMPTY, _EMPTY, 0, 0)
+
+
+def metadata(p: Prop) -> Meta:
+    return NO_META if isinstance(p, bool) else p._meta
+
+
+def _union(a: FrozenSet[Any], b: FrozenSet[Any]) -> FrozenSet[Any]:
+    # subformulas mostly share their sets, so reuse one when it already has everything
+    if b <= a:
+        return a
+    if a <= b:
+        return b
+    return a | b
+
+
+def _metadata(p: Node) -> Meta:
+    if isinstance(p, (And, Or, Imp)):
+        left, right = metadata(p.p), metadata(p.q)
+        return Meta(_union(left.symbols, right.symbols), _union(left.bound, right.bound), _union(left.free, right.free),
+                    _union(left.atoms, right.atoms), 1 + max(left.depth, right.depth), 1 + left.size + right.size)
+    if isinstance(p, (ForAll, Exists)):
+        body = metadata(p.formula)
+        if not isinstance(p.var, ModelRef):
+            return body._replace(depth=body.depth + 1, size=body.size + 1)
+        var = frozenset([p.var])
+        return Meta(body.symbols | var, body.bound | var, body.free - var, body.atoms, body.depth + 1, body.size + 1)
+    if isinstance(p, Predicate):
+        refs = frozenset(arg for arg in p.args if isinstance(arg, ModelRef))
+        return Meta(frozenset(p.args), _EMPTY, refs, frozenset([p]), 0, 1)
+    if isinstance(p, ModelRef):
+        return Meta(frozenset([p]), _EMPTY, frozenset([p]), _EMPTY, 0, 1)
+    if isinstance(p, BaseProp):
+        return Meta(_EMPTY, _EMPTY, _EMPTY, frozenset([p]), 0, 1)
+    return NO_META._replace(size=1)
+
+
+def canonical(root: Prop) -> Prop:
+    # `root` up to commutativity and associativity: every chain of And (or Or) is
+    # flattened, and its operands sorted by uid and nested to the right again. Two
+    # formulas are then the same up to AC exactly when their canonical forms are
+    # the same node. Built bottom-up on an explicit stack and kept on every node.
+    stack: List[Prop] = [root]
+    while stack:
+        node = stack[-1]
+        if not isinstance(node, Node) or hasattr(node, '_canon'):
+            stack.pop()
+            continue
+        if isinstance(node, (And, Or)):
+            children = _operands(node)
+        elif isinstance(node, Imp):
+            children = [node.p, node.q]
+        elif isinstance(node, (ForAll, Exists)):
+            children = [node.formula]
+        else:
+            children = []
+        missing = [child for child in children if isinstance(child, Node) and not hasattr(child, '_canon')]
+        if missing:
+            stack += missing
+            continue
+        stack.pop()
+        canon = [_canon(child) for child in children]
+        if isinstance(node, (And, Or)):
+            canon.sort(key=_order)
+            new = canon[-1]
+            for operand in reversed(canon[:-1]):
+                new = type(node)(operand, new)
+        elif isinstance(node, Imp):
+            new = Imp(canon[0], canon[1])
+        elif isinstance(node, (ForAll, Exists)):
+            new = type(node)(node.var, canon[0])
+        else:
+            new = node
+        object.__setattr__(node, '_canon', None if new is node else new)
+        if new is not node and not hasattr(new, '_canon'):
+            # its operands are canonical and already in order
+            object.__setattr__(new, '_canon', None)
+    return _canon(root)
+
+
+def ac_equal(p: Prop, q: Prop) -> bool:
+    # the same formula up to the order and grouping of /\ and \/ operands
+    return p is q or canonical(p) is canonical(q)
+
+
+def _canon(p: Prop) -> Prop:
+    if not isinstance(p, Node) or p._canon is None:
+        return p
+    return p._canon
+
+
+def _operands(chain: Node) -> List[Prop]:
+    # the maximal subformulas of a chain of one connective, however it is nested
+    operands: List[Prop] = []
+    stack: List[Prop] = [chain]
+    while stack:
+        node = stack.pop()
+        if type(node) is type(chain):
+            stack += (node.q, node.p)  # type: ignore
+        else:
+            operands.append(node)
+    return operands
+
+
+def _order(p: Prop) -> int:
+    return p._uid if isinstance(p, Node) else -1 - p
+
+
 def apply(f: Prop, x: Prop) -> Prop:
     assert isinstance(f, Imp), f'{f} is not an implication!'
     assert f.p == x, f'Implication expects {f.p}, got {x}!'
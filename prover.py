@@ -0,0 +1,570 @@
+from __future__ import annotations
+from argparse import ArgumentParser
+from dataclasses import dataclass
+from functools import partial
+import heapq
+import itertools
+from multiprocessing import Pool
+import sys
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from props import And, BaseProp, Exists, ForAll, Imp, ModelRef, Not, Or, Predicate, Prop, metadata
+from unification import RewriteRule, get_symbols, instantiate, rewrite_rules
+
+# Proof search over the rules of `argument_lookup` and the equivalence rules in
+# `unification.py`. Implications are proven with a hypothetical block,
+# conjunctions one side at a time, universals by generalizing from a fresh
+# constant, and everything else by a best-first forward search from what is
+# already known, falling back to proof by cases on a known disjunction.
+# Universals are instantiated to the constants in play, each existential to a
+# fresh constant, and existentials are only generalized towards the ones that
+# occur in the problem.
+
+
+@dataclass(eq=False)
+class Fact:
+    typ: Prop
+    rule: str
+    premises: Tuple[Fact, ...] = ()
+    depth: int = 0
+    steps: int = 0
+    # for `ded`: the hypothesis and what was proven from it
+    hyp: Optional[Fact] = None
+    conclusion: Optional[Fact] = None
+    # lines that must come first without being cited (the ei that introduced a constant)
+    after: Tuple[Fact, ...] = ()
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+class Stuck(Exception):
+    # one line of attack failed, but there is budget left to try another
+    pass
+
+
+def size(p: Prop) -> int:
+    return metadata(p).size
+
+
+def subformulas(p: Prop) -> Iterator[Prop]:
+    # in pre-order, on an explicit stack so deep formulas are fine
+    stack = [p]
+    while stack:
+        p = stack.pop()
+        yield p
+        if isinstance(p, (And, Or, Imp)):
+            stack += (p.q, p.p)
+        elif isinstance(p, (ForAll, Exists)):
+            stack.append(p.formula)
+
+
+def printable(p: Prop) -> bool:
+    # False may only show up as the consequent of a negation, since it has no syntax
+    stack = [p]
+    while stack:
+        p = stack.pop()
+        if p is False or p is True:
+            return False
+        if isinstance(p, Imp):
+            stack += (p.p,) if p.q is False else (p.p, p.q)
+        elif isinstance(p, (And, Or)):
+            stack += (p.p, p.q)
+        elif isinstance(p, (ForAll, Exists)):
+            stack.append(p.formula)
+    return True
+
+
+def atoms(p: Prop) -> Set[Prop]:
+    # closed atomic formulas, counting quantified ones as atoms
+    found: Set[Prop] = set()
+    stack = [p]
+    while stack:
+        p = stack.pop()
+        if isinstance(p, (And, Or, Imp)):
+            stack += (p.p, p.q)
+        elif isinstance(p, (BaseProp, Predicate, ForAll, Exists)):
+            found.add(p)
+    return found
+
+
+def rebuild(root: Prop, visit: Callable[[Prop], Optional[Prop]]) -> Prop:
+    # `root` with every subformula that `visit` maps to a formula replaced by it
+    # (and not looked into), built bottom-up on an explicit stack; each distinct
+    # subformula is visited once, since `visit` only depends on the node
+    done: Dict[Prop, Prop] = {}
+    stack = [root]
+    while stack:
+        p = stack[-1]
+        if p in done:
+            stack.pop()
+            continue
+        new = visit(p)
+        if new is None and isinstance(p, (And, Or, Imp)):
+            missing = [child for child in (p.p, p.q) if child not in done]
+            if missing:
+                stack += missing
+                continue
+            new = type(p)(done[p.p], done[p.q])
+        elif new is None and isinstance(p, (ForAll, Exists)):
+            if p.formula not in done:
+                stack.append(p.formula)
+                continue
+            new = type(p)(p.var, done[p.formula])
+        stack.pop()
+        done[p] = p if new is None else new
+    return done[root]
+
+
+def substitute(p: Prop, var: ModelRef, c: ModelRef) -> Prop:
+    def visit(p: Prop) -> Optional[Prop]:
+        if isinstance(p, (ForAll, Exists)) and p.var is var:
+            return p
+        if isinstance(p, Predicate):
+            return Predicate(p.name, tuple(c if arg is var else arg for arg in p.args))
+        return None
+    return rebuild(p, visit)
+
+
+FRESH_NAMES = ['Foo', 'Bar', 'Baz', 'Qux', 'Quux', 'Corge', 'Grault', 'Garply', 'Waldo', 'Fred', 'Plugh', 'Thud']
+
+
+_rules = [(name, RewriteRule(rule)) for name, rule in rewrite_rules.items()]
+
+def rewrites(p: Prop) -> Iterator[Tuple[Prop, str]]:
+    # every formula one equivalence rewrite away from `p`, at any position
+    for name, rule in _rules:
+        for direction in range(2):
+            target = rule.right if direction == 0 else rule.left
+            match = rule.directions[direction][2]
+            for sub in dict.fromkeys(subformulas(p)):
+                subst: Dict[str, Prop] = {}
+                var_subst: Dict = {}
+                if match(sub, subst, var_subst):
+                    new = replace(p, sub, instantiate(target, subst, var_subst))
+                    # the checker locates the rewrite with diff_tree, which can see a different one
+                    try:
+                        rule.rewrite((p, new))
+                    except AssertionError:
+                        continue
+                    yield new, name
+
+
+def replace(p: Prop, old: Prop, new: Prop) -> Prop:
+    return rebuild(p, lambda sub: new if sub is old else None)
+
+
+class Scope:
+    # what is known inside one (possibly hypothetical) block, with the indexes
+    # the forward rules look things up in
+    def __init__(self, parent: Optional[Scope] = None) -> None:
+        self.depth = parent.depth + 1 if parent else 0
+        self.known: Dict[Prop, Fact] = {}
+        self.by_antecedent: Dict[Prop, List[Fact]] = {}
+        self.by_consequent: Dict[Prop, List[Fact]] = {}
+        self.disjunctions: List[Fact] = []
+        self.queue: List[Tuple[int, int, Fact]] = []
+        self.queued: Set[Prop] = set()
+        if parent is not None:
+            for fact in parent.known.values():
+                self.add(fact)
+            self.queue = list(parent.queue)
+            self.queued = set(parent.queued)
+
+    def add(self, fact: Fact):
+        self.known[fact.typ] = fact
+        if isinstance(fact.typ, Imp):
+            self.by_antecedent.setdefault(fact.typ.p, []).append(fact)
+            self.by_consequent.setdefault(fact.typ.q, []).append(fact)
+        elif isinstance(fact.typ, Or):
+            self.disjunctions.append(fact)
+
+
+class Prover:
+    def __init__(self, premises: List[Prop], strategy: str = 'goal', max_nodes: int = 20000,
+                 timeout: float = 10.0) -> None:
+        self.premises = premises
+        self.strategy = strategy
+        self.max_nodes = max_nodes
+        self.deadline = time.monotonic() + timeout
+        self.nodes = 0
+        self.attempt_nodes = max(200, max_nodes // 20)
+        self.counter = itertools.count()
+        self.top = Scope()
+        self.goal_parts: Set[Prop] = set()
+        self.max_size = 0
+        self.constants: List[ModelRef] = []
+        self.names: Set[str] = set()
+        # the ei line that introduced a constant, which every use of it must follow
+        self.introduced: Dict[ModelRef, Fact] = {}
+        # instances of the existentials in the problem, for eg
+        self.instances: Dict[Prop, List[Exists]] = {}
+        self.fresh_count = 0
+        self.max_fresh = 8
+
+    def prove(self, goals: List[Prop]) -> Optional[str]:
+        problem = self.premises + goals
+        for p in problem:
+            sym, var = get_symbols(p)
+            self.names |= {ref.name for ref in sym} | {q.name.name for q in subformulas(p) if isinstance(q, Predicate)}
+            self.constants += sorted(sym - var - set(self.constants), key=repr)
+        self.add_parts([q for p in problem for q in subformulas(p)])
+        self.max_size = 2 * max(map(size, problem)) + 4
+        for premise in self.premises:
+            self.push(self.top, Fact(premise, 'prem'))
+        # excluded middle for the atoms of the problem, which the checker accepts as premises
+        for atom in set().union(*map(atoms, problem)):
+            self.push(self.top, Fact(Or(atom, Not(atom)), 'prem'))
+        try:
+            facts = [self.search(self.top, goal) for goal in goals]
+        except (BudgetExceeded, Stuck):
+            return None
+        return Emitter(self.premises, goals).emit_all(facts)
+
+    # constants
+
+    def add_parts(self, parts: List[Prop], constants: Optional[List[ModelRef]] = None):
+        # the subformulas the search aims for, closed under instantiating their quantifiers
+        while parts:
+            new: List[Prop] = []
+            for part in parts:
+                if part in self.goal_parts and constants is None:
+                    continue
+                self.goal_parts.add(part)
+                if not isinstance(part, (ForAll, Exists)):
+                    continue
+                for c in self.constants if constants is None else constants:
+                    inst = substitute(part.formula, part.var, c)
+                    if inst is part.formula:
+                        continue
+                    if isinstance(part, Exists):
+                        self.instances.setdefault(inst, []).append(part)
+                    new += [q for q in subformulas(inst) if q not in self.goal_parts]
+            parts, constants = new, None
+
+    def fresh(self) -> ModelRef:
+        self.fresh_count += 1
+        name = next(n for n in FRESH_NAMES + [a + b for a in FRESH_NAMES for b in FRESH_NAMES] if n not in self.names)
+        self.names.add(name)
+        return ModelRef(name)
+
+    def add_constant(self, scope: Scope, c: ModelRef):
+        self.constants.append(c)
+        self.add_parts([part for part in self.goal_parts if isinstance(part, (ForAll, Exists))], [c])
+        for fact in list(scope.known.values()):
+            if isinstance(fact.typ, ForAll):
+                self.instantiate(scope, fact, c)
+        return c
+
+    def instantiate(self, scope: Scope, fact: Fact, c: ModelRef):
+        assert isinstance(fact.typ, ForAll)
+        inst = substitute(fact.typ.formula, fact.typ.var, c)
+        if inst is not fact.typ.formula:
+            after = (self.introduced[c],) if c in self.introduced else ()
+            self.push(scope, Fact(inst, 'ui', (fact,), scope.depth, fact.steps + 1, after=after))
+
+    # search
+
+    def search(self, scope: Scope, goal: Prop, splits: int = 2) -> Fact:
+        if goal in scope.known:
+            return scope.known[goal]
+        if isinstance(goal, Imp) and goal.q is not False:
+            try:
+                return self.deduce(scope, goal, splits)
+            except Stuck:
+                pass
+        elif isinstance(goal, And):
+            left = self.search(scope, goal.p, splits)
+            right = self.search(scope, goal.q, splits)
+            return self.conclude(scope, Fact(goal, 'conj', (left, right), scope.depth))
+        elif isinstance(goal, ForAll) and self.fresh_left():
+            c = self.fresh()
+            self.add_constant(scope, c)
+            inst = self.search(scope, substitute(goal.formula, goal.var, c), splits)
+            return self.conclude(scope, Fact(goal, 'ug', (inst,), scope.depth))
+        try:
+            return self.saturate(scope, goal, self.attempt_nodes)
+        except Stuck:
+            pass
+        # proof by cases on a disjunction we already have
+        for d in list(scope.disjunctions) if splits else []:
+            try:
+                left = self.deduce(scope, Imp(d.typ.p, goal), splits - 1)
+                right = self.deduce(scope, Imp(d.typ.q, goal), splits - 1)
+            except Stuck:
+                continue
+            return self.conclude(scope, Fact(goal, 'de', (d, left, right), scope.depth))
+        return self.saturate(scope, goal, self.max_nodes)
+
+    def deduce(self, scope: Scope, goal: Imp, splits: int) -> Fact:
+        if goal in scope.known:
+            return scope.known[goal]
+        inner = Scope(scope)
+        hyp = Fact(goal.p, 'hyp', depth=inner.depth)
+        inner.add(hyp)
+        self.expand(inner, hyp)
+        conclusion = self.search(inner, goal.q, splits)
+        if conclusion.depth < inner.depth:
+            # `ded` only sees the block's own lines, so restate what was known outside it
+            both = Fact(And(goal.q, goal.q), 'conj', (conclusion, conclusion), inner.depth)
+            conclusion = Fact(goal.q, 'simpl', (both,), inner.depth)
+        return self.conclude(scope, Fact(goal, 'ded', depth=scope.depth, hyp=hyp, conclusion=conclusion))
+
+    def fresh_left(self) -> bool:
+        return self.fresh_count < self.max_fresh
+
+    def conclude(self, scope: Scope, fact: Fact) -> Fact:
+        scope.add(fact)
+        self.expand(scope, fact)
+        return fact
+
+    def saturate(self, scope: Scope, goal: Prop, limit: int) -> Fact:
+        # forward search until `goal` turns up; Stuck if it does not within `limit` expansions
+        for _ in range(limit):
+            if goal in scope.known:
+                return scope.known[goal]
+            if not scope.queue:
+                break
+            self.nodes += 1
+            if self.nodes > self.max_nodes or (self.nodes % 64 == 0 and time.monotonic() > self.deadline):
+                raise BudgetExceeded()
+            _, _, fact = heapq.heappop(scope.queue)
+            if fact.typ in scope.known:
+                continue
+            scope.add(fact)
+            self.expand(scope, fact)
+        if goal in scope.known:
+            return scope.known[goal]
+        raise Stuck()
+
+    def priority(self, fact: Fact) -> int:
+        if self.strategy == 'breadth':
+            return fact.steps
+        if self.strategy == 'size':
+            return size(fact.typ)
+        return size(fact.typ) - (4 if fact.typ in self.goal_parts else 0)
+
+    def push(self, scope: Scope, fact: Fact):
+        if fact.typ in scope.known or fact.typ in scope.queued:
+            return
+        if size(fact.typ) > self.max_size or not printable(fact.typ):
+            return
+        scope.queued.add(fact.typ)
+        heapq.heappush(scope.queue, (self.priority(fact), next(self.counter), fact))
+
+    def derive(self, scope: Scope, typ: Prop, rule: str, *premises: Fact):
+        steps = 1 + max(p.steps for p in premises)
+        self.push(scope, Fact(typ, rule, premises, scope.depth, steps))
+
+    def expand(self, scope: Scope, fact: Fact):
+        p = fact.typ
+        known = scope.known
+        if isinstance(p, And):
+            self.derive(scope, p.p, 'simpl', fact)
+            self.derive(scope, p.q, 'simpl', fact)
+        for new, name in rewrites(p):
+            if new is not p:
+                self.derive(scope, new, name, fact)
+        if isinstance(p, ForAll):
+            for c in list(self.constants):
+                self.instantiate(scope, fact, c)
+        elif isinstance(p, Exists) and self.fresh_left():
+            c = self.fresh()
+            inst = Fact(substitute(p.formula, p.var, c), 'ei', (fact,), scope.depth, fact.steps + 1)
+            self.introduced[c] = inst
+            self.push(scope, inst)
+            self.add_constant(scope, c)
+        for part in self.instances.get(p, []):
+            self.derive(scope, part, 'eg', fact)
+        for part in self.goal_parts:
+            if isinstance(part, Or) and p in (part.p, part.q):
+                self.derive(scope, part, 'add', fact)
+            elif isinstance(part, And) and part.p is p and part.q in known:
+                self.derive(scope, part, 'conj', fact, known[part.q])
+            elif isinstance(part, And) and part.q is p and part.p in known:
+                self.derive(scope, part, 'conj', known[part.p], fact)
+
+        if isinstance(p, Imp):
+            if p.p in known:
+                self.derive(scope, p.q, 'mp', fact, known[p.p])
+            if Not(p.q) in known:
+                self.derive(scope, Not(p.p), 'mt', fact, known[Not(p.q)])
+            for g in scope.by_consequent.get(p.p, []):
+                self.derive(scope, Imp(g.typ.p, p.q), 'hs', g, fact)
+            for g in scope.by_antecedent.get(p.q, []):
+                self.derive(scope, Imp(p.p, g.typ.q), 'hs', fact, g)
+            for d in scope.disjunctions:
+                if d.typ.p is p.p:
+                    other = known.get(Imp(d.typ.q, p.q))
+                    if other is not None:
+                        self.derive(scope, p.q, 'de', d, fact, other)
+                if d.typ.q is p.p:
+                    other = known.get(Imp(d.typ.p, p.q))
+                    if other is not None:
+                        self.derive(scope, p.q, 'de', d, other, fact)
+            if p.q is False:
+                for g in scope.by_consequent.get(p.p, []):
+                    self.derive(scope, Not(g.typ.p), 'mt', g, fact)
+                for d in scope.disjunctions:
+                    if p.p is d.typ.p:
+                        self.derive(scope, d.typ.q, 'ds', d, fact)
+                    elif p.p is d.typ.q:
+                        self.derive(scope, d.typ.p, 'ds', d, fact)
+        for g in scope.by_antecedent.get(p, []):
+            self.derive(scope, g.typ.q, 'mp', g, fact)
+        if isinstance(p, Or):
+            for side, other in ((p.p, p.q), (p.q, p.p)):
+                if Not(side) in known:
+                    self.derive(scope, other, 'ds', fact, known[Not(side)])
+            for left in scope.by_antecedent.get(p.p, []):
+                right = known.get(Imp(p.q, left.typ.q))
+                if right is not None:
+                    self.derive(scope, left.typ.q, 'de', fact, left, right)
+
+
+class Emitter:
+    def __init__(self, premises: List[Prop], goals: List[Prop]) -> None:
+        self.out = [', '.join(map(repr, goals))]
+        self.numbers: Dict[Fact, int] = {}
+        self.blocks: List[List[int]] = []
+        self.premises = premises
+
+    def emit_all(self, facts: List[Fact]) -> str:
+        premise_facts = {}
+        for fact in facts:
+            for f in self.walk(fact):
+                if f.rule == 'prem':
+                    premise_facts.setdefault(f.typ, f)
+        # the premises go first, in the order they were given
+        for premise in self.premises:
+            if premise in premise_facts:
+                self.emit(premise_facts[premise], 0)
+            else:
+                self.write(Fact(premise, 'prem'), 0, [])
+        for fact in facts:
+            self.emit(fact, 0)
+        return '\n'.join(self.out) + '\n'
+
+    def walk(self, fact: Fact) -> Iterator[Fact]:
+        seen: Set[Fact] = set()
+        stack = [fact]
+        while stack:
+            f = stack.pop()
+            if f in seen:
+                continue
+            seen.add(f)
+            yield f
+            stack.extend(f.premises + f.after)
+            if f.rule == 'ded':
+                stack += [f.hyp, f.conclusion]
+
+    def outer_dependencies(self, ded: Fact) -> List[Fact]:
+        # facts from enclosing scopes that the block cites; they are emitted before it opens
+        found: List[Fact] = []
+        seen: Set[Fact] = set()
+        stack = [ded.conclusion]
+        while stack:
+            f = stack.pop()
+            if f in seen or f in self.numbers:
+                continue
+            seen.add(f)
+            if f.depth <= ded.depth:
+                found.append(f)
+                continue
+            stack.extend(f.premises + f.after)
+            if f.rule == 'ded':
+                stack.append(f.conclusion)
+        return found
+
+    def emit(self, fact: Fact, depth: int) -> int:
+        if fact in self.numbers:
+            return self.numbers[fact]
+        if fact.rule == 'ded':
+            assert fact.hyp is not None and fact.conclusion is not None
+            for dep in self.outer_dependencies(fact):
+                self.emit(dep, depth)
+            own: List[int] = []
+            self.blocks.append(own)
+            self.emit(fact.hyp, depth + 1)
+            self.emit(fact.conclusion, depth + 1)
+            self.blocks.pop()
+            return self.write(fact, depth, own)
+        for dep in fact.after:
+            self.emit(dep, depth)
+        args = [self.emit(premise, depth) for premise in fact.premises]
+        return self.write(fact, depth, args)
+
+    def write(self, fact: Fact, depth: int, args: List[int]) -> int:
+        num = sum(1 for line in self.out[1:]) + 1
+        cited = f' {", ".join(map(str, args))}' if args else ''
+        self.out.append(f'{"| " * depth}{num}. {fact.typ!r} {fact.rule}{cited};')
+        self.numbers[fact] = num
+        if self.blocks and depth == len(self.blocks):
+            self.blocks[-1].append(num)
+        return num
+
+
+STRATEGIES = ['goal', 'size', 'breadth']
+
+
+def prove(premises: List[Prop], goals: List[Prop], strategy: str = 'goal', max_nodes: int = 20000,
+          timeout: float = 10.0) -> Optional[str]:
+    return Prover(premises, strategy, max_nodes, timeout).prove(goals)
+
+
+def prove_portfolio(premises: List[Prop], goals: List[Prop], strategies: List[str] = STRATEGIES,
+                    max_nodes: int = 20000, timeout: float = 10.0, jobs: Optional[int] = None) -> Optional[str]:
+    # every strategy runs in its own process; the first proof found wins and the rest are killed
+    attempt = partial(_prove_with, premises, goals, max_nodes=max_nodes, timeout=timeout)
+    with Pool(jobs or len(strategies)) as pool:
+        for found in pool.imap_unordered(attempt, strategies):
+            if found is not None:
+                return found
+    return None
+
+
+def _prove_with(premises: List[Prop], goals: List[Prop], strategy: str, **budget) -> Optional[str]:
+    return prove(premises, goals, strategy, **budget)
+
+
+def main(argv: Optional[List[str]] = None):
+    from checker import check_proof, preprocess
+    from fast_parser import parse_obligations, parse_proof
+
+    parser = ArgumentParser(prog='mouse prove', description='search for a proof of the obligations from the premises')
+    parser.add_argument('input_file', type=str, help='obligations on the first line, then `prem` lines')
+    parser.add_argument('--strategy', choices=STRATEGIES, default='goal')
+    parser.add_argument('--portfolio', action='store_true', help='race every strategy in its own process')
+    parser.add_argument('--nodes', type=int, default=20000, help='maximum number of formulas to expand')
+    parser.add_argument('--timeout', type=float, default=10.0, help='maximum search time in seconds')
+    parser.add_argument('-o', '--output', type=str, help='write the proof here instead of to stdout')
+    args = parser.parse_args(argv)
+
+    lines = open(args.input_file).readlines()
+    if not lines or not lines[0].strip():
+        parser.error(f'{args.input_file} has no obligations: the first line must list the formulas to prove')
+    goals = parse_obligations(lines[0])
+    premises: List[Prop] = []
+    if any(line.strip() for line in lines[1:]):
+        body = parse_proof('\n'.join(preprocess(lines[1:])))
+        premises = [line.typ for line in body.lines.values() if line.just.name == 'prem']
+
+    if args.portfolio:
+        found = prove_portfolio(premises, goals, max_nodes=args.nodes, timeout=args.timeout)
+    else:
+        found = prove(premises, goals, args.strategy, args.nodes, args.timeout)
+    if found is None:
+        print('No proof found within the search budget.', file=sys.stderr)
+        sys.exit(1)
+
+    result = check_proof(found)
+    if not result.passed:
+        # a bug in the prover, not in the problem
+        raise RuntimeError(f'The generated proof does not check!\n{found}\n{result.log}')
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(found)
+    else:
+        print(found, end='')
@@ -0,0 +1,69 @@
+from __future__ import annotations
+import json
+from typing import TYPE_CHECKING, Any, Dict, List, TextIO
+from xml.sax.saxutils import escape, quoteattr
+
+if TYPE_CHECKING:
+    from mouse import Grade
+
+# Machine-readable results of grading (`mouse --format jsonl|junit`), for CI
+# pipelines that would otherwise scrape the text output. Each file's records are
+# built as one string and written at once, so output from a long run is never
+# interleaved mid-record and costs one write per file.
+
+
+class JsonLinesReporter:
+    # one object per proof line ({"type": "line", ...}), then one for its file ({"type": "file", ...})
+    def __init__(self, out: TextIO) -> None:
+        self.out = out
+
+    def add(self, grade: Grade):
+        records: List[Dict[str, Any]] = [
+            {'type': 'line', 'file': grade.path, 'line': line.num, 'formula': line.formula, 'rule': line.rule,
+             'cites': list(line.cites), 'status': line.status, 'message': line.message}
+            for line in grade.lines
+        ]
+        records.append({'type': 'file', 'file': grade.path, 'passed': grade.passed,
+                        'seconds': round(grade.seconds, 6), 'message': grade.message,
+                        'obligations': list(grade.obligations), 'unmet': list(grade.unmet),
+                        'failed_lines': [line.num for line in grade.lines if line.status == 'failed']})
+        self.out.write(''.join(json.dumps(record) + '\n' for record in records))
+
+    def close(self, elapsed: float):
+        self.out.flush()
+
+
+class JUnitReporter:
+    # a testsuite for the run with a testcase per file; the counts go on the
+    # testsuite element, so the document is only written once every file is graded
+    def __init__(self, out: TextIO) -> None:
+        self.out = out
+        self.grades: List[Grade] = []
+
+    def add(self, grade: Grade):
+        self.grades.append(grade)
+
+    def close(self, elapsed: float):
+        failures = sum(not grade.passed for grade in self.grades)
+        counts = f'tests="{len(self.grades)}" failures="{failures}"'
+        out = ['<?xml version="1.0" encoding="utf-8"?>',
+               f'<testsuites {counts} time="{elapsed:.3f}">',
+               f'  <testsuite name="mouse" {counts} errors="0" time="{elapsed:.3f}">']
+        for grade in self.grades:
+            case = f'    <testcase classname="mouse" name={quoteattr(grade.path)} time="{grade.seconds:.3f}"'
+            if grade.passed:
+                out.append(case + ' />')
+                continue
+            details = [f'line {line.num}: {line.formula} {line.rule} {", ".join(map(str, line.cites))}'.rstrip()
+                       + f' - {line.status}: {line.message}'
+                       for line in grade.lines if line.status in ('failed', 'skipped')]
+            text = '\n'.join(details + [f'Proof obligation {o} not met!' for o in grade.unmet]) or grade.message
+            out += [case + '>',
+                    f'      <failure message={quoteattr(grade.message)} type="ProofError">{escape(text)}</failure>',
+                    '    </testcase>']
+        out += ['  </testsuite>', '</testsuites>']
+        self.out.write('\n'.join(out) + '\n')
+        self.out.flush()
+
+
+REPORTERS = {'jsonl': JsonLinesReporter, 'junit': JUnitReporter}
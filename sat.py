@@ -0,0 +1,308 @@
+from __future__ import annotations
+import heapq
+from typing import Dict, Iterable, List, Optional
+
+from props import And, Imp, Or, Prop
+
+# A small CDCL SAT solver (two watched literals, first-UIP clause learning,
+# VSIDS branching with phase saving, Luby restarts) and a Tseitin encoding of
+# formulas into it. Variables are positive ints and literals are +v / -v.
+# Anything that is not a connective (propositions, predicates, quantified
+# formulas) is an atom, so entailment here is propositional entailment.
+
+
+class Solver:
+    def __init__(self) -> None:
+        self.num_vars = 0
+        self.clauses: List[List[int]] = []
+        self.watches: Dict[int, List[List[int]]] = {}
+        self.value: Dict[int, bool] = {}
+        self.level: Dict[int, int] = {}
+        self.reason: Dict[int, Optional[List[int]]] = {}
+        self.trail: List[int] = []
+        self.trail_lim: List[int] = []
+        self.qhead = 0
+        self.activity: List[float] = [0.0]
+        self.phase: List[bool] = [False]
+        self.order: List[tuple[float, int]] = []
+        self.var_inc = 1.0
+        self.conflicts = 0
+        self.ok = True
+        self.model: Dict[int, bool] = {}
+
+    def new_var(self) -> int:
+        self.num_vars += 1
+        v = self.num_vars
+        self.watches[v], self.watches[-v] = [], []
+        self.activity.append(0.0)
+        self.phase.append(False)
+        heapq.heappush(self.order, (0.0, v))
+        return v
+
+    def lit_value(self, lit: int) -> Optional[bool]:
+        val = self.value.get(abs(lit))
+        return val if val is None or lit > 0 else not val
+
+    def add_clause(self, lits: Iterable[int]) -> bool:
+        # only at level 0, before or between calls to solve
+        assert not self.trail_lim, 'Clauses can only be added at decision level 0!'
+        clause: List[int] = []
+        for lit in dict.fromkeys(lits):
+            val = self.lit_value(lit)
+            if val is True or -lit in clause:
+                return True
+            if val is None:
+                clause.append(lit)
+        if not clause:
+            self.ok = False
+        elif len(clause) == 1:
+            self.ok = self.ok and self.enqueue(clause[0], None) and self.propagate() is None
+        else:
+            self.attach(clause)
+        return self.ok
+
+    def attach(self, clause: List[int]):
+        self.clauses.append(clause)
+        self.watches[-clause[0]].append(clause)
+        self.watches[-clause[1]].append(clause)
+
+    def enqueue(self, lit: int, reason: Optional[List[int]]) -> bool:
+        val = self.lit_value(lit)
+        if val is not None:
+            return val
+        v = abs(lit)
+        self.value[v] = lit > 0
+        self.level[v] = len(self.trail_lim)
+        self.reason[v] = reason
+        self.trail.append(lit)
+        return True
+
+    def propagate(self) -> Optional[List[int]]:
+        # watches[-lit] holds the clauses watching `lit`, to visit once `lit` is false
+        while self.qhead < len(self.trail):
+            p = self.trail[self.qhead]
+            self.qhead += 1
+            false_lit = -p
+            watching = self.watches[p]
+            kept: List[List[int]] = []
+            i = 0
+            while i < len(watching):
+                clause = watching[i]
+                i += 1
+                if clause[0] == false_lit:
+                    clause[0], clause[1] = clause[1], false_lit
+                first = clause[0]
+                if self.lit_value(first) is True:
+                    kept.append(clause)
+                    continue
+                for k in range(2, len(clause)):
+                    if self.lit_value(clause[k]) is not False:
+                        clause[1], clause[k] = clause[k], false_lit
+                        self.watches[-clause[1]].append(clause)
+                        break
+                else:
+                    kept.append(clause)
+                    if not self.enqueue(first, clause):
+                        kept.extend(watching[i:])
+                        self.watches[p] = kept
+                        self.qhead = len(self.trail)
+                        return clause
+            self.watches[p] = kept
+        return None
+
+    def analyze(self, conflict: List[int]) -> tuple[List[int], int]:
+        # first-UIP learning: resolve backwards along the trail until one
+        # literal of the current decision level is left
+        seen = set()
+        learnt = [0]
+        counter = 0
+        lit = 0
+        index = len(self.trail) - 1
+        clause: Optional[List[int]] = conflict
+        current = len(self.trail_lim)
+        while True:
+            assert clause is not None
+            for q in clause if lit == 0 else clause[1:]:
+                v = abs(q)
+                if v in seen or self.level[v] == 0:
+                    continue
+                seen.add(v)
+                self.bump(v)
+                if self.level[v] == current:
+                    counter += 1
+                else:
+                    learnt.append(q)
+            while abs(self.trail[index]) not in seen:
+                index -= 1
+            lit = self.trail[index]
+            index -= 1
+            clause = self.reason[abs(lit)]
+            seen.discard(abs(lit))
+            counter -= 1
+            if counter == 0:
+                break
+        learnt[0] = -lit
+        if len(learnt) == 1:
+            return learnt, 0
+        # the literal with the highest level after the UIP becomes the second watch
+        best = max(range(1, len(learnt)), key=lambda k: self.level[abs(learnt[k])])
+        learnt[1], learnt[best] = learnt[best], learnt[1]
+        return learnt, self.level[abs(learnt[1])]
+
+    def bump(self, v: int):
+        self.activity[v] += self.var_inc
+        if self.activity[v] > 1e100:
+            self.activity = [a * 1e-100 for a in self.activity]
+            self.var_inc *= 1e-100
+            self.order = [(-self.activity[u], u) for u in range(1, self.num_vars + 1) if u not in self.value]
+            heapq.heapify(self.order)
+        elif v not in self.value:
+            heapq.heappush(self.order, (-self.activity[v], v))
+
+    def backtrack(self, level: int):
+        if len(self.trail_lim) <= level:
+            return
+        for lit in self.trail[self.trail_lim[level]:]:
+            v = abs(lit)
+            self.phase[v] = lit > 0
+            del self.value[v]
+            heapq.heappush(self.order, (-self.activity[v], v))
+        del self.trail[self.trail_lim[level]:]
+        del self.trail_lim[level:]
+        self.qhead = len(self.trail)
+
+    def decide(self) -> Optional[int]:
+        while self.order:
+            _, v = heapq.heappop(self.order)
+            if v not in self.value:
+                return v if self.phase[v] else -v
+        return None
+
+    def solve(self) -> bool:
+        if not self.ok:
+            return False
+        restart = 0
+        while True:
+            result = self.search(100 * luby(restart))
+            restart += 1
+            if result is not None:
+                return result
+
+    def search(self, budget: int) -> Optional[bool]:
+        # None once `budget` conflicts have passed without an answer (time to restart)
+        conflicts = 0
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                self.conflicts += 1
+                conflicts += 1
+                if not self.trail_lim:
+                    self.ok = False
+                    return False
+                learnt, level = self.analyze(conflict)
+                self.backtrack(level)
+                if len(learnt) == 1:
+                    self.enqueue(learnt[0], None)
+                else:
+                    self.attach(learnt)
+                    self.enqueue(learnt[0], learnt)
+                self.var_inc /= 0.95
+            elif conflicts >= budget:
+                self.backtrack(0)
+                return None
+            else:
+                lit = self.decide()
+                if lit is None:
+                    self.model = dict(self.value)
+                    self.backtrack(0)
+                    return True
+                self.trail_lim.append(len(self.trail))
+                self.enqueue(lit, None)
+
+    def model_value(self, v: int) -> bool:
+        return self.model.get(v, False)
+
+
+def luby(i: int) -> int:
+    # 1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8, ...
+    size, seq = 1, 0
+    while size < i + 1:
+        seq += 1
+        size = 2 * size + 1
+    while size - 1 != i:
+        size = (size - 1) >> 1
+        seq -= 1
+        i %= size
+    return 1 << seq
+
+
+class Encoder:
+    # Tseitin encoding: one variable per distinct (interned) subformula
+    def __init__(self, solver: Optional[Solver] = None) -> None:
+        self.solver = solver or Solver()
+        self.lits: Dict[Prop, int] = {}
+        self.atoms: Dict[Prop, int] = {}
+
+    def encode(self, root: Prop) -> int:
+        # children before parents, left before right (the numbering a recursive
+        # encoder would give), on an explicit stack
+        stack = [(root, False)]
+        while stack:
+            p, expanded = stack.pop()
+            if p in self.lits:
+                continue
+            if not expanded and isinstance(p, (And, Or, Imp)):
+                stack.append((p, True))
+                if not (isinstance(p, Imp) and p.q is False):
+                    stack.append((p.q, False))
+                stack.append((p.p, False))
+                continue
+            self.lits[p] = self.literal(p)
+        return self.lits[root]
+
+    def literal(self, p: Prop) -> int:
+        # p's variable, once its children have theirs
+        solver = self.solver
+        if p is False or p is True:
+            x = solver.new_var()
+            solver.add_clause([x if p else -x])
+        elif isinstance(p, Imp) and p.q is False:
+            x = -self.lits[p.p]
+        elif isinstance(p, (And, Or, Imp)):
+            a, b = self.lits[p.p], self.lits[p.q]
+            if isinstance(p, Imp):
+                a = -a
+            x = solver.new_var()
+            if isinstance(p, And):
+                solver.add_clause([-x, a])
+                solver.add_clause([-x, b])
+                solver.add_clause([x, -a, -b])
+            else:
+                solver.add_clause([-x, a, b])
+                solver.add_clause([x, -a])
+                solver.add_clause([x, -b])
+        else:
+            x = solver.new_var()
+            self.atoms[p] = x
+        return x
+
+
+def countermodel(premises: List[Prop], conclusion: Prop) -> Optional[Dict[Prop, bool]]:
+    # an assignment to the atoms making every premise true and the conclusion
+    # false, or None if the premises (propositionally) entail the conclusion
+    encoder = Encoder()
+    solver = encoder.solver
+    for premise in premises:
+        solver.add_clause([encoder.encode(premise)])
+    solver.add_clause([-encoder.encode(conclusion)])
+    if not solver.solve():
+        return None
+    return {atom: solver.model_value(v) for atom, v in encoder.atoms.items()}
+
+
+def entails(premises: List[Prop], conclusion: Prop) -> bool:
+    return countermodel(premises, conclusion) is None
+
+
+def is_valid(p: Prop) -> bool:
+    return entails([], p)
@@ -0,0 +1,167 @@
+from __future__ import annotations
+from importlib.util import find_spec
+from typing import TYPE_CHECKING, Dict, FrozenSet, List, Optional, Set, TextIO
+
+from props import And, Exists, ForAll, Imp, Or, Prop
+
+if TYPE_CHECKING:
+    import numpy as np
+    from proof import Context, Line, Proof
+
+# Truth tables as bit-packed numpy arrays: with n atoms, assignment k (bit i of
+# k is the value of atom i) is bit k % 64 of word k // 64. Every formula node
+# is evaluated once per table, with whole-array bitwise operations.
+
+MAX_ATOMS = 24
+# above this, each line gets a table over just its own atoms
+SHARED_ATOMS = 16
+
+_ONES = (1 << 64) - 1
+# the first six atoms vary inside a word, the rest from word to word
+_WORD_PATTERNS = [sum(1 << b for b in range(64) if b >> i & 1) for i in range(6)]
+
+
+def available() -> bool:
+    return find_spec('numpy') is not None
+
+
+class TruthTable:
+    def __init__(self, atoms: List[Prop]) -> None:
+        assert available(), 'The semantic check needs numpy (pip install proof-mouse[semantic])'
+        # imported where it is used, so that checking without --semantic never pays for numpy
+        import numpy as np
+        assert len(atoms) <= MAX_ATOMS, f'Too many atoms for a truth table ({len(atoms)} > {MAX_ATOMS})!'
+        self.atoms = atoms
+        n = len(atoms)
+        words = max(1, (1 << n) // 64)
+        self.mask = np.full(words, _ONES, dtype=np.uint64)
+        if n < 6:
+            self.mask[0] = (1 << (1 << n)) - 1
+        self.cache: Dict[Prop, np.ndarray] = {}
+        index = np.arange(words, dtype=np.uint64)
+        for i, atom in enumerate(atoms):
+            if i < 6:
+                self.cache[atom] = np.full(words, _WORD_PATTERNS[i], dtype=np.uint64)
+            else:
+                self.cache[atom] = np.where((index >> np.uint64(i - 6)) & np.uint64(1), np.uint64(_ONES), np.uint64(0))
+
+    def eval(self, root: Prop) -> np.ndarray:
+        # children before parents, on an explicit stack
+        import numpy as np
+        stack = [(root, False)]
+        while stack:
+            p, expanded = stack.pop()
+            if p in self.cache:
+                continue
+            if isinstance(p, (And, Or, Imp)) and not expanded:
+                stack.append((p, True))
+                if not (isinstance(p, Imp) and p.q is False):
+                    stack.append((p.q, False))
+                stack.append((p.p, False))
+                continue
+            if p is False:
+                table = np.zeros_like(self.mask)
+            elif isinstance(p, Imp) and p.q is False:
+                table = ~self.cache[p.p]
+            elif isinstance(p, Imp):
+                table = ~self.cache[p.p] | self.cache[p.q]
+            elif isinstance(p, And):
+                table = self.cache[p.p] & self.cache[p.q]
+            elif isinstance(p, Or):
+                table = self.cache[p.p] | self.cache[p.q]
+            else:
+                assert False, f'{p} is not an atom of this truth table!'
+            self.cache[p] = table
+        return self.cache[root]
+
+    def counterexample(self, premises: List[Prop], conclusion: Prop) -> Optional[Dict[Prop, bool]]:
+        # an assignment making the premises true and the conclusion false, if any
+        import numpy as np
+        bad = self.mask & ~self.eval(conclusion)
+        for premise in premises:
+            bad = bad & self.eval(premise)
+        nonzero = np.flatnonzero(bad)
+        if not len(nonzero):
+            return None
+        word = int(nonzero[0])
+        bits = int(bad[word])
+        k = word * 64 + (bits & -bits).bit_length() - 1
+        return {atom: bool(k >> i & 1) for i, atom in enumerate(self.atoms)}
+
+
+def atoms_of(root: Prop, memo: Dict[Prop, Optional[FrozenSet[Prop]]]) -> Optional[FrozenSet[Prop]]:
+    # the atoms of a propositional formula, or None if it is quantified
+    stack = [(root, False)]
+    while stack:
+        p, expanded = stack.pop()
+        if p in memo:
+            continue
+        if isinstance(p, (And, Or, Imp)) and not expanded:
+            stack += [(p, True), (p.q, False), (p.p, False)]
+            continue
+        found: Optional[FrozenSet[Prop]]
+        if p is False:
+            found = frozenset()
+        elif isinstance(p, (And, Or, Imp)):
+            left, right = memo[p.p], memo[p.q]
+            found = None if left is None or right is None else left | right
+        elif isinstance(p, (ForAll, Exists)):
+            found = None
+        else:
+            found = frozenset([p])
+        memo[p] = found
+    return memo[root]
+
+
+def block_lines(proof: Proof) -> Set[int]:
+    nums = set(proof.lines)
+    for subproof in proof.subproofs:
+        nums |= block_lines(subproof)
+    return nums
+
+
+def cited(ctx: Context, line: Line) -> List[Prop]:
+    # what a line rests on: its arguments, or for `ded`, whatever its block cites from outside
+    if line.just.name != 'ded':
+        return [ctx.lines[arg].typ for arg in line.just.args]
+    inner = block_lines(ctx.proofs[line.just.span])  # type: ignore
+    outside = {arg for num in inner for arg in ctx.lines[num].just.args} - inner
+    return [ctx.lines[num].typ for num in sorted(outside)]
+
+
+def cross_check(ctx: Context, out: TextIO) -> bool:
+    # confirm every checked propositional line is entailed by what it cites,
+    # independently of the rules in arguments.py
+    lines = [line for num, line in sorted(ctx.lines.items()) if hasattr(line, 'arg') and line.just.name not in ('hyp', 'prem')]
+    problems: Dict[int, tuple[List[Prop], FrozenSet[Prop]]] = {}
+    memo: Dict[Prop, Optional[FrozenSet[Prop]]] = {}
+    skipped = 0
+    for line in lines:
+        premises = cited(ctx, line)
+        atoms: Optional[FrozenSet[Prop]] = frozenset()
+        for p in premises + [line.typ]:
+            found = atoms_of(p, memo)
+            atoms = None if found is None or atoms is None else atoms | found
+        if atoms is None or len(atoms) > MAX_ATOMS:
+            skipped += 1
+            continue
+        problems[line.num] = premises, atoms
+
+    # one table for the whole proof when it is small enough, otherwise one per set of atoms
+    every = frozenset().union(*(atoms for _, atoms in problems.values()))
+    tables: Dict[FrozenSet[Prop], TruthTable] = {}
+    for line in lines:
+        if line.num not in problems:
+            continue
+        premises, atoms = problems[line.num]
+        key = every if len(every) <= SHARED_ATOMS else atoms
+        if key not in tables:
+            tables[key] = TruthTable(sorted(key, key=repr))
+        model = tables[key].counterexample(premises, line.typ)
+        if model is not None:
+            falsified = ', '.join(f'{atom}={"T" if value else "F"}' for atom, value in model.items())
+            ctx.error = f'Line {line.num} does not follow from the lines it cites! (counterexample: {falsified})'
+            print(f'Semantic check failed: {ctx.error}', file=out)
+            return False
+    print(f'Semantic check: {len(problems)} lines confirmed, {skipped} skipped', file=out)
+    return True
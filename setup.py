@@ -14,6 +14,7 @@ setuptools.setup(
     license='MIT',
     packages=['.'],
     install_requires=['pyparsing==3.0.9'],
+    extras_require={'semantic': ['numpy']},
     entry_points={
         'console_scripts': ['mouse=mouse:main']
     }
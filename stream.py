@@ -0,0 +1,167 @@
+from __future__ import annotations
+import io
+from typing import Callable, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+
+from checker import Result, is_axiom, log_contents, unmet_obligations
+from fast_parser import ParseException, parse_line, parse_obligations
+from proof import Context, Line, Proof
+
+# Events produced while reading a proof: a block opening or closing, or a parsed
+# line, each tagged with the (1-based) line of the file it came from.
+Event = Tuple[str, Optional[Line], int]
+
+
+def block_depth(line: str) -> Tuple[int, str]:
+    depth = 0
+    while line.startswith('| '):
+        line = line[2:]
+        depth += 1
+    return depth, line.strip()
+
+
+class StatementBuffer:
+    # text of the statement being read, which may span several physical lines
+    def __init__(self) -> None:
+        self.text = ''
+        self.lineno = 0
+
+    def feed(self, content: str, lineno: int):
+        if not self.text.strip():
+            self.text, self.lineno = '', lineno
+        self.text += content + '\n'
+
+    def pending(self) -> bool:
+        return bool(self.text.strip())
+
+    def statements(self) -> Iterator[Tuple[str, int]]:
+        while True:
+            stripped = self.text.lstrip()
+            self.lineno += self.text[:len(self.text) - len(stripped)].count('\n')
+            self.text = stripped
+            if self.text.startswith('/*'):
+                end = self.text.find('*/')
+                if end < 0:
+                    return
+                end += 2
+            else:
+                end = self.text.find(';') + 1
+                if end == 0:
+                    return
+                yield self.text[:end], self.lineno
+            self.lineno += self.text[:end].count('\n')
+            self.text = self.text[end:]
+
+
+def iter_events(lines: Iterable[str], first_lineno: int = 1,
+                parse: Optional[Callable[[str, int], Line]] = None) -> Iterator[Event]:
+    # the streaming counterpart of `checker.preprocess` followed by the parser:
+    # only the statement currently being read is ever held in memory (the text;
+    # the parsed lines are kept by `StreamChecker`)
+    parse = parse or _parse_statement
+    buffer = StatementBuffer()
+    depth = 0
+    lineno = first_lineno - 1
+    for lineno, raw in enumerate(lines, first_lineno):
+        new_depth, content = block_depth(raw)
+        if new_depth != depth:
+            if buffer.pending():
+                # the statement must end before the block does; parsing it reports where
+                parse(buffer.text, buffer.lineno)
+                raise ParseException(buffer.text, len(buffer.text.rstrip()), "Expected ';'")
+            for _ in range(depth - new_depth):
+                yield 'close', None, lineno
+            for _ in range(new_depth - depth):
+                yield 'open', None, lineno
+            depth = new_depth
+        buffer.feed(content, lineno)
+        for statement, start in buffer.statements():
+            yield 'line', parse(statement, start), start
+    if buffer.pending():
+        parse(buffer.text, buffer.lineno)
+    for _ in range(depth):
+        yield 'close', None, lineno
+
+
+def _parse_statement(statement: str, lineno: int) -> Line:
+    try:
+        return parse_line(statement)
+    except ParseException as e:
+        raise ParseException(e.pstr, e.loc, f'{e.msg} (in the statement starting on line {lineno})') from None
+
+
+class StreamChecker:
+    def __init__(self, ctx: Context) -> None:
+        self.ctx = ctx
+        self.blocks: List[Tuple[List[Line], List[Proof]]] = [([], [])]
+
+    def open_block(self):
+        self.blocks.append(([], []))
+
+    def close_block(self) -> Proof:
+        lines, subproofs = self.blocks.pop()
+        assert lines or subproofs, 'Empty hypothetical block!'
+        proof = Proof(lines, subproofs)
+        self.ctx.add_proof(proof)
+        proof.compile(self.ctx)
+        if self.blocks:
+            self.blocks[-1][1].append(proof)
+        return proof
+
+    def add_line(self, line: Line):
+        # every line stays citable for the rest of the run, as in `Context.check`,
+        # which lets a later line cite one inside a closed block; dropping those
+        # would bound memory by the open blocks, but --stream would then reject
+        # proofs the whole-file check accepts
+        self.ctx.lines[line.num] = line
+        self.blocks[-1][0].append(line)
+
+    def check_line(self, line: Line):
+        # the batch checker seeds the constants with every premise up front,
+        # which a stream cannot do; `Context.check_line` catches premises that
+        # reuse an ei constant instead
+        self.ctx.check_line(line)
+
+    def finish(self) -> Proof:
+        assert len(self.blocks) == 1
+        return self.close_block()
+
+
+def check_stream(lines: Iterable[str], out: Optional[TextIO] = None, fail_fast: bool = False) -> Result:
+    log = out if out is not None else io.StringIO()
+    ctx = Context(log)
+    checker = StreamChecker(ctx)
+    lines = iter(lines)
+    failed = False
+    try:
+        obligations = parse_obligations(next(lines, ''))
+        for kind, line, lineno in iter_events(lines, 2):
+            if kind == 'open':
+                checker.open_block()
+            elif kind == 'close' and not failed:
+                checker.close_block()
+            elif kind == 'close':
+                checker.blocks.pop()
+            else:
+                assert line is not None
+                checker.add_line(line)
+                if failed:
+                    continue
+                try:
+                    checker.check_line(line)
+                except AssertionError as e:
+                    ctx.report_error(e)
+                    failed = True
+                    if fail_fast:
+                        break
+    except ParseException as e:
+        print(e.explain(depth=0), file=log)
+        return Result(False, error=e.explain(depth=0), log=log_contents(log))
+    if failed:
+        return Result(False, obligations, error=ctx.error, log=log_contents(log))
+
+    main_proof = checker.finish()
+    hyp, deds = ctx.proof_types[main_proof]
+    unmet = unmet_obligations(obligations, deds)
+    hypotheses = {h for h in hyp if not is_axiom(h)}
+    return Result(not unmet, obligations, unmet, hypotheses, log=log_contents(log))
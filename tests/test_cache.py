@@ -0,0 +1,80 @@
+import io
+
+from cache import LineCache
+from checker import check_proof
+
+PROOF = r'''Q \/ R
+1. P /\ Q prem;
+2. Q /\ P and_comm 1;
+3. Q simpl 2;
+4. Q \/ R add 3;
+5. P simpl 1;
+'''
+
+EI = '''exists x, P(x)
+1. exists x, P(x) prem;
+2. Q(b) prem;
+3. P(c) ei 1;
+4. exists x, P(x) eg 3;
+'''
+
+
+class RecordingCache(LineCache):
+    # remembers each line's key, to tell the lines found in the cache from those checked again
+    def __init__(self, path: str) -> None:
+        super().__init__(path)
+        self.keys = {}
+
+    def key(self, line, ctx):
+        self.keys[line.num] = super().key(line, ctx)
+        return self.keys[line.num]
+
+
+def check(tmp_path, text: str):
+    # a run of `mouse --cache`: the cache file is read before and written after
+    path = tmp_path / 'proof.txt'
+    path.write_text(text)
+    cache = RecordingCache(str(tmp_path / '.proof.txt.mousecache'))
+    cache.load()
+    warm = set(cache.entries)
+    out = io.StringIO()
+    result = check_proof(text, out, cache=cache)
+    rechecked = {num for num, key in cache.keys.items() if key not in warm}
+    return result, rechecked, out.getvalue()
+
+
+def test_unchanged_proof_is_not_checked_again(tmp_path):
+    result, rechecked, _ = check(tmp_path, PROOF)
+    assert result.passed and rechecked == {1, 2, 3, 4, 5}
+    result, rechecked, _ = check(tmp_path, PROOF)
+    assert result.passed and rechecked == set()
+
+
+def test_edit_rechecks_exactly_the_lines_downstream(tmp_path):
+    check(tmp_path, PROOF)
+    # same formula, another justification: lines 3 and 4 rest on line 2, 1 and 5 do not
+    result, rechecked, out = check(tmp_path, PROOF.replace('and_comm 1', 'ac 1'))
+    assert result.passed
+    assert rechecked == {2, 3, 4}
+    assert '2. (Q /\\ P) ac [1]\t✓' in out
+
+
+def test_failed_edit_is_not_cached(tmp_path):
+    check(tmp_path, PROOF)
+    broken = PROOF.replace('3. Q simpl 2', '3. R simpl 2')
+    for _ in range(2):
+        result, rechecked, _ = check(tmp_path, broken)
+        assert not result.passed and 3 in rechecked
+
+
+def test_reused_ei_constant_is_caught_with_a_warm_cache(tmp_path):
+    result, _, _ = check(tmp_path, EI)
+    assert result.passed
+    # line 3 and the line it cites are unchanged, but `c` is no longer fresh there
+    result, rechecked, out = check(tmp_path, EI.replace('Q(b)', 'Q(c)'))
+    assert not result.passed
+    assert 3 in rechecked
+    assert '`c` is not a fresh constant!' in out
+    # and it stays caught on the next run
+    result, _, _ = check(tmp_path, EI.replace('Q(b)', 'Q(c)'))
+    assert not result.passed
@@ -0,0 +1,29 @@
+import io
+
+import cache
+from checker import check_proof
+from compiled import CompiledCache
+
+TEXT = 'Q\n1. P prem;\n2. P -> Q prem;\n3. Q mp 2, 1;\n'
+
+
+def test_compiled_proof_is_reused(tmp_path):
+    compiled = CompiledCache(str(tmp_path / '.proof.txt.mousec'))
+    assert check_proof(TEXT, io.StringIO(), compiled=compiled).passed
+    obligations, proof = compiled.load(TEXT)
+    assert [repr(o) for o in obligations] == ['Q']
+    assert sorted(proof.lines) == [1, 2, 3]
+    assert compiled.load(TEXT.replace('mp 2, 1', 'mp 1, 2')) is None
+
+
+def test_compiled_proof_from_another_checker_is_ignored(tmp_path, monkeypatch):
+    compiled = CompiledCache(str(tmp_path / '.proof.txt.mousec'))
+    check_proof(TEXT, io.StringIO(), compiled=compiled)
+    monkeypatch.setattr(cache, 'CHECKER_VERSION', cache.CHECKER_VERSION + 1)
+    cache.checker_fingerprint.cache_clear()
+    try:
+        assert compiled.load(TEXT) is None
+    finally:
+        monkeypatch.undo()
+        cache.checker_fingerprint.cache_clear()
+    assert compiled.load(TEXT) is not None
@@ -0,0 +1,42 @@
+import io
+
+import pytest
+
+from checker import check_proof
+import mouse
+from props import And, BaseProp, ModelRef, Predicate
+
+np = pytest.importorskip('numpy')
+
+
+def nested(depth: int) -> str:
+    # (Q(a) /\ (Q(a) /\ ... P(a)))
+    p = 'P(a)'
+    for _ in range(depth):
+        p = fr'(Q(a) /\ {p})'
+    return p
+
+
+def test_countermodel_for_deep_first_order_premise():
+    from models import find_countermodel
+    a = ModelRef('a')
+    premise = Predicate(BaseProp('P'), (a,))
+    for _ in range(3000):
+        premise = And(Predicate(BaseProp('Q'), (a,)), premise)
+    search = find_countermodel([premise], Predicate(BaseProp('R'), (a,)))
+    assert search.model is not None
+    assert search.model.relations[BaseProp('R'), 1] == set()
+
+
+@pytest.mark.parametrize('keep_going', [False, True])
+def test_deep_first_order_premise_reports_unmet_obligation(capsys, keep_going):
+    result = check_proof(f'R(a)\n1. {nested(3000)} prem;\n', io.StringIO(), keep_going=keep_going)
+    assert result.unmet
+    if keep_going:
+        assert not mouse.report(result, keep_going=True)
+    else:
+        with pytest.raises(Exception, match=r'Proof obligation R\(a\) not met!'):
+            mouse.report(result)
+    out = capsys.readouterr().out
+    assert 'Countermodel' in out
+    assert 'Could not look' not in out
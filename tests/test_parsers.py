@@ -0,0 +1,104 @@
+import glob
+import os
+import random
+
+import pytest
+
+from checker import preprocess
+import fast_parser
+from fast_parser import ParseException
+import proof_parser
+
+# The hand-written parser and the pyparsing grammar must build the same trees and
+# reject the same input, since `--parser pyparsing` is the fallback when they
+# disagree. Error positions may differ: where pyparsing backtracks to a shorter
+# formula that parses and then expects the end of the text, the hand-written
+# parser points at the token that cannot continue the longer one.
+
+FORMULAS = [
+    'P', r'~~P', r'P /\ Q \/ R -> S', r'P -> Q -> R', r'(P -> Q) -> R', r'~(P \/ Q) /\ ~R',
+    'forall x, P(x)', r'exists y, P(y) /\ Q(a, y)', r'forall x, exists y, R(x, y) -> S',
+    r'(forall x, P(x)) -> P(a)', r'P, Q /\ R, forall x, Q(x)',
+]
+
+# malformed input, with where each parser reports the error
+BAD_FORMULAS = [
+    ('P Q', 2, 2),
+    (r'P /\ ', 5, 5),
+    ('(P -> Q', 7, 7),
+    ('forall x P(x)', 9, 9),
+    ('~', 1, 1),
+    (')', 0, 0),
+    ('exists y, ', 10, 10),
+    (r'P /\ (Q \/ )', 11, 11),
+    ('forall x, P(x) )', 15, 15),
+    ('Q(, y)', 2, 1),
+    ('P(x', 3, 1),
+    ('P, ', 3, 1),
+    ('P -> -> Q', 5, 2),
+]
+
+BAD_PROOFS = [
+    ('1. P prem', 9, 9),
+    ('1. P;', 4, 4),
+    ('1. P prem; }', 11, 11),
+    ('{ 1. P hyp; ', 12, 12),
+    ('1 . P prem;', 2, 1),
+    ('1. P prem 1-;', 12, 11),
+    ('1. P mp 1,;', 10, 9),
+]
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROOFS = sorted(glob.glob(os.path.join(ROOT, 'examples', '*.txt')) + glob.glob(os.path.join(ROOT, 'hw6', '*.txt')))
+
+
+def error_position(parse, text: str) -> int:
+    with pytest.raises(ParseException) as e:
+        parse(text)
+    return e.value.loc
+
+
+def tree(proof) -> tuple:
+    return [(line.num, line.typ, line.just.name, line.just.args) for line in proof.lines.values()], \
+        [tree(subproof) for subproof in proof.subproofs]
+
+
+@pytest.mark.parametrize('text', FORMULAS)
+def test_same_formulas(text):
+    assert fast_parser.parse_obligations(text) == proof_parser.parse_obligations(text)
+
+
+@pytest.mark.parametrize('path', PROOFS, ids=os.path.basename)
+def test_same_proofs(path):
+    lines = open(path).read().splitlines()
+    text = '\n'.join(preprocess(lines[1:]))
+    assert fast_parser.parse_obligations(lines[0]) == proof_parser.parse_obligations(lines[0])
+    assert tree(fast_parser.parse_proof(text)) == tree(proof_parser.parse_proof(text))
+
+
+@pytest.mark.parametrize('text, fast, pyparsing', BAD_FORMULAS)
+def test_bad_formulas(text, fast, pyparsing):
+    assert error_position(fast_parser.parse_obligations, text) == fast
+    assert error_position(proof_parser.parse_obligations, text) == pyparsing
+
+
+@pytest.mark.parametrize('text, fast, pyparsing', BAD_PROOFS)
+def test_bad_proofs(text, fast, pyparsing):
+    assert error_position(fast_parser.parse_proof, text) == fast
+    assert error_position(proof_parser.parse_proof, text) == pyparsing
+
+
+def test_random_input():
+    # both accept and build the same tree, or both reject
+    rng = random.Random(0)
+    pieces = ['P', 'Q', 'R(x, y)', 'Q(a)', '(', ')', '~', r'/\ ', r'\/ ', '-> ', ', ', 'forall x, ', 'exists y, ',
+              'x', 'P(', ' ']
+    for _ in range(2000):
+        text = ''.join(rng.choice(pieces) for _ in range(rng.randint(1, 8)))
+        results = []
+        for parser in (fast_parser, proof_parser):
+            try:
+                results.append(parser.parse_obligations(text))
+            except ParseException:
+                results.append(None)
+        assert results[0] == results[1], text
@@ -0,0 +1,129 @@
+from itertools import product
+import random
+
+from props import And, BaseProp, Exists, ForAll, Imp, ModelRef, Not, Or, Predicate, Prop
+from sat import Solver, countermodel, entails, is_valid, luby
+
+x = ModelRef('x')
+# anything that is not a connective is an atom, quantified formulas included
+ATOMS = [BaseProp('P'), BaseProp('Q'), BaseProp('R'), Predicate(BaseProp('S'), (ModelRef('a'),)),
+         ForAll(x, Predicate(BaseProp('T'), (x,)))]
+
+
+def random_formula(depth: int, rng: random.Random, atoms=ATOMS) -> Prop:
+    if depth == 0 or rng.random() < 0.25:
+        return rng.choice(atoms)
+    kind = rng.randrange(4)
+    if kind == 0:
+        return Not(random_formula(depth - 1, rng, atoms))
+    return (And, Or, Imp)[kind - 1](random_formula(depth - 1, rng, atoms), random_formula(depth - 1, rng, atoms))
+
+
+def evaluate(p: Prop, model) -> bool:
+    if p is False:
+        return False
+    if isinstance(p, Imp):
+        return not evaluate(p.p, model) or (p.q is not False and evaluate(p.q, model))
+    if isinstance(p, And):
+        return evaluate(p.p, model) and evaluate(p.q, model)
+    if isinstance(p, Or):
+        return evaluate(p.p, model) or evaluate(p.q, model)
+    # atoms the solver never saw are unconstrained; any value will do
+    return model.get(p, False)
+
+
+def brute_force_entails(premises, conclusion) -> bool:
+    for values in product([False, True], repeat=len(ATOMS)):
+        model = dict(zip(ATOMS, values))
+        if all(evaluate(premise, model) for premise in premises) and not evaluate(conclusion, model):
+            return False
+    return True
+
+
+def test_is_valid_matches_truth_table():
+    rng = random.Random(0)
+    valid = 0
+    for _ in range(1500):
+        p = random_formula(4, rng, ATOMS[:3])
+        # p -> p and excluded middle, so both answers come up often
+        p = rng.choice([p, Imp(p, p), Or(p, Not(p)), Imp(Not(Not(p)), p), And(p, Not(p))])
+        expected = brute_force_entails([], p)
+        assert is_valid(p) == expected, p
+        valid += expected
+    assert 0 < valid < 1500
+
+
+def test_entails_matches_truth_table():
+    rng = random.Random(1)
+    results = set()
+    for _ in range(1500):
+        premises = [random_formula(3, rng) for _ in range(rng.randint(0, 3))]
+        conclusion = random_formula(3, rng)
+        expected = brute_force_entails(premises, conclusion)
+        assert entails(premises, conclusion) == expected, (premises, conclusion)
+        results.add(expected)
+    assert results == {False, True}
+
+
+def test_countermodels_are_countermodels():
+    rng = random.Random(2)
+    found = 0
+    for _ in range(1500):
+        premises = [random_formula(3, rng) for _ in range(rng.randint(0, 3))]
+        conclusion = random_formula(3, rng)
+        model = countermodel(premises, conclusion)
+        if model is None:
+            assert brute_force_entails(premises, conclusion)
+            continue
+        found += 1
+        assert set(model) <= set(ATOMS)
+        assert all(evaluate(premise, model) for premise in premises), (premises, conclusion, model)
+        assert not evaluate(conclusion, model), (premises, conclusion, model)
+    assert found
+
+
+def test_contradictory_premises_entail_anything():
+    p = BaseProp('P')
+    assert entails([p, Not(p)], BaseProp('Q'))
+    assert countermodel([And(p, Not(p))], False) is None
+
+
+def solve(clauses, num_vars):
+    solver = Solver()
+    for _ in range(num_vars):
+        solver.new_var()
+    for clause in clauses:
+        solver.add_clause(clause)
+    return solver, solver.solve()
+
+
+def test_solver_matches_brute_force_on_random_cnf():
+    # random 3-SAT near the satisfiability threshold, so about half are unsatisfiable
+    rng = random.Random(3)
+    answers = set()
+    for _ in range(300):
+        n = rng.randint(3, 10)
+        clauses = [[rng.choice([1, -1]) * rng.randint(1, n) for _ in range(3)] for _ in range(round(4.3 * n))]
+        solver, sat = solve(clauses, n)
+        expected = any(all(any(values[abs(lit) - 1] == (lit > 0) for lit in clause) for clause in clauses)
+                       for values in product([False, True], repeat=n))
+        assert sat == expected, clauses
+        if sat:
+            assert all(any(solver.model_value(abs(lit)) == (lit > 0) for lit in clause) for clause in clauses)
+        answers.add(sat)
+    assert answers == {False, True}
+
+
+def test_pigeonhole_is_unsatisfiable():
+    # 6 pigeons in 5 holes: hard enough to need learnt clauses and restarts
+    pigeons, holes = 6, 5
+    var = {(p, h): p * holes + h + 1 for p in range(pigeons) for h in range(holes)}
+    clauses = [[var[p, h] for h in range(holes)] for p in range(pigeons)]
+    clauses += [[-var[p, h], -var[q, h]] for h in range(holes) for p in range(pigeons) for q in range(p)]
+    solver, sat = solve(clauses, len(var))
+    assert not sat
+    assert solver.conflicts > 100
+
+
+def test_luby():
+    assert [luby(i) for i in range(15)] == [1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8]
@@ -1,7 +1,7 @@
 
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Callable, Dict, Set
+from typing import TYPE_CHECKING, Callable, Dict, FrozenSet, Optional, Set
 
 from props import *
 
@@ -10,160 +10,228 @@ if TYPE_CHECKING:
 
 
 def unify(p: Prop, q: Prop, subst: Dict[str, Prop]={}, var_subst: Dict[str, ModelRef]={}) -> bool:
-    if PropHole in (type(p), type(q)):
-        if type(p) is PropHole:
-            hole, exp = p.name, q
-        else:
-            assert type(q) is PropHole # mypy
-            hole, exp = q.name, p
+    # the pairs still to unify, on an explicit stack: left subterms first, stopping at the first mismatch
+    pending = [(p, q)]
+    while pending:
+        p, q = pending.pop()
+        if PropHole in (type(p), type(q)):
+            if type(p) is PropHole:
+                hole, exp = p.name, q
+            else:
+                assert type(q) is PropHole # mypy
+                hole, exp = q.name, p
+                
+            if hole in subst:
+                if subst[hole] != exp:
+                    return False
+                continue
             
-        if hole in subst:
-            return subst[hole] == exp
+            subst[hole] = exp
+            continue
         
-        subst[hole] = exp
-        return True
-    
-    if ModelRefHole in (type(p), type(q)):
-        if type(p) is ModelRefHole:
-            hole, exp = p.name, q
-        else:
-            assert type(q) is ModelRefHole
-            hole, exp = q.name, p
-    
-        if not (type(exp) is ModelRef):
-            return False
+        if ModelRefHole in (type(p), type(q)):
+            if type(p) is ModelRefHole:
+                hole, exp = p.name, q
+            else:
+                assert type(q) is ModelRefHole
+                hole, exp = q.name, p
         
-        if hole in var_subst:
-            return var_subst[hole] == exp
-    
-        var_subst[hole] = exp
-        return True
+            if not (type(exp) is ModelRef):
+                return False
+            
+            if hole in var_subst:
+                if var_subst[hole] != exp:
+                    return False
+                continue
         
+            var_subst[hole] = exp
+            continue
         
-    
-    # match p, q:
-    #     case (And(a, b), And(c, d)) | (Or(a, b), Or(c, d)) | (Imp(a, b), Imp(c, d)):
-    #         return unify(a, c, subst) and unify(b, d, subst)
-    #     case PropVar(a), PropVar(b):
-    #         assert False, 'Whoops! I need to implement this :)'
-    #     case (True, True) | (False, False):
-    #         return True
-    #     case BaseProp(a), BaseProp(b):
-    #         return a == b
-    #     case _:
-    #         return False
-    
-    
-    if (isinstance(p, And) and isinstance(q, And)) or ((isinstance(p, Or) and isinstance(q, Or))) or ((isinstance(p, Imp) and isinstance(q, Imp))):
-        return unify(p.p, q.p, subst, var_subst) and unify(p.q, q.q, subst, var_subst)
-    elif isinstance(p, PropHole) and isinstance(q, PropHole):
-        assert False, 'Whoops! I need to implement this :)'
-    elif isinstance(p, bool) and isinstance(q, bool):
-        return p == q
-    elif (isinstance(p, BaseProp) and isinstance(q, BaseProp)) or (isinstance(p, ModelRef) and isinstance(q, ModelRef)):
-        return p.name == q.name
-    elif (isinstance(p, ForAll) and isinstance(q, ForAll)) or (isinstance(p, Exists) and isinstance(q, Exists)):
-        return unify(p.var, q.var, subst, var_subst) and unify(p.formula, q.formula, subst, var_subst)
-    elif isinstance(p, Predicate) and isinstance(q, Predicate):
-        return p.name == q.name and len(p.args) == len(q.args) and all(unify(xp, xq) for xp, xq, in zip(p.args, q.args))
-    else:
-        assert type(p) != type(q)
-        return False
+        if (isinstance(p, And) and isinstance(q, And)) or ((isinstance(p, Or) and isinstance(q, Or))) or ((isinstance(p, Imp) and isinstance(q, Imp))):
+            pending += [(p.q, q.q), (p.p, q.p)]
+        elif isinstance(p, PropHole) and isinstance(q, PropHole):
+            assert False, 'Whoops! I need to implement this :)'
+        elif isinstance(p, bool) and isinstance(q, bool):
+            if p != q:
+                return False
+        elif (isinstance(p, BaseProp) and isinstance(q, BaseProp)) or (isinstance(p, ModelRef) and isinstance(q, ModelRef)):
+            if p.name != q.name:
+                return False
+        elif (isinstance(p, ForAll) and isinstance(q, ForAll)) or (isinstance(p, Exists) and isinstance(q, Exists)):
+            pending += [(p.formula, q.formula), (p.var, q.var)]
+        elif isinstance(p, Predicate) and isinstance(q, Predicate):
+            if not (p.name == q.name and len(p.args) == len(q.args) and all(unify(xp, xq) for xp, xq, in zip(p.args, q.args))):
+                return False
+        else:
+            assert type(p) != type(q)
+            return False
+    return True
         
 def diff_tree(p: Prop, q: Prop) -> tuple[Prop, Prop]:
-    if (isinstance(p, And) and isinstance(q, And)) or ((isinstance(p, Or) and isinstance(q, Or))) or ((isinstance(p, Imp) and isinstance(q, Imp))):
-        if p.p != q.p and p.q != q.q:
+    # the smallest pair of subterms outside of which p and q agree
+    while True:
+        if (isinstance(p, And) and isinstance(q, And)) or ((isinstance(p, Or) and isinstance(q, Or))) or ((isinstance(p, Imp) and isinstance(q, Imp))):
+            if p.p != q.p and p.q != q.q:
+                return p, q
+            if p.p == q.p:
+                p, q = p.q, q.q
+            elif p.q == q.q:
+                p, q = p.p, q.p
+            else:
+                assert False, f'{p} == {q}'
+        elif (isinstance(p, ForAll) and isinstance(q, ForAll)) or (isinstance(p, Exists) and isinstance(q, Exists)):
+            if p.var != q.var:
+                return p, q
+            p, q = p.formula, q.formula
+        elif isinstance(p, Predicate) and isinstance(q, Predicate):
+            assert p != q, f'{p} == {q}'
+            return p, q
+        else:
             return p, q
-        if p.p == q.p:
-            return diff_tree(p.q, q.q)
-        if p.q == q.q:
-            return diff_tree(p.p, q.p)
-        assert False, f'{p} == {q}'
-    elif (isinstance(p, ForAll) and isinstance(q, ForAll)) or (isinstance(p, Exists) and isinstance(q, Exists)):
-        if p.var == q.var:
-            return diff_tree(p.formula, q.formula)
-        return p, q
-    elif isinstance(p, Predicate) and isinstance(q, Predicate):
-        assert p != q, f'{p} == {q}'
-        return p, q
-    else:
-        return p, q
-    # match p, q:
-    #     case (And(a, b), And(c, d)) | (Or(a, b), Or(c, d)) | (Imp(a, b), Imp(c, d)):
-    #         if a != c and b != d:
-    #             return p, q
-    #         if a == c:
-    #             return diff_tree(b, d)
-    #         if b == d:
-    #             return diff_tree(a, c)
-    #         assert False, f'{p} == {q}!'
-    #     case _:
-    #         return p, q
         
-def try_rewrite(transformation, rule):
-    if transformation[0] == transformation[1]:
-        return {}
-    old_t, new_t = diff_tree(*transformation)
-    old_r, new_r = rule
+Matcher = Callable[[Prop, Dict[str, Prop], Dict[str, ModelRef]], bool]
+
+
+def compile_pattern(pattern: Prop) -> Matcher:
+    # specialize `unify` against a fixed pattern: one closure per pattern node, holes
+    # only on the pattern side, and (since nodes are interned) identity comparisons
+    if isinstance(pattern, PropHole):
+        hole = pattern.name
+        def match_hole(p, subst, var_subst):
+            if hole in subst:
+                return subst[hole] is p
+            subst[hole] = p
+            return True
+        return match_hole
+    if isinstance(pattern, ModelRefHole):
+        var_hole = pattern.name
+        def match_var_hole(p, subst, var_subst):
+            if type(p) is not ModelRef:
+                return False
+            if var_hole in var_subst:
+                return var_subst[var_hole] is p
+            var_subst[var_hole] = p
+            return True
+        return match_var_hole
+    if isinstance(pattern, (And, Or, Imp)):
+        cls, match_p, match_q = type(pattern), compile_pattern(pattern.p), compile_pattern(pattern.q)
+        def match_binary(p, subst, var_subst):
+            return type(p) is cls and match_p(p.p, subst, var_subst) and match_q(p.q, subst, var_subst)
+        return match_binary
+    if isinstance(pattern, (ForAll, Exists)):
+        cls, match_var, match_formula = type(pattern), compile_pattern(pattern.var), compile_pattern(pattern.formula)
+        def match_quantifier(p, subst, var_subst):
+            return type(p) is cls and match_var(p.var, subst, var_subst) and match_formula(p.formula, subst, var_subst)
+        return match_quantifier
+    return lambda p, subst, var_subst: p is pattern
+
+
+def instantiate(pattern: Prop, subst: Dict[str, Prop], var_subst: Dict[str, ModelRef]) -> Prop:
+    if isinstance(pattern, PropHole):
+        return subst[pattern.name]
+    if isinstance(pattern, ModelRefHole):
+        return var_subst[pattern.name]
+    if isinstance(pattern, (And, Or, Imp)):
+        return type(pattern)(instantiate(pattern.p, subst, var_subst), instantiate(pattern.q, subst, var_subst))
+    if isinstance(pattern, (ForAll, Exists)):
+        return type(pattern)(instantiate(pattern.var, subst, var_subst), instantiate(pattern.formula, subst, var_subst))
+    return pattern
+
+
+class RewriteRule:
+    def __init__(self, rule: tuple[Prop, Prop]) -> None:
+        self.left, self.right = rule
+        match_left, match_right = compile_pattern(self.left), compile_pattern(self.right)
+        # (root type the old side must have, or None for a hole; old matcher; new matcher)
+        self.directions = (
+            (_root(self.left), _root(self.right), match_left, match_right),
+            (_root(self.right), _root(self.left), match_right, match_left),
+        )
+        
+    def match(self, old: Prop, new: Prop) -> Optional[tuple[Dict[str, Prop], Dict[str, ModelRef]]]:
+        for direction in range(2):
+            found = self.match_from(direction, old, new)
+            if found is not None:
+                return found
+        return None
     
-    def rewrite():
-        subst = {}
-        var_subst = {}
-        assert unify(old_t, old_r, subst, var_subst) and unify(new_t, new_r, subst, var_subst), f'Failed to apply rule {old_r} <=> {new_r} to {transformation[0]} => {transformation[1]}!'
-        return subst, var_subst
+    def match_from(self, direction: int, old: Prop, new: Prop) -> Optional[tuple[Dict[str, Prop], Dict[str, ModelRef]]]:
+        # direction 0 rewrites left to right, 1 right to left
+        old_root, new_root, match_old, match_new = self.directions[direction]
+        if (old_root is not None and type(old) is not old_root) or (new_root is not None and type(new) is not new_root):
+            return None
+        subst: Dict[str, Prop] = {}
+        var_subst: Dict[str, ModelRef] = {}
+        if match_old(old, subst, var_subst) and match_new(new, subst, var_subst):
+            return subst, var_subst
+        return None
     
-    try:
-        return rewrite()
-    except AssertionError:
-        old_r, new_r = new_r, old_r
-        return rewrite()
+    def rewrite(self, transformation: tuple[Prop, Prop]):
+        if transformation[0] == transformation[1]:
+            return {}
+        old_t, new_t = diff_tree(*transformation)
+        found = self.match(old_t, new_t)
+        assert found is not None, f'Failed to apply rule {self.right} <=> {self.left} to {transformation[0]} => {transformation[1]}!'
+        return found
+
+
+def _root(pattern: Prop) -> Optional[type]:
+    return None if isinstance(pattern, (PropHole, ModelRefHole)) else type(pattern)
+
+
+_compiled_rules: Dict[tuple[Prop, Prop], RewriteRule] = {}
+
+def try_rewrite(transformation, rule):
+    if rule not in _compiled_rules:
+        _compiled_rules[rule] = RewriteRule(rule)
+    return _compiled_rules[rule].rewrite(transformation)
 
 
 
 def alpha_renaming(orig: Prop, new: Prop, orig_var: ModelRef, subst: Dict[ModelRef, ModelRef]={}):
-    assert type(orig) == type(new), 'Statements differ in more than just variable names!'
-    if (isinstance(orig, And) and isinstance(new, And)) or (isinstance(orig, Or) and isinstance(new, Or)) or (isinstance(orig, Imp) and isinstance(new, Imp)):
-        alpha_renaming(orig.p, new.p, orig_var, subst)
-        alpha_renaming(orig.q, new.q, orig_var, subst)
-    elif (isinstance(orig, ForAll) and isinstance(new, ForAll)) or (isinstance(orig, Exists) and isinstance(new, Exists)):
-        assert orig.var == new.var, 'Statements differ in more than just variable names!'
-        if orig_var in subst:
-            assert subst[orig_var] != new.var, 'Cannot instantiate into a quantified variable!'
-        alpha_renaming(orig.formula, new.formula, orig_var, subst)
-    elif isinstance(orig, Predicate) and isinstance(new, Predicate):
-        assert orig.name == new.name, 'Statements differ in more than just variable names!'
-        assert len(orig.args) == len(new.args), 'Statements differ in more than just variable names!'
-        for orig_arg, new_arg in zip(orig.args, new.args):
-            if orig_arg == orig_var:
-                if orig_var not in subst: subst[orig_var] = new_arg
-                assert subst[orig_var] == new_arg, f'Ambiguous substitution: [{orig_var} -> {subst[orig_var]}, {new_arg}]'
+    # walks both formulas together on an explicit stack, left subterms first
+    pending = [(orig, new)]
+    while pending:
+        orig, new = pending.pop()
+        assert type(orig) == type(new), 'Statements differ in more than just variable names!'
+        if orig is new and not isinstance(orig, bool):
+            # a shared subtree without the variable has nothing to rename, and can only
+            # fail by quantifying over what the variable was already renamed to
+            meta = metadata(orig)
+            if orig_var not in meta.symbols and (orig_var not in subst or subst[orig_var] not in meta.bound):
+                continue
+        if (isinstance(orig, And) and isinstance(new, And)) or (isinstance(orig, Or) and isinstance(new, Or)) or (isinstance(orig, Imp) and isinstance(new, Imp)):
+            pending += [(orig.q, new.q), (orig.p, new.p)]
+        elif (isinstance(orig, ForAll) and isinstance(new, ForAll)) or (isinstance(orig, Exists) and isinstance(new, Exists)):
+            assert orig.var == new.var, 'Statements differ in more than just variable names!'
+            if orig_var in subst:
+                assert subst[orig_var] != new.var, 'Cannot instantiate into a quantified variable!'
+            pending.append((orig.formula, new.formula))
+        elif isinstance(orig, Predicate) and isinstance(new, Predicate):
+            assert orig.name == new.name, 'Statements differ in more than just variable names!'
+            assert len(orig.args) == len(new.args), 'Statements differ in more than just variable names!'
+            for orig_arg, new_arg in zip(orig.args, new.args):
+                if orig_arg == orig_var:
+                    if orig_var not in subst: subst[orig_var] = new_arg
+                    assert subst[orig_var] == new_arg, f'Ambiguous substitution: [{orig_var} -> {subst[orig_var]}, {new_arg}]'
 
     
 def formula_uses(formula: Prop, var_name: ModelRef):
-    if isinstance(formula, And) or isinstance(formula, Or) or isinstance(formula, Imp):
-        return formula_uses(formula.p, var_name) or formula_uses(formula.q, var_name)
-    elif isinstance(formula, ForAll) or isinstance(formula, Exists):
-        return formula.var == var_name or formula_uses(formula.formula, var_name)
-    elif isinstance(formula, Predicate):
-        return var_name in formula.args
-    return False
-
-
-def get_symbols(formula: Prop) -> tuple[Set[ModelRef], Set[ModelRef]]:
-    if isinstance(formula, And) or isinstance(formula, Or) or isinstance(formula, Imp):
-        lsym, lvar = get_symbols(formula.p)
-        rsym, rvar = get_symbols(formula.q)
-        return lsym | rsym, lvar | rvar
-    elif isinstance(formula, ForAll) or isinstance(formula, Exists):
-        assert isinstance(formula.var, ModelRef)
-        sym, var = get_symbols(formula.formula)
-        return sym | {formula.var}, var | {formula.var}
-    elif isinstance(formula, Predicate):
-        return set(formula.args), set()
-    return set(), set()
+    return var_name in metadata(formula).symbols
+
+
+def get_symbols(formula: Prop) -> tuple[FrozenSet[ModelRef], FrozenSet[ModelRef]]:
+    # every ModelRef in the formula, and the ones it quantifies over
+    meta = metadata(formula)
+    return meta.symbols, meta.bound
 
 
 class Argument:
+    # set on arguments whose verification looks at `Context.constants`
+    uses_constants = False
+    # extra detail shown next to a checked line (e.g. the rule `eq` found)
+    note: Optional[str] = None
+
     def verify(self, line: Line, constants: Set[ModelRef]):
         return self.typecheck(line.typ)
     
@@ -172,12 +240,14 @@ class Argument:
     
     
 def make_argument(rule: tuple[Prop, Prop], name: str) -> Callable[[Line], Argument]:
+    compiled = RewriteRule(rule)
+    
     class RW(Argument):
         def __init__(self, old: Line) -> None:
             self.old = old
             
         def typecheck(self, new: Prop) -> bool:
-            try_rewrite((self.old.typ, new), rule)
+            compiled.rewrite((self.old.typ, new))
             return True
         
         def __repr__(self) -> str:
@@ -227,6 +297,18 @@ demorgan_exists_forall = Not(Exists(x, a)), ForAll(x, Not(a))
 # alpha equivalence
 
 
+# by justification name, in the order `eq` tries them
+rewrite_rules: Dict[str, tuple[Prop, Prop]] = {
+    'or_comm': or_comm, 'and_comm': and_comm,
+    'or_assoc': or_assoc, 'and_assoc': and_assoc,
+    'dn': double_neg, 'imp': impl_equiv,
+    'dist_ao': distr_and_or, 'dist_oa': distr_or_and,
+    'dm_ao': demorgan_and_or, 'dm_oa': demorgan_or_and,
+    'dm_fe': demorgan_forall_exists, 'dm_ef': demorgan_exists_forall,
+    'exp': exp, 'cp': cp,
+    'or_self': self_or, 'and_self': self_and,
+}
+
 # turn these all into arguments
 OrComm = make_argument(or_comm, 'comm')
 AndComm = make_argument(and_comm, 'comm')